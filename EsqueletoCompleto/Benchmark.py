@@ -0,0 +1,422 @@
+"""Benchmark reprodutível dos motores de roteamento.
+
+Roda offline sobre grafos salvos (GraphML) ou sobre grades sintéticas com cara
+de malha viária, e grava um JSON que pode ser comparado entre versões:
+
+    python Benchmark.py --grafo grafo_brasilia.graphml --saida bench.json
+    python Benchmark.py --sintetico 30 60 100 --consultas 300 --repeticoes 5
+
+Para cada grafo são medidos o tempo de carga (GraphML e snapshot) e, para cada
+motor, o tempo de preparo, a latência das consultas na passada fria (caches
+vazios) e nas passadas quentes (p50/p90/p99), os nós expandidos e o pico de
+memória alocada durante uma passada.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+
+from GrafoManager import GrafoManager
+from GrafoParticionado import GrafoParticionado, caminho_ladrilhos
+
+MOTORES = ("networkx", "dijkstra", "astar", "bidijkstra", "biastar", "ch", "alt", "conversoes", "ladrilhos",
+           "calcular_rotas")
+MODULOS_PESADOS = ("osmnx", "networkx", "pandas", "sklearn", "matplotlib", "shapely", "scipy")
+
+# Roda num processo novo: mede a inicialização de um worker só de roteamento.
+_SCRIPT_INICIALIZACAO = """
+import contextlib, io, json, sys, time
+t0 = time.perf_counter()
+from GrafoManager import GrafoManager
+t1 = time.perf_counter()
+gm = GrafoManager(sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    gm.carregar_grafo()
+t2 = time.perf_counter()
+ids = gm.compacto.ids
+gm.calcular_rotas(int(ids[0]), int(ids[-1]))
+t3 = time.perf_counter()
+gm.obter_no_mais_proximo(float(gm.compacto.y[0]), float(gm.compacto.x[0]))
+t4 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "carga_s": t2 - t1, "primeira_rota_s": t3 - t2,
+                  "primeiro_snapping_s": t4 - t3,
+                  "modulos_pesados": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+# ------------------------
+# Grafos sintéticos
+# ------------------------
+def grafo_sintetico(lado, semente=0, passo_grau=0.0012):
+    """Grade lado×lado em torno de Brasília com hierarquia de vias.
+
+    A cada 8 linhas/colunas há uma avenida (primary, mão dupla, 60 km/h), a cada
+    4 uma via secundária; o resto são ruas residenciais, parte delas de mão única
+    e algumas interrompidas. O comprimento é a distância haversine com um desvio
+    aleatório, como numa via que não é perfeitamente reta.
+    """
+    rnd = random.Random(semente)
+    G = nx.MultiDiGraph(crs="epsg:4326")
+    lat0, lon0 = -15.79 - lado * passo_grau / 2, -47.88 - lado * passo_grau / 2
+
+    def nid(i, j):
+        return 1_000_000 + i * lado + j
+
+    for i in range(lado):
+        for j in range(lado):
+            G.add_node(nid(i, j),
+                       y=lat0 + i * passo_grau + rnd.uniform(-0.2, 0.2) * passo_grau,
+                       x=lon0 + j * passo_grau + rnd.uniform(-0.2, 0.2) * passo_grau)
+
+    def haversine(u, v):
+        a, b = G.nodes[u], G.nodes[v]
+        la1, la2 = math.radians(a["y"]), math.radians(b["y"])
+        h = math.sin((la2 - la1) / 2) ** 2 + \
+            math.cos(la1) * math.cos(la2) * math.sin(math.radians(b["x"] - a["x"]) / 2) ** 2
+        return 2 * 6371000.0 * math.asin(math.sqrt(h))
+
+    for i in range(lado):
+        for j in range(lado):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di >= lado or j + dj >= lado:
+                    continue
+                linha = i if di == 0 else j
+                u, v = nid(i, j), nid(i + di, j + dj)
+                dados = {"length": haversine(u, v) * rnd.uniform(1.0, 1.15),
+                         "osmid": (1 + di) * 100_000 + linha}
+                if linha % 8 == 0:
+                    dados.update(highway="primary", maxspeed="60")
+                elif linha % 4 == 0:
+                    dados.update(highway="secondary")
+                else:
+                    if rnd.random() < 0.03:
+                        continue
+                    dados.update(highway="residential")
+                    if rnd.random() < 0.2:
+                        # Mão única, alternando o sentido por linha.
+                        a, b = (u, v) if linha % 2 else (v, u)
+                        G.add_edge(a, b, **dados)
+                        continue
+                G.add_edge(u, v, **dados)
+                G.add_edge(v, u, **dict(dados))
+    return G
+
+
+def salvar_sintetico(lado, diretorio, semente=0):
+    arquivo = os.path.join(diretorio, f"sintetico_{lado}x{lado}_s{semente}.graphml")
+    if not os.path.exists(arquivo):
+        ox.save_graphml(grafo_sintetico(lado, semente), arquivo)
+    return arquivo
+
+
+# ------------------------
+# Utilitários
+# ------------------------
+@contextlib.contextmanager
+def _silencioso():
+    # O GrafoManager informa cada carga com print; no benchmark isso só polui a saída.
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def resumir(latencias_s):
+    if not latencias_s:
+        return {"n": 0}
+    ms = np.asarray(latencias_s) * 1000.0
+    return {
+        "n": int(len(ms)),
+        "media_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def medir_carga(arquivo):
+    """Tempo de carga a partir do GraphML e do snapshot (que é gerado se faltar)."""
+    gm = GrafoManager(arquivo)
+    with _silencioso():
+        t0 = time.perf_counter()
+        gm.carregar_grafo(usar_snapshot=False)
+        graphml = time.perf_counter() - t0
+        if gm.compacto is None:
+            raise RuntimeError(f"Não foi possível carregar {arquivo}")
+        gm.carregar_grafo()  # garante o snapshot atualizado
+        gm = GrafoManager(arquivo)
+        t0 = time.perf_counter()
+        gm.carregar_grafo()
+        snapshot = time.perf_counter() - t0
+    return gm, {"graphml_s": round(graphml, 4), "snapshot_s": round(snapshot, 4)}
+
+
+def medir_inicializacao(arquivo, repeticoes=3):
+    """Inicialização a frio em processos novos (mediana de `repeticoes`).
+
+    Mede import do GrafoManager, carga do snapshot, primeira rota por ids e
+    primeiro snapping, e lista quais dependências pesadas acabaram importadas.
+    Pressupõe o snapshot já gerado (medir_carga o gera).
+    """
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [diretorio, os.environ.get("PYTHONPATH")])))
+    medidas = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", _SCRIPT_INICIALIZACAO, os.path.abspath(arquivo),
+                                *MODULOS_PESADOS], capture_output=True, text=True, env=env, check=True)
+        medidas.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    resultado = {chave: round(float(np.median([m[chave] for m in medidas])), 4)
+                 for chave in ("import_s", "carga_s", "primeira_rota_s", "primeiro_snapping_s")}
+    resultado["total_s"] = round(sum(resultado.values()), 4)
+    resultado["modulos_pesados"] = medidas[-1]["modulos_pesados"]
+    return resultado
+
+
+def sortear_pares(compacto, quantidade, semente=0):
+    rnd = random.Random(semente)
+    ids = compacto.ids.tolist()
+    return [(rnd.choice(ids), rnd.choice(ids)) for _ in range(quantidade)]
+
+
+def ler_pares(arquivo, gm):
+    """Pares fixos em JSON: [[[lat, lon], [lat, lon]], ...], ajustados aos nós do grafo."""
+    with open(arquivo, encoding="utf-8") as f:
+        pares = json.load(f)
+    lats = [p[k][0] for p in pares for k in (0, 1)]
+    lons = [p[k][1] for p in pares for k in (0, 1)]
+    nos = gm.obter_nos_mais_proximos(lats, lons).tolist()
+    return list(zip(nos[0::2], nos[1::2]))
+
+
+# ------------------------
+# Motores
+# ------------------------
+def preparar_motor(gm, motor, peso):
+    """Devolve (consulta(o, d) -> rota, expandidos() ou None, reiniciar()).
+
+    `reiniciar` esvazia os caches do motor para a passada fria; `expandidos`
+    lê quantos nós a última consulta fechou.
+    """
+    c = gm.compacto
+
+    def expandidos():
+        return c.expandidos
+
+    if motor == "networkx":
+        return _motor_networkx(gm, peso)
+    if motor == "dijkstra":
+        return (lambda o, d: c.dijkstra(o, d, peso=peso)), expandidos, c.invalidar_cache
+    if motor == "astar":
+        return (lambda o, d: c.astar(o, d, peso=peso)), expandidos, c.invalidar_cache
+    if motor == "bidijkstra":
+        return (lambda o, d: c.bidijkstra(o, d, peso=peso)), expandidos, c.invalidar_cache
+    if motor == "biastar":
+        return (lambda o, d: c.biastar(o, d, peso=peso)), expandidos, c.invalidar_cache
+    if motor == "ch":
+        gm.preparar_ch(pesos=(peso,))
+        ch = gm.hierarquia(peso)
+        return ch.rota, lambda: ch.expandidos, lambda: None
+    if motor == "alt":
+        gm.preparar_alt(pesos=(peso,))
+        lm = gm.landmarks(peso)
+
+        def consulta(o, d):
+            h = lm.heuristica(c.indice[o], c.indice[d])
+            return c.astar(o, d, peso=peso, heuristica=h)
+        return consulta, expandidos, c.invalidar_cache
+    if motor == "conversoes":
+        # Busca por arestas: "expandidos" conta arestas fechadas, não nós.
+        conv = gm.conversoes()
+        return (lambda o, d: conv.rota(o, d, peso=peso)), lambda: conv.expandidos, c.invalidar_cache
+    if motor == "ladrilhos":
+        with _silencioso():
+            gm.particionar()
+        # Uma instância nova começa sem nenhum ladrilho em memória (passada fria).
+        estado = {}
+
+        def reiniciar():
+            estado["motor"] = GrafoParticionado(caminho_ladrilhos(gm.arquivo))
+        reiniciar()
+        return ((lambda o, d: estado["motor"].astar(o, d, peso=peso)),
+                lambda: estado["motor"].expandidos, reiniciar)
+    if motor == "calcular_rotas":
+        def consulta(o, d):
+            gm.cache.limpar()
+            with _silencioso():
+                return gm.calcular_rotas(o, d)[0]
+        return consulta, None, lambda: (c.invalidar_cache(), gm.cache.limpar())
+    raise ValueError(f"Motor desconhecido: {motor}")
+
+
+def _motor_networkx(gm, peso):
+    """Implementação original, sobre o MultiDiGraph: nx.shortest_path para distância e
+    nx.astar_path com haversine / 120 km/h para tempo. A leitura do GraphML entra no preparo."""
+    with _silencioso():
+        G = gm.grafo
+    if peso == "length":
+        def buscar(o, d):
+            return nx.shortest_path(G, o, d, weight="length")
+    else:
+        vmax_ms = 120.0 * 1000.0 / 3600.0
+
+        def heuristica(u, v):
+            a, b = G.nodes[u], G.nodes[v]
+            return ox.distance.great_circle(a["y"], a["x"], b["y"], b["x"]) / vmax_ms
+
+        def buscar(o, d):
+            return nx.astar_path(G, o, d, heuristic=heuristica, weight=peso)
+
+    def consulta(o, d):
+        try:
+            return buscar(o, d)
+        except nx.NetworkXNoPath:
+            return None
+    return consulta, None, lambda: None
+
+
+def medir_motor(gm, motor, peso, pares, repeticoes):
+    t0 = time.perf_counter()
+    consulta, expandidos_ultima, reiniciar = preparar_motor(gm, motor, peso)
+    preparo = time.perf_counter() - t0
+
+    reiniciar()
+    passadas = []
+    expandidos = []
+    sem_caminho = 0
+    for passada in range(max(repeticoes, 2)):
+        latencias = []
+        for o, d in pares:
+            t = time.perf_counter()
+            rota = consulta(o, d)
+            latencias.append(time.perf_counter() - t)
+            if passada == 0:
+                sem_caminho += rota is None
+                if expandidos_ultima is not None:
+                    expandidos.append(expandidos_ultima())
+        passadas.append(latencias)
+
+    tracemalloc.start()
+    for o, d in pares:
+        consulta(o, d)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultado = {
+        "preparo_s": round(preparo, 4),
+        "frio": resumir(passadas[0]),
+        "primeira_consulta_ms": round(passadas[0][0] * 1000.0, 4) if pares else None,
+        "quente": resumir([x for lat in passadas[1:] for x in lat]),
+        "sem_caminho": int(sem_caminho),
+        "memoria_pico_kb": round(pico / 1024.0, 1),
+    }
+    if expandidos:
+        e = np.asarray(expandidos)
+        resultado["nos_expandidos"] = {"media": round(float(e.mean()), 1),
+                                       "p50": float(np.percentile(e, 50)),
+                                       "p90": float(np.percentile(e, 90))}
+    return resultado
+
+
+def benchmark_grafo(arquivo, motores, peso="travel_time", consultas=200, repeticoes=3,
+                    pares_fixos=None, semente=0):
+    gm, carga = medir_carga(arquivo)
+    c = gm.compacto
+    pares = ler_pares(pares_fixos, gm) if pares_fixos else sortear_pares(c, consultas, semente)
+    resultado = {
+        "arquivo": os.path.basename(arquivo),
+        "n_nos": int(c.n_nos),
+        "n_arestas": int(c.n_arestas),
+        "carga": carga,
+        "inicializacao": medir_inicializacao(arquivo),
+        "consultas": len(pares),
+        "pares": "fixos" if pares_fixos else f"aleatorios(semente={semente})",
+        "motores": {},
+    }
+    for motor in motores:
+        resultado["motores"][motor] = medir_motor(gm, motor, peso, pares, repeticoes)
+    return resultado
+
+
+def ambiente():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+        "osmnx": ox.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def imprimir_resumo(resultados):
+    for g in resultados["grafos"]:
+        print(f"\n{g['arquivo']}: {g['n_nos']} nós, {g['n_arestas']} arestas "
+              f"(carga GraphML {g['carga']['graphml_s']:.2f} s, snapshot {g['carga']['snapshot_s']:.3f} s)")
+        ini = g["inicializacao"]
+        print(f"Inicialização a frio: import {ini['import_s']:.3f} s | carga {ini['carga_s']:.3f} s | "
+              f"1ª rota {ini['primeira_rota_s']:.3f} s | 1º snapping {ini['primeiro_snapping_s']:.3f} s "
+              f"(pesados: {', '.join(ini['modulos_pesados']) or 'nenhum'})")
+        print(f"{'Motor':<16}{'preparo (s)':>12}{'frio p50':>10}{'p50 (ms)':>10}{'p90':>10}"
+              f"{'p99':>10}{'expandidos':>12}{'mem (KB)':>10}")
+        for nome, m in g["motores"].items():
+            exp = m.get("nos_expandidos", {}).get("media", "-")
+            print(f"{nome:<16}{m['preparo_s']:>12.3f}{m['frio'].get('p50_ms', 0):>10.3f}"
+                  f"{m['quente'].get('p50_ms', 0):>10.3f}{m['quente'].get('p90_ms', 0):>10.3f}"
+                  f"{m['quente'].get('p99_ms', 0):>10.3f}{exp:>12}{m['memoria_pico_kb']:>10.0f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark dos motores de roteamento")
+    ap.add_argument("--grafo", nargs="*", default=[], help="arquivos GraphML a medir")
+    ap.add_argument("--sintetico", nargs="*", type=int, default=[],
+                    help="lados das grades sintéticas (ex.: 30 60 100)")
+    ap.add_argument("--diretorio-sintetico", default=None,
+                    help="onde gravar os grafos sintéticos (padrão: diretório temporário)")
+    ap.add_argument("--motores", nargs="*", default=list(MOTORES), choices=MOTORES)
+    ap.add_argument("--peso", default="travel_time", choices=("length", "travel_time"))
+    ap.add_argument("--consultas", type=int, default=200)
+    ap.add_argument("--repeticoes", type=int, default=3,
+                    help="passadas sobre o conjunto de consultas (a primeira é a fria)")
+    ap.add_argument("--pares", default=None, help="JSON com pares fixos [[lat, lon], [lat, lon]]")
+    ap.add_argument("--semente", type=int, default=0)
+    ap.add_argument("--saida", default=None, help="arquivo JSON de saída")
+    args = ap.parse_args(argv)
+
+    arquivos = list(args.grafo)
+    if args.sintetico:
+        diretorio = args.diretorio_sintetico or tempfile.mkdtemp(prefix="bench_grafos_")
+        os.makedirs(diretorio, exist_ok=True)
+        arquivos += [salvar_sintetico(lado, diretorio, args.semente) for lado in args.sintetico]
+    if not arquivos:
+        ap.error("informe --grafo e/ou --sintetico")
+
+    resultados = {
+        "ambiente": ambiente(),
+        "parametros": {"peso": args.peso, "consultas": args.consultas,
+                       "repeticoes": args.repeticoes, "semente": args.semente},
+        "grafos": [benchmark_grafo(a, args.motores, args.peso, args.consultas, args.repeticoes,
+                                   args.pares, args.semente) for a in arquivos],
+    }
+    imprimir_resumo(resultados)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nResultados gravados em {args.saida}")
+    return resultados
+
+
+if __name__ == "__main__":
+    main()
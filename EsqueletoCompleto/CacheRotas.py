@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Dicionário limitado com despejo LRU, expiração opcional (TTL) e contadores."""
+
+    def __init__(self, max_itens=1024, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def __len__(self):
+        return len(self._dados)
+
+    def obter(self, chave):
+        item = self._dados.get(chave)
+        if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+            del self._dados[chave]
+            self.despejos += 1
+            item = None
+        if item is None:
+            self.falhas += 1
+            return None
+        self._dados.move_to_end(chave)
+        self.acertos += 1
+        return item[0]
+
+    def guardar(self, chave, valor):
+        self._dados[chave] = (valor, time.monotonic())
+        self._dados.move_to_end(chave)
+        while len(self._dados) > self.max_itens:
+            self._dados.popitem(last=False)
+            self.despejos += 1
+
+    def limpar(self):
+        self._dados.clear()
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            "itens": len(self._dados),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "despejos": self.despejos,
+            "taxa_acerto": self.acertos / total if total else 0.0,
+        }
+
+
+class CacheRotas:
+    """Cache de rotas por (origem, destino, peso, algoritmo, versão do grafo).
+
+    Opcionalmente guarda árvores de caminhos mínimos um-para-todos: depois que a
+    árvore de uma origem foi calculada, qualquer destino a partir dela é
+    respondido sem nova busca. Como a versão do grafo faz parte das chaves,
+    entradas antigas nunca são devolvidas; `limpar()` apenas libera a memória.
+    """
+
+    def __init__(self, max_rotas=4096, max_arvores=8, ttl=None):
+        self.rotas = CacheLRU(max_rotas, ttl)
+        self.arvores = CacheLRU(max_arvores, ttl)
+
+    def obter_rota(self, origem, destino, peso, algoritmo, versao):
+        rota = self.rotas.obter((origem, destino, peso, algoritmo, versao))
+        return list(rota) if rota is not None else None
+
+    def guardar_rota(self, origem, destino, peso, algoritmo, versao, rota):
+        self.rotas.guardar((origem, destino, peso, algoritmo, versao), tuple(rota))
+
+    def obter_arvore(self, origem, peso, versao):
+        return self.arvores.obter((origem, peso, versao))
+
+    def guardar_arvore(self, origem, peso, versao, pred):
+        self.arvores.guardar((origem, peso, versao), pred)
+
+    def limpar(self):
+        self.rotas.limpar()
+        self.arvores.limpar()
+
+    def estatisticas(self):
+        return {"rotas": self.rotas.estatisticas(), "arvores": self.arvores.estatisticas()}
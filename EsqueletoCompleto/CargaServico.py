@@ -0,0 +1,159 @@
+"""Gerador de carga para o ServicoRotas, todo em localhost.
+
+    python CargaServico.py --porta 8080 --conexoes 32 --requisicoes 2000 --tipo rota
+
+Abre `conexoes` conexões keep-alive, dispara as requisições o mais rápido
+possível (cada conexão espera a resposta antes da próxima) e reporta vazão,
+latência (p50/p90/p99/máx) e a contagem por status HTTP, incluindo os 503 da
+contrapressão. Os pontos são sorteados dentro do bbox informado por /saude.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+TIPOS = ("rota", "matriz", "no_mais_proximo", "misto")
+
+
+class Conexao:
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self.leitor = self.escritor = None
+
+    async def pedir(self, metodo, caminho, corpo=None):
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else b""
+        self.escritor.write((
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n"
+        ).encode("latin-1") + dados)
+        await self.escritor.drain()
+
+        status = int((await self.leitor.readline()).split()[1])
+        cabecalhos = {}
+        while True:
+            linha = await self.leitor.readline()
+            if linha in (b"\r\n", b"\n", b""):
+                break
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            cabecalhos[nome.strip().lower()] = valor.strip()
+        resposta = await self.leitor.readexactly(int(cabecalhos.get("content-length", 0)))
+        if cabecalhos.get("connection", "").lower() == "close":
+            self.fechar()
+        return status, resposta
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
+
+
+def gerar_requisicao(tipo, bbox, rnd, tamanho_matriz=5):
+    lat_min, lon_min, lat_max, lon_max = bbox
+
+    def ponto():
+        return [rnd.uniform(lat_min, lat_max), rnd.uniform(lon_min, lon_max)]
+
+    if tipo == "misto":
+        tipo = rnd.choices(("rota", "matriz", "no_mais_proximo"), weights=(6, 1, 3))[0]
+    if tipo == "rota":
+        return "POST", "/rota", {"origem": ponto(), "destino": ponto()}
+    if tipo == "matriz":
+        return "POST", "/matriz", {"origens": [ponto() for _ in range(tamanho_matriz)],
+                                   "destinos": [ponto() for _ in range(tamanho_matriz)]}
+    lat, lon = ponto()
+    return "GET", f"/no_mais_proximo?lat={lat}&lon={lon}", None
+
+
+def percentis_ms(latencias):
+    if not latencias:
+        return {}
+    arr = np.asarray(latencias) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+        "media_ms": float(arr.mean()),
+    }
+
+
+async def gerar_carga(host, porta, tipo="rota", conexoes=32, requisicoes=2000, semente=0):
+    sonda = Conexao(host, porta)
+    status, corpo = await sonda.pedir("GET", "/saude")
+    sonda.fechar()
+    if status != 200:
+        raise RuntimeError(f"/saude respondeu {status}")
+    bbox = json.loads(corpo)["bbox"]
+
+    rnd = random.Random(semente)
+    pedidos = [gerar_requisicao(tipo, bbox, rnd) for _ in range(requisicoes)]
+    proximo = iter(pedidos)
+    latencias = []
+    estados = Counter()
+
+    async def cliente():
+        conexao = Conexao(host, porta)
+        try:
+            for metodo, caminho, corpo in proximo:
+                inicio = time.perf_counter()
+                try:
+                    status, _ = await conexao.pedir(metodo, caminho, corpo)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conexao.fechar()
+                    status = "erro de conexão"
+                estados[status] += 1
+                if status == 200:
+                    latencias.append(time.perf_counter() - inicio)
+        finally:
+            conexao.fechar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(conexoes)))
+    total = time.perf_counter() - inicio
+    return {
+        "tipo": tipo,
+        "conexoes": conexoes,
+        "requisicoes": requisicoes,
+        "duracao_s": total,
+        "vazao_rps": estados[200] / total if total else 0.0,
+        "status": {str(k): v for k, v in sorted(estados.items(), key=lambda kv: str(kv[0]))},
+        "latencia": percentis_ms(latencias),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gerador de carga do serviço de rotas")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--porta", type=int, default=8080)
+    ap.add_argument("--tipo", default="rota", choices=TIPOS)
+    ap.add_argument("--conexoes", type=int, default=32)
+    ap.add_argument("--requisicoes", type=int, default=2000)
+    ap.add_argument("--semente", type=int, default=0)
+    ap.add_argument("--saida", default=None, help="arquivo JSON de saída")
+    args = ap.parse_args(argv)
+
+    resultado = asyncio.run(gerar_carga(args.host, args.porta, args.tipo, args.conexoes,
+                                        args.requisicoes, args.semente))
+    lat = resultado["latencia"]
+    print(f"{resultado['requisicoes']} requisições ({resultado['tipo']}) em "
+          f"{resultado['duracao_s']:.2f} s com {resultado['conexoes']} conexões")
+    print(f"Vazão: {resultado['vazao_rps']:.1f} req/s (só respostas 200)")
+    if lat:
+        print(f"Latência: p50 {lat['p50_ms']:.1f} ms | p90 {lat['p90_ms']:.1f} ms | "
+              f"p99 {lat['p99_ms']:.1f} ms | máx {lat['max_ms']:.1f} ms")
+    print("Status:", resultado["status"])
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return resultado
+
+
+if __name__ == "__main__":
+    main()
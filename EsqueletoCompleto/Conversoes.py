@@ -0,0 +1,292 @@
+"""Roteamento baseado em arestas: restrições de conversão do OSM e custo por conversão.
+
+Na busca por nós, chegar a uma interseção por qualquer aresta dá no mesmo,
+então proibições ("não vire à esquerda") e custos de conversão não cabem nela.
+Aqui o estado da busca é a aresta pela qual se chegou ao nó, e o grafo
+expandido por arestas (uma transição por par aresta de entrada → aresta de
+saída) é percorrido sob demanda sobre o próprio CSR, sem ser materializado.
+Além do grafo compacto ficam só o rumo de cada aresta (float32) e as
+restrições, indexadas pela aresta de entrada.
+
+As restrições vêm das relações type=restriction do OSM, resolvidas em pares
+de arestas (u → via, via → w) na ingestão (IngestaoOSM) e guardadas ao lado
+do grafo em <grafo>.restricoes.json. O rumo usa a reta entre as pontas da
+aresta, então curvas longas simplificadas entram pela direção média.
+"""
+import heapq
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+# Segundos somados ao travel_time em cada tipo de conversão (mão à direita:
+# cruzar o fluxo contrário para virar à esquerda custa mais).
+CUSTOS_PADRAO = {"reto": 0.0, "direita": 5.0, "esquerda": 15.0, "retorno": 60.0}
+# |mudança de rumo| até LIMIAR_RETO é seguir reto; a partir de LIMIAR_RETORNO, retorno.
+LIMIAR_RETO = 30.0
+LIMIAR_RETORNO = 160.0
+
+
+def caminho_restricoes(arquivo):
+    return os.path.splitext(arquivo)[0] + ".restricoes.json"
+
+
+def salvar_restricoes(restricoes, arquivo):
+    with open(arquivo + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(restricoes, f)
+    os.replace(arquivo + ".tmp", arquivo)
+
+
+def carregar_restricoes(arquivo):
+    """Lista de {"de": [u, via], "para": [via, w], "tipo": "proibida"|"obrigatoria"} ([] sem arquivo)."""
+    if not os.path.exists(arquivo):
+        return []
+    with open(arquivo, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def tipo_conversao(delta, retorno=False):
+    """Classifica a mudança de rumo (graus, positiva no sentido horário)."""
+    if retorno or abs(delta) >= LIMIAR_RETORNO:
+        return "retorno"
+    if abs(delta) <= LIMIAR_RETO:
+        return "reto"
+    return "direita" if delta > 0 else "esquerda"
+
+
+class GrafoConversoes:
+    """Dijkstra/A* por arestas sobre um GrafoCompacto, com restrições e custos de conversão.
+
+    `custos` (segundos por tipo de conversão) vale para buscas em travel_time;
+    em length só as restrições são aplicadas.
+    """
+
+    def __init__(self, compacto, restricoes=(), custos=None):
+        self.compacto = compacto
+        self.custos = dict(CUSTOS_PADRAO if custos is None else custos)
+        c = compacto
+        origens = c.origens()
+        dx = (c.x[c.alvos] - c.x[origens]) * np.cos(np.radians((c.y[c.alvos] + c.y[origens]) / 2))
+        dy = c.y[c.alvos] - c.y[origens]
+        self.rumo = np.degrees(np.arctan2(dx, dy)).astype(np.float32)
+        self.proibidas = {}
+        self.obrigatorias = {}
+        self.ignoradas = 0
+        for r in restricoes:
+            self.adicionar(r["de"], r["para"], r.get("tipo", "proibida"))
+        self.expandidos = 0
+
+    def _arestas(self, u, v):
+        c = self.compacto
+        if u not in c.indice or v not in c.indice:
+            return []
+        return c.arestas_entre(u, v).tolist()
+
+    def adicionar(self, de, para, tipo="proibida"):
+        """Restrição entre a aresta `de` = (u, via) e a aresta `para` = (via, w), em ids de nó.
+
+        "proibida" veta a conversão; "obrigatoria" veta todas as outras saídas
+        do nó para quem chega por `de`.
+        """
+        if tipo not in ("proibida", "obrigatoria"):
+            raise ValueError(f"Tipo de restrição desconhecido: {tipo}")
+        if de[1] != para[0]:
+            raise ValueError(f"As arestas {de} e {para} não se encontram no nó de via")
+        entradas, saidas = self._arestas(*de), self._arestas(*para)
+        if not entradas or not saidas:
+            # Restrição de um trecho que não está no grafo (recorte, outro extrato).
+            self.ignoradas += 1
+            return
+        destino = self.proibidas if tipo == "proibida" else self.obrigatorias
+        for a in entradas:
+            destino[a] = destino.get(a, frozenset()) | frozenset(saidas)
+
+    # ------------------------
+    # Conversões
+    # ------------------------
+    def custo_conversao(self, a, b, peso="travel_time"):
+        """Custo de passar da aresta a para a aresta b (inf se proibido)."""
+        c = self.compacto
+        if b in self.proibidas.get(a, ()) or (a in self.obrigatorias and b not in self.obrigatorias[a]):
+            return math.inf
+        if peso != "travel_time":
+            return 0.0
+        delta = (float(self.rumo[b]) - float(self.rumo[a]) + 180.0) % 360.0 - 180.0
+        retorno = int(c.alvos[b]) == int(c.origens()[a])
+        return self.custos[tipo_conversao(delta, retorno)]
+
+    def _tabela_custos(self, peso):
+        if peso != "travel_time":
+            return None
+        return (self.custos["reto"], self.custos["direita"], self.custos["esquerda"], self.custos["retorno"])
+
+    # ------------------------
+    # Busca
+    # ------------------------
+    def rota(self, origem, destino, peso="travel_time", filtro=None, astar=True, vmax_kmh=120.0,
+             metricas=None):
+        """Rota (ids) de menor custo com conversões, ou None se não houver caminho permitido."""
+        inicio = time.perf_counter() if metricas is not None else 0.0
+        c = self.compacto.filtrado(filtro)
+        s, t = c.indice[origem], c.indice[destino]
+        if s == t:
+            self.expandidos = 1
+            if metricas is not None:
+                metricas.fechados += 1
+            return [origem]
+        heuristica = None
+        if astar:
+            # Em length a "velocidade" de 3,6 km/h faz a heurística valer metros.
+            h = c.heuristica_haversine(t, vmax_kmh if peso == "travel_time" else 3.6)
+            memo = {}
+
+            def heuristica(v):
+                # Várias arestas chegam ao mesmo nó: calcula h uma vez por nó.
+                x = memo.get(v)
+                if x is None:
+                    x = memo[v] = h(v)
+                return x
+        custo, pred, ultima = self._busca(c, s, t, peso, heuristica, metricas)
+        if metricas is not None:
+            metricas.tempo_busca += time.perf_counter() - inicio
+        if custo is None:
+            return None
+        arestas = [ultima]
+        while arestas[-1] in pred:
+            arestas.append(pred[arestas[-1]])
+        arestas.reverse()
+        return [int(c.ids[s])] + c.ids[c.alvos[arestas]].tolist()
+
+    def _busca(self, c, s, t, peso, heuristica, metricas=None):
+        offsets, alvos, w = c._listas(peso)
+        rumo = self._rumo_lista()
+        origem_de = self._origens_lista()
+        proibidas, obrigatorias = self.proibidas, self.obrigatorias
+        tabela = self._tabela_custos(peso)
+        inf = math.inf
+        dist = {}
+        pred = {}
+        fechadas = set()
+        heap = []
+        push, pop = heapq.heappush, heapq.heappop
+        remocoes = relaxadas = 0
+        for b in range(offsets[s], offsets[s + 1]):
+            if w[b] < dist.get(b, inf):
+                dist[b] = w[b]
+                push(heap, (w[b] if heuristica is None else w[b] + heuristica(alvos[b]), b))
+
+        while heap:
+            _, a = pop(heap)
+            remocoes += 1
+            if a in fechadas:
+                continue
+            v = alvos[a]
+            if v == t:
+                self.expandidos = len(fechadas) + 1
+                self._contar(metricas, remocoes, relaxadas, len(heap))
+                return dist[a], pred, a
+            fechadas.add(a)
+            relaxadas += offsets[v + 1] - offsets[v]
+            da = dist[a]
+            vetadas = proibidas.get(a)
+            unicas = obrigatorias.get(a)
+            restrita = vetadas is not None or unicas is not None
+            u = origem_de[a]
+            ra = rumo[a]
+            for b in range(offsets[v], offsets[v + 1]):
+                if restrita and ((vetadas is not None and b in vetadas) or
+                                 (unicas is not None and b not in unicas)):
+                    continue
+                nd = da + w[b]
+                if tabela is not None:
+                    x = alvos[b]
+                    delta = (rumo[b] - ra + 180.0) % 360.0 - 180.0
+                    if x == u or delta >= LIMIAR_RETORNO or delta <= -LIMIAR_RETORNO:
+                        nd += tabela[3]
+                    elif delta > LIMIAR_RETO:
+                        nd += tabela[1]
+                    elif delta < -LIMIAR_RETO:
+                        nd += tabela[2]
+                    else:
+                        nd += tabela[0]
+                if nd < dist.get(b, inf):
+                    dist[b] = nd
+                    pred[b] = a
+                    push(heap, (nd if heuristica is None else nd + heuristica(alvos[b]), b))
+        self.expandidos = len(fechadas)
+        self._contar(metricas, remocoes, relaxadas, 0)
+        return None, pred, None
+
+    def _contar(self, metricas, remocoes, relaxadas, restantes):
+        if metricas is not None:
+            metricas.fechados += self.expandidos
+            metricas.relaxadas += relaxadas
+            metricas.remocoes += remocoes
+            # Todo rótulo inserido foi removido ou ainda está no heap.
+            metricas.insercoes += remocoes + restantes
+
+    def _rumo_lista(self):
+        cache = self.compacto._cache_listas
+        if "rumo" not in cache or cache["rumo"][0] is not self.rumo:
+            cache["rumo"] = (self.rumo, self.rumo.tolist())
+        return cache["rumo"][1]
+
+    def _origens_lista(self):
+        cache = self.compacto._cache_listas
+        if "origens_lista" not in cache:
+            cache["origens_lista"] = self.compacto.origens().tolist()
+        return cache["origens_lista"]
+
+    # ------------------------
+    # Custo de rotas
+    # ------------------------
+    def arestas_do_caminho(self, rota, peso="travel_time", filtro=None):
+        """Arestas (índices do CSR) de uma rota (ids) com o menor custo em `peso`, conversões incluídas.
+
+        Entre arestas paralelas a escolha é feita por programação dinâmica ao
+        longo da rota, então o custo é o mesmo que a busca por arestas otimizou.
+        Retorna None se a rota passa por uma conversão proibida.
+        """
+        c = self.compacto.filtrado(filtro)
+        offsets, alvos, w = c._listas(peso)
+        inf = math.inf
+        custos = None
+        trechos = []
+        for a, b in zip(rota[:-1], rota[1:]):
+            u, v = c.indice[a], c.indice[b]
+            paralelas = [j for j in range(offsets[u], offsets[u + 1]) if alvos[j] == v and w[j] < inf]
+            anterior = {}
+            if custos is None:
+                atuais = {j: w[j] for j in paralelas}
+            else:
+                atuais = {}
+                for j in paralelas:
+                    custo, i = min((x + self.custo_conversao(i, j, peso), i) for i, x in custos.items())
+                    if custo < inf:
+                        atuais[j] = custo + w[j]
+                        anterior[j] = i
+            if not atuais:
+                return None
+            custos = atuais
+            trechos.append(anterior)
+        if custos is None:
+            return []
+        arestas = [min(custos, key=custos.get)]
+        for anterior in reversed(trechos[1:]):
+            arestas.append(anterior[arestas[-1]])
+        arestas.reverse()
+        return arestas
+
+    def custo_arestas(self, arestas, peso="travel_time"):
+        """Soma dos pesos das arestas e dos custos de conversão entre elas."""
+        total = sum(self.compacto.pesos[peso][arestas].tolist())
+        for a, b in zip(arestas[:-1], arestas[1:]):
+            total += self.custo_conversao(a, b, peso)
+        return total
+
+    def peso_caminho(self, rota, peso="travel_time", filtro=None):
+        """Peso da rota somando as conversões, pelas arestas de menor custo em `peso`."""
+        arestas = self.arestas_do_caminho(rota, peso, filtro)
+        return math.inf if arestas is None else self.custo_arestas(arestas, peso)
@@ -0,0 +1,258 @@
+"""Pool de processos de roteamento com o grafo em memória compartilhada.
+
+    with gm.executor(processos=8) as ex:
+        futuro = ex.submit(origem, destino, "tempo")      # concurrent.futures.Future
+        for r in ex.map(pares, "distancia"):               # resultados na ordem dos pares
+            print(r["rota"], r["distância"], r["tempo"])
+
+Os arrays do grafo compacto (CSR direto e reverso, pesos, coordenadas na
+esfera usadas pelas heurísticas) são copiados uma única vez para um bloco de
+multiprocessing.shared_memory. Os workers usam esse bloco sem cópia: herdado
+no fork ou anexado pelo nome nos outros métodos de início. As buscas leem os
+arrays por memoryview em vez das listas Python que cada processo montaria, de
+modo que a memória total fica praticamente constante com o número de workers.
+
+O grafo compartilhado é uma fotografia, somente leitura: perfis ou trânsito
+aplicados depois da criação do executor não chegam aos workers.
+"""
+import math
+import multiprocessing as mp
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from GrafoCompacto import GrafoCompacto
+
+CRITERIOS = {"distancia": "length", "distância": "length", "length": "length",
+             "tempo": "travel_time", "travel_time": "travel_time"}
+ALGORITMOS = ("dijkstra", "astar", "bidijkstra", "biastar")
+ALGORITMO_PADRAO = {"length": "dijkstra", "travel_time": "astar"}
+ALINHAMENTO = 64
+
+# Grafo (sobre a memória compartilhada) usado pelos workers do pool.
+_grafo = None
+
+
+def _inicializar(compartilhado):
+    global _grafo
+    _grafo = compartilhado.compacto if compartilhado is not None else None
+
+
+def _vista(arr):
+    # Acesso escalar por memoryview custa quase o mesmo que por lista Python,
+    # sem materializar um objeto por elemento em cada processo.
+    return memoryview(arr).cast("B").cast(arr.dtype.char)
+
+
+# ------------------------
+# Grafo em memória compartilhada
+# ------------------------
+class GrafoCompartilhado:
+    """Arrays de um GrafoCompacto num único bloco de shared_memory.
+
+    `compacto` é um GrafoCompacto cujos arrays apontam para o bloco, com os
+    caches de busca já preenchidos por memoryviews. Ao ser serializado (início
+    por spawn) só vão o nome do bloco e o layout; o outro processo se anexa.
+    """
+
+    def __init__(self, compacto):
+        arrays = self._arrays(compacto)
+        self.layout = {}
+        total = 0
+        for nome, arr in arrays.items():
+            self.layout[nome] = (total, arr.dtype.str, arr.shape)
+            total += -(-arr.nbytes // ALINHAMENTO) * ALINHAMENTO
+        self.classes = list(compacto.classes)
+        self.memoria = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        self._dono = True
+        for nome, arr in arrays.items():
+            self._array(nome)[...] = arr
+        self.compacto = self._montar()
+
+    @staticmethod
+    def _arrays(c):
+        offsets_r, alvos_r, arestas_r = c.reverso()
+        lat, lon = np.radians(c.y), np.radians(c.x)
+        arrays = {
+            "ids": c.ids, "x": c.x, "y": c.y, "offsets": c.offsets, "alvos": c.alvos,
+            "chaves": c.chaves, "classe": c.classe, "maxspeed": c.maxspeed, "osmid": c.osmid,
+            "offsets_r": offsets_r, "alvos_r": alvos_r, "arestas_r": arestas_r,
+            "esfera_x": np.cos(lat) * np.cos(lon), "esfera_y": np.cos(lat) * np.sin(lon),
+            "esfera_z": np.sin(lat),
+        }
+        for peso in GrafoCompacto.PESOS:
+            arrays[peso] = c.pesos[peso]
+            arrays[peso + "_r"] = c.pesos[peso][arestas_r]
+        return {nome: np.ascontiguousarray(arr) for nome, arr in arrays.items()}
+
+    @property
+    def nbytes(self):
+        return self.memoria.size
+
+    def _array(self, nome):
+        inicio, dtype, forma = self.layout[nome]
+        return np.ndarray(forma, dtype=np.dtype(dtype), buffer=self.memoria.buf, offset=inicio)
+
+    def _montar(self):
+        a = {nome: self._array(nome) for nome in self.layout}
+        c = GrafoCompacto(a["ids"], a["x"], a["y"], a["offsets"], a["alvos"],
+                          {peso: a[peso] for peso in GrafoCompacto.PESOS},
+                          chaves=a["chaves"], classe=a["classe"], classes=self.classes,
+                          maxspeed=a["maxspeed"], osmid=a["osmid"])
+        c._cache_listas["reverso"] = (a["offsets_r"], a["alvos_r"], a["arestas_r"])
+        c._cache_listas["esfera"] = (_vista(a["esfera_x"]), _vista(a["esfera_y"]), _vista(a["esfera_z"]))
+        for peso in GrafoCompacto.PESOS:
+            c._cache_listas[("csr", peso, False, None)] = (
+                _vista(a["offsets"]), _vista(a["alvos"]), _vista(a[peso]))
+            c._cache_listas[("csr", peso, True, None)] = (
+                _vista(a["offsets_r"]), _vista(a["alvos_r"]), _vista(a[peso + "_r"]))
+        return c
+
+    def __getstate__(self):
+        return {"nome": self.memoria.name, "layout": self.layout, "classes": self.classes}
+
+    def __setstate__(self, estado):
+        self.layout = estado["layout"]
+        self.classes = estado["classes"]
+        # Só o processo que criou o bloco o remove (os filhos usam o mesmo
+        # resource tracker do pai, que limpa o nome se ele terminar sem fechar).
+        self.memoria = shared_memory.SharedMemory(name=estado["nome"])
+        self._dono = False
+        self.compacto = self._montar()
+
+    def fechar(self):
+        self.compacto = None
+        try:
+            self.memoria.close()
+        except BufferError:
+            # Ainda há arrays vivos apontando para o bloco; o mapeamento some
+            # com o processo, o que importa é remover o nome abaixo.
+            pass
+        if self._dono:
+            self._dono = False
+            self.memoria.unlink()
+
+
+# ------------------------
+# Trabalho dos workers
+# ------------------------
+def _somar(c, caminho, peso):
+    # Menor aresta paralela entre nós consecutivos, como em peso_caminho.
+    offsets, alvos, w = c._listas(peso)
+    total = 0.0
+    for u, v in zip(caminho[:-1], caminho[1:]):
+        total += min(w[j] for j in range(offsets[u], offsets[u + 1]) if alvos[j] == v)
+    return total
+
+
+def _rota(s, t, peso, algoritmo):
+    c = _grafo
+    if algoritmo in ("dijkstra", "astar"):
+        heuristica = c.heuristica_haversine(t) if algoritmo == "astar" else None
+        custo, pred = c._busca(s, t, peso, heuristica)
+        caminho = None
+        if custo is not None:
+            caminho = [t]
+            while caminho[-1] != s:
+                caminho.append(pred[caminho[-1]])
+            caminho.reverse()
+    else:
+        potencial = c.potencial_bidirecional(s, t) if algoritmo == "biastar" else None
+        _, caminho = c._busca_bidirecional(s, t, peso, potencial)
+    if caminho is None:
+        return {"rota": None, "distância": math.inf, "tempo": math.inf}
+    return {"rota": c.ids[caminho].tolist(), "distância": _somar(c, caminho, "length"),
+            "tempo": _somar(c, caminho, "travel_time")}
+
+
+def _lote(pares, peso, algoritmo):
+    return [_rota(s, t, peso, algoritmo) for s, t in pares]
+
+
+# ------------------------
+# Executor
+# ------------------------
+class ExecutorRotas:
+    """submit/map de rotas sobre N processos que compartilham um único grafo.
+
+    Origens e destinos podem ser ids de nó ou coordenadas (lat, lon), ajustadas
+    à malha no processo principal. `criterio` é "distancia" ou "tempo" (ou o
+    nome do peso); o algoritmo padrão é o de calcular_rotas (Dijkstra para
+    distância, A* para tempo). Cada resultado é um dicionário com "rota"
+    (ids, ou None sem caminho), "distância" (m) e "tempo" (s).
+    """
+
+    def __init__(self, gm, processos=None, algoritmo=None, bloco=64):
+        if gm.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        if algoritmo is not None and algoritmo not in ALGORITMOS:
+            raise ValueError(f"Algoritmo '{algoritmo}' indisponível no executor; use {', '.join(ALGORITMOS)}")
+        self.gm = gm
+        self.algoritmo = algoritmo
+        self.bloco = bloco
+        self.processos = processos or os.cpu_count() or 1
+        self.compartilhado = GrafoCompartilhado(gm.compacto)
+        self._pool = None
+        if self.processos > 1:
+            metodos = mp.get_all_start_methods()
+            contexto = mp.get_context("fork" if "fork" in metodos else None)
+            self._pool = ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto,
+                                             initializer=_inicializar, initargs=(self.compartilhado,))
+        else:
+            _inicializar(self.compartilhado)
+
+    def _parametros(self, criterio):
+        peso = CRITERIOS.get(criterio)
+        if peso is None:
+            raise ValueError(f"Critério desconhecido: {criterio}")
+        return peso, self.algoritmo or ALGORITMO_PADRAO[peso]
+
+    def _executar(self, funcao, *args):
+        if self._pool is not None:
+            return self._pool.submit(funcao, *args)
+        futuro = Future()
+        try:
+            futuro.set_result(funcao(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def submit(self, origem, destino, criterio="tempo"):
+        """Future com o resultado da rota origem → destino."""
+        peso, algoritmo = self._parametros(criterio)
+        s, t = self.gm._resolver_indices([origem, destino])
+        return self._executar(_rota, s, t, peso, algoritmo)
+
+    def map(self, pares, criterio="tempo"):
+        """Resultados de todos os pares (origem, destino), na ordem de entrada.
+
+        Os pontos são ajustados à malha numa única consulta e os pares vão aos
+        workers em blocos de `bloco`, para diluir o custo de comunicação.
+        """
+        peso, algoritmo = self._parametros(criterio)
+        pares = list(pares)
+        indices = self.gm._resolver_indices([p for par in pares for p in par])
+        pares = list(zip(indices[0::2], indices[1::2]))
+        futuros = [self._executar(_lote, pares[i:i + self.bloco], peso, algoritmo)
+                   for i in range(0, len(pares), self.bloco)]
+
+        def resultados():
+            for f in futuros:
+                yield from f.result()
+        return resultados()
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        else:
+            _inicializar(None)
+        self.compartilhado.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
@@ -0,0 +1,36 @@
+import numpy as np
+
+ARTERIAIS = frozenset({"motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link"})
+
+# Perfis de filtro nomeados: conjunto de classes de via (highway) evitadas.
+PERFIS_FILTRO = {
+    "evitar_arteriais": ARTERIAIS,
+    "evitar_vias_expressas": frozenset({"motorway", "motorway_link", "trunk", "trunk_link"}),
+    "evitar_servico": frozenset({"service"}),
+}
+
+
+def normalizar_filtro(filtro):
+    """Converte um filtro no conjunto (frozenset) de classes evitadas; None se não filtra.
+
+    Aceita o nome de um perfil ("evitar_arteriais"), perfis combinados com "+"
+    ("evitar_arteriais+evitar_servico") ou uma coleção de nomes de perfil e/ou
+    classes de via ({"primary", "service"}). Combinar perfis une as classes
+    evitadas, ou seja, faz o E das máscaras.
+    """
+    if filtro is None:
+        return None
+    if isinstance(filtro, frozenset) and not (filtro & PERFIS_FILTRO.keys()):
+        return filtro or None
+    if isinstance(filtro, str):
+        filtro = filtro.split("+")
+    banidas = set()
+    for item in filtro:
+        banidas |= PERFIS_FILTRO.get(item, {item})
+    return frozenset(banidas) or None
+
+
+def mascara_classes(classe, classes, banidas):
+    """Array booleano por aresta: True onde a classe da via não está em `banidas`."""
+    codigos = [i for i, nome in enumerate(classes) if nome in banidas]
+    return ~np.isin(classe, codigos)
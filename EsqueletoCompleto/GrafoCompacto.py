@@ -0,0 +1,806 @@
+import heapq
+import math
+import time
+
+import numpy as np
+
+from FiltrosArestas import mascara_classes, normalizar_filtro
+from PerfisVelocidade import maxspeed_em_kmh
+
+RAIO_TERRA_M = 6371000.0
+
+
+class GrafoCompacto:
+    """Grafo de roteamento em arrays (formato CSR) construído a partir do MultiDiGraph.
+
+    As arestas que saem do nó de índice i ficam em alvos[offsets[i]:offsets[i + 1]],
+    com os pesos "length" e "travel_time" guardados em arrays float32 paralelos.
+    Os caminhos devolvidos usam os mesmos ids de nó do grafo do OSMnx.
+    """
+
+    PESOS = ("length", "travel_time")
+
+    def __init__(self, ids, x, y, offsets, alvos, pesos, chaves=None, classe=None, classes=None,
+                 maxspeed=None, osmid=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.alvos = np.asarray(alvos, dtype=np.int32)
+        self.pesos = {nome: np.asarray(arr, dtype=np.float32) for nome, arr in pesos.items()}
+        if chaves is None:
+            chaves = np.zeros(len(self.alvos), dtype=np.int32)
+        self.chaves = np.asarray(chaves, dtype=np.int32)
+        if classe is None:
+            classe = np.zeros(len(self.alvos), dtype=np.uint8)
+        self.classe = np.asarray(classe, dtype=np.uint8)
+        self.classes = list(classes or [""])
+        if maxspeed is None:
+            maxspeed = np.full(len(self.alvos), np.nan, dtype=np.float32)
+        self.maxspeed = np.asarray(maxspeed, dtype=np.float32)
+        if osmid is None:
+            osmid = np.full(len(self.alvos), -1, dtype=np.int64)
+        self.osmid = np.asarray(osmid, dtype=np.int64)
+        self._indice = None
+        self._cache_listas = {}
+        # Classes de via evitadas (frozenset) quando este objeto é uma visão filtrada.
+        self._filtro = None
+        # Nós fechados (settled) pela última busca ponto a ponto.
+        self.expandidos = 0
+
+    # ------------------------
+    # Construção
+    # ------------------------
+    @classmethod
+    def de_grafo(cls, G):
+        ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+        indice = {int(n): i for i, n in enumerate(ids.tolist())}
+
+        x = np.empty(len(ids), dtype=np.float64)
+        y = np.empty(len(ids), dtype=np.float64)
+        for i, (_, d) in enumerate(G.nodes(data=True)):
+            x[i] = float(d.get("x", d.get("lon")))
+            y[i] = float(d.get("y", d.get("lat")))
+
+        m = G.number_of_edges()
+        origens = np.empty(m, dtype=np.int32)
+        alvos = np.empty(m, dtype=np.int32)
+        chaves = np.empty(m, dtype=np.int32)
+        comprimento = np.empty(m, dtype=np.float32)
+        tempo = np.empty(m, dtype=np.float32)
+        classe = np.empty(m, dtype=np.uint8)
+        classes = {"": 0}
+        maxspeed = np.empty(m, dtype=np.int32)
+        valores_maxspeed = {}
+        osmid = np.empty(m, dtype=np.int64)
+        for j, (u, v, k, d) in enumerate(G.edges(keys=True, data=True)):
+            origens[j] = indice[u]
+            alvos[j] = indice[v]
+            chaves[j] = k
+            comprimento[j] = float(d.get("length", 0.0) or 0.0)
+            tempo[j] = float(d.get("travel_time", comprimento[j]))
+            hw = d.get("highway") or ""
+            if isinstance(hw, (list, tuple)):
+                hw = hw[0]
+            classe[j] = classes.setdefault(hw, len(classes))
+            ms = d.get("maxspeed")
+            if isinstance(ms, (list, tuple)):
+                ms = ms[0]
+            maxspeed[j] = valores_maxspeed.setdefault(ms, len(valores_maxspeed))
+            way = d.get("osmid", -1)
+            if isinstance(way, (list, tuple)):
+                way = way[0]
+            osmid[j] = int(way)
+
+        ordem = np.argsort(origens, kind="stable")
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origens, minlength=len(ids)), out=offsets[1:])
+
+        return cls(
+            ids, x, y, offsets, alvos[ordem],
+            {"length": comprimento[ordem], "travel_time": tempo[ordem]},
+            chaves=chaves[ordem],
+            classe=classe[ordem],
+            classes=list(classes),
+            maxspeed=maxspeed_em_kmh(list(valores_maxspeed))[maxspeed[ordem]],
+            osmid=osmid[ordem],
+        )
+
+    @property
+    def indice(self):
+        # Construído sob demanda: carregar um snapshot não precisa pagar este custo
+        # antes da primeira consulta.
+        if self._indice is None:
+            self._indice = {n: i for i, n in enumerate(self.ids.tolist())}
+        return self._indice
+
+    @property
+    def n_nos(self):
+        return len(self.ids)
+
+    @property
+    def n_arestas(self):
+        return len(self.alvos)
+
+    def _listas(self, peso, reverso=False):
+        return self._listas_filtro(peso, reverso, self._filtro)
+
+    def _listas_filtro(self, peso, reverso, filtro):
+        # Listas Python são bem mais rápidas que arrays NumPy para acesso escalar
+        # dentro do laço da busca; são criadas uma vez por peso e reaproveitadas.
+        chave = ("csr", peso, reverso, filtro)
+        if chave not in self._cache_listas:
+            if reverso:
+                offsets, alvos, arestas = self.reverso()
+                w = self.pesos[peso][arestas]
+            else:
+                offsets, alvos, arestas = self.offsets, self.alvos, None
+                w = self.pesos[peso]
+            if filtro is None:
+                self._cache_listas[chave] = (offsets.tolist(), alvos.tolist(), w.tolist())
+            else:
+                # Visão filtrada: mesmas listas de offsets/alvos, só os pesos mudam
+                # (inf nas arestas evitadas, que a busca nunca consegue relaxar).
+                base = self._listas_filtro(peso, reverso, None)
+                permitida = self.mascara(filtro)
+                if arestas is not None:
+                    permitida = permitida[arestas]
+                self._cache_listas[chave] = (base[0], base[1], np.where(permitida, w, np.inf).tolist())
+        return self._cache_listas[chave]
+
+    def mascara(self, filtro):
+        """Array booleano por aresta (True = permitida) para o filtro, em cache."""
+        banidas = normalizar_filtro(filtro)
+        if banidas is None:
+            return np.ones(self.n_arestas, dtype=bool)
+        chave = ("mascara", banidas)
+        if chave not in self._cache_listas:
+            self._cache_listas[chave] = mascara_classes(self.classe, self.classes, banidas)
+        return self._cache_listas[chave]
+
+    def filtrado(self, filtro):
+        """Visão do grafo que ignora as arestas das classes evitadas por `filtro`.
+
+        `filtro` é um perfil de FiltrosArestas ("evitar_arteriais"), uma
+        combinação ("evitar_arteriais+evitar_servico") ou um conjunto de classes
+        de via. Nada é copiado: a visão compartilha arrays, índice e caches com
+        este grafo, e todas as buscas funcionam sobre ela sem mudanças.
+        """
+        banidas = normalizar_filtro(filtro)
+        if banidas is None:
+            return self
+        if self._filtro is not None:
+            banidas = banidas | self._filtro
+        chave = ("visao", banidas)
+        if chave not in self._cache_listas:
+            visao = object.__new__(GrafoCompacto)
+            visao.__dict__.update(self.__dict__)
+            visao._indice = self.indice
+            visao._filtro = banidas
+            self._cache_listas[chave] = visao
+        return self._cache_listas[chave]
+
+    def reverso(self):
+        """CSR das arestas de entrada: (offsets, origens, índice da aresta no CSR direto)."""
+        if "reverso" not in self._cache_listas:
+            arestas = np.argsort(self.alvos, kind="stable")
+            offsets = np.zeros(self.n_nos + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.alvos, minlength=self.n_nos), out=offsets[1:])
+            self._cache_listas["reverso"] = (offsets, self.origens()[arestas], arestas)
+        return self._cache_listas["reverso"]
+
+    def origens(self):
+        """Índice do nó de origem de cada aresta do CSR."""
+        if "origens" not in self._cache_listas:
+            self._cache_listas["origens"] = np.repeat(
+                np.arange(self.n_nos, dtype=np.int32), np.diff(self.offsets))
+        return self._cache_listas["origens"]
+
+    def _vetores_unitarios(self):
+        # Posição de cada nó na esfera unitária: a corda entre dois nós é um limite
+        # inferior da distância haversine e não exige trigonometria por consulta.
+        if "esfera" not in self._cache_listas:
+            lat, lon = np.radians(self.y), np.radians(self.x)
+            self._cache_listas["esfera"] = (
+                (np.cos(lat) * np.cos(lon)).tolist(),
+                (np.cos(lat) * np.sin(lon)).tolist(),
+                np.sin(lat).tolist(),
+            )
+        return self._cache_listas["esfera"]
+
+    def invalidar_cache(self):
+        self._cache_listas.clear()
+
+    # ------------------------
+    # Atualização de pesos
+    # ------------------------
+    def arestas_entre(self, u, v, chave=None):
+        """Índices no CSR das arestas u→v (ids do OSM); todas as paralelas se chave=None."""
+        a, b = self.indice[u], self.indice[v]
+        inicio, fim = int(self.offsets[a]), int(self.offsets[a + 1])
+        js = inicio + np.flatnonzero(self.alvos[inicio:fim] == b)
+        if chave is not None:
+            js = js[self.chaves[js] == chave]
+        return js
+
+    def arestas_da_via(self, osmid):
+        """Índices no CSR das arestas que pertencem à via (way) `osmid` do OSM."""
+        if "ordem_osmid" not in self._cache_listas:
+            ordem = np.argsort(self.osmid, kind="stable")
+            self._cache_listas["ordem_osmid"] = (ordem, self.osmid[ordem])
+        ordem, ordenado = self._cache_listas["ordem_osmid"]
+        inicio = np.searchsorted(ordenado, osmid, side="left")
+        fim = np.searchsorted(ordenado, osmid, side="right")
+        return ordem[inicio:fim]
+
+    def atualizar_pesos(self, peso, arestas, valores):
+        """Troca o peso de algumas arestas no lugar, mantendo os caches de busca coerentes."""
+        arestas = np.asarray(arestas, dtype=np.int64)
+        valores = np.asarray(valores, dtype=np.float32)
+        if not self.pesos[peso].flags.writeable:
+            # Arrays mapeados do snapshot são somente leitura: copia na primeira escrita.
+            self.pesos[peso] = np.array(self.pesos[peso])
+        self.pesos[peso][arestas] = valores
+
+        posicao = None
+        for chave, lista in list(self._cache_listas.items()):
+            if not (isinstance(chave, tuple) and chave[0] == "csr" and chave[1] == peso):
+                continue
+            _, _, reverso, filtro = chave
+            js = arestas
+            if reverso:
+                if posicao is None:
+                    if "posicao_reversa" not in self._cache_listas:
+                        pos = np.empty(self.n_arestas, dtype=np.int64)
+                        pos[self.reverso()[2]] = np.arange(self.n_arestas)
+                        self._cache_listas["posicao_reversa"] = pos
+                    posicao = self._cache_listas["posicao_reversa"]
+                js = posicao[arestas]
+            vals = valores.tolist()
+            if filtro is not None:
+                # Arestas evitadas pelo filtro continuam com peso infinito na visão.
+                vals = np.where(self.mascara(filtro)[arestas], valores, np.inf).tolist()
+            w = lista[2]
+            for j, val in zip(js.tolist(), vals):
+                w[j] = val
+
+    def __getstate__(self):
+        # Os caches são derivados dos arrays; não vale a pena enviá-los a outro processo.
+        estado = dict(self.__dict__)
+        estado["_cache_listas"] = {}
+        estado["_indice"] = None
+        return estado
+
+    # ------------------------
+    # Buscas
+    # ------------------------
+    def _reconstruir(self, pred, s, t):
+        caminho = [t]
+        while caminho[-1] != s:
+            caminho.append(pred[caminho[-1]])
+        caminho.reverse()
+        return [int(self.ids[i]) for i in caminho]
+
+    def caminho_da_arvore(self, pred, s, t):
+        """Caminho s→t (ids) a partir do array `pred` de uma árvore enraizada em s."""
+        if t != s and pred[t] < 0:
+            return None
+        caminho = [t]
+        while caminho[-1] != s:
+            caminho.append(int(pred[caminho[-1]]))
+        caminho.reverse()
+        return [int(self.ids[i]) for i in caminho]
+
+    def _busca(self, s, t, peso, heuristica=None, metricas=None):
+        if metricas is not None:
+            return self._busca_instrumentada(s, t, peso, heuristica, metricas)
+        offsets, alvos, w = self._listas(peso)
+        dist = {s: 0.0}
+        pred = {}
+        fechados = set()
+        heap = [(0.0, s)] if heuristica is None else [(heuristica(s), s)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            _, u = pop(heap)
+            if u in fechados:
+                continue
+            if u == t:
+                self.expandidos = len(fechados) + 1
+                return dist[u], pred
+            fechados.add(u)
+            du = dist[u]
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos[j]
+                nd = du + w[j]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    push(heap, (nd if heuristica is None else nd + heuristica(v), v))
+        self.expandidos = len(fechados)
+        return None, pred
+
+    def _busca_instrumentada(self, s, t, peso, heuristica, metricas):
+        """Mesma busca de `_busca`, contando o trabalho feito em `metricas`.
+
+        Fica separada para que o laço normal não pague pelos contadores.
+        """
+        relogio = time.perf_counter
+        inicio = relogio()
+        offsets, alvos, w = self._listas(peso)
+        if heuristica is not None:
+            h_original = heuristica
+
+            def heuristica(v):
+                t0 = relogio()
+                valor = h_original(v)
+                metricas.tempo_heuristica += relogio() - t0
+                return valor
+
+        dist = {s: 0.0}
+        pred = {}
+        fechados = set()
+        heap = [(0.0, s)] if heuristica is None else [(heuristica(s), s)]
+        push, pop = heapq.heappush, heapq.heappop
+        relaxadas = 0
+        insercoes = 1
+        remocoes = 0
+        custo = None
+
+        while heap:
+            _, u = pop(heap)
+            remocoes += 1
+            if u in fechados:
+                continue
+            if u == t:
+                custo = dist[u]
+                fechados.add(u)
+                break
+            fechados.add(u)
+            du = dist[u]
+            for j in range(offsets[u], offsets[u + 1]):
+                relaxadas += 1
+                v = alvos[j]
+                nd = du + w[j]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    push(heap, (nd if heuristica is None else nd + heuristica(v), v))
+                    insercoes += 1
+
+        self.expandidos = len(fechados)
+        metricas.fechados += len(fechados)
+        metricas.relaxadas += relaxadas
+        metricas.insercoes += insercoes
+        metricas.remocoes += remocoes
+        metricas.tempo_busca += relogio() - inicio
+        return custo, pred
+
+    def heuristica_haversine(self, t, vmax_kmh=120.0):
+        """Limite inferior do tempo até t: distância em linha reta / vmax."""
+        ex, ey, ez = self._vetores_unitarios()
+        xt, yt, zt = ex[t], ey[t], ez[t]
+        fator = RAIO_TERRA_M / (vmax_kmh * 1000.0 / 3600.0)
+        sqrt = math.sqrt
+
+        def h(v):
+            dx, dy, dz = ex[v] - xt, ey[v] - yt, ez[v] - zt
+            return fator * sqrt(dx * dx + dy * dy + dz * dz)
+        return h
+
+    def dijkstra(self, origem, destino, peso="length", metricas=None):
+        s, t = self.indice[origem], self.indice[destino]
+        custo, pred = self._busca(s, t, peso, metricas=metricas)
+        if custo is None:
+            return None
+        return self._reconstruir(pred, s, t)
+
+    def astar(self, origem, destino, peso="travel_time", heuristica=None, vmax_kmh=120.0,
+              metricas=None):
+        s, t = self.indice[origem], self.indice[destino]
+        if heuristica is None:
+            heuristica = self.heuristica_haversine(t, vmax_kmh)
+        custo, pred = self._busca(s, t, peso, heuristica, metricas)
+        if custo is None:
+            return None
+        return self._reconstruir(pred, s, t)
+
+    def potencial_bidirecional(self, s, t, vmax_kmh=120.0):
+        """Potencial médio p(v) = (h_t(v) - h_s(v)) / 2 para o A* bidirecional.
+
+        h_t é a linha reta até t e h_s a linha reta desde s (ambas / vmax). A
+        frente usa p e a busca reversa usa -p: as duas ficam consistentes com o
+        mesmo grafo de custos reduzidos, e a parada volta a ser a do Dijkstra
+        bidirecional.
+        """
+        ex, ey, ez = self._vetores_unitarios()
+        xs, ys, zs = ex[s], ey[s], ez[s]
+        xt, yt, zt = ex[t], ey[t], ez[t]
+        fator = 0.5 * RAIO_TERRA_M / (vmax_kmh * 1000.0 / 3600.0)
+        sqrt = math.sqrt
+
+        def p(v):
+            x, y, z = ex[v], ey[v], ez[v]
+            return fator * (sqrt((x - xt) ** 2 + (y - yt) ** 2 + (z - zt) ** 2)
+                            - sqrt((x - xs) ** 2 + (y - ys) ** 2 + (z - zs) ** 2))
+        return p
+
+    def _busca_bidirecional(self, s, t, peso, potencial=None, metricas=None):
+        """Dijkstra (ou A*, com `potencial`) simultâneo a partir de s e de t.
+
+        A busca reversa anda pelo CSR das arestas de entrada, então mão única e
+        arestas paralelas são tratadas como no sentido direto. Retorna
+        (custo, caminho em índices) ou (None, None).
+        """
+        inicio = time.perf_counter() if metricas is not None else 0.0
+        if s == t:
+            self.expandidos = 1
+            return 0.0, [s]
+        listas = (self._listas(peso), self._listas(peso, reverso=True))
+        sinal = (1.0, -1.0)
+        p = potencial
+        if p is not None and metricas is not None:
+            relogio = time.perf_counter
+
+            def p(v):
+                t0 = relogio()
+                valor = potencial(v)
+                metricas.tempo_heuristica += relogio() - t0
+                return valor
+
+        dist =({s: 0.0}, {t: 0.0})
+        pred = ({}, {})
+        fechados = (set(), set())
+        heaps = ([(p(s) if p else 0.0, s)], [(-p(t) if p else 0.0, t)])
+        push, pop = heapq.heappush, heapq.heappop
+        melhor, encontro = math.inf, None
+        remocoes = relaxadas = 0
+
+        while heaps[0] and heaps[1]:
+            # Com potenciais p e -p a soma dos topos é um limite inferior para
+            # qualquer caminho ainda não visto, como no Dijkstra bidirecional.
+            if heaps[0][0][0] + heaps[1][0][0] >= melhor:
+                break
+            lado = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            _, u = pop(heaps[lado])
+            remocoes += 1
+            fl = fechados[lado]
+            if u in fl:
+                continue
+            fl.add(u)
+            dl, pl, do = dist[lado], pred[lado], dist[1 - lado]
+            offsets, alvos, w = listas[lado]
+            relaxadas += offsets[u + 1] - offsets[u]
+            du = dl[u]
+            heap = heaps[lado]
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos[j]
+                nd = du + w[j]
+                if nd < dl.get(v, math.inf):
+                    dl[v] = nd
+                    pl[v] = u
+                    push(heap, (nd if p is None else nd + sinal[lado] * p(v), v))
+                    outro = do.get(v)
+                    if outro is not None and nd + outro < melhor:
+                        melhor, encontro = nd + outro, v
+
+        self.expandidos = len(fechados[0]) + len(fechados[1])
+        if metricas is not None:
+            metricas.fechados += self.expandidos
+            metricas.relaxadas += relaxadas
+            metricas.remocoes += remocoes
+            # Toda inserção foi removida ou ainda está em um dos heaps.
+            metricas.insercoes += remocoes + len(heaps[0]) + len(heaps[1])
+            metricas.tempo_busca += time.perf_counter() - inicio
+        if encontro is None:
+            return None, None
+        ida = [encontro]
+        while ida[-1] != s:
+            ida.append(pred[0][ida[-1]])
+        ida.reverse()
+        while ida[-1] != t:
+            ida.append(pred[1][ida[-1]])
+        return melhor, ida
+
+    def bidijkstra(self, origem, destino, peso="length", metricas=None):
+        custo, caminho = self._busca_bidirecional(
+            self.indice[origem], self.indice[destino], peso, metricas=metricas)
+        if caminho is None:
+            return None
+        return [int(self.ids[i]) for i in caminho]
+
+    def biastar(self, origem, destino, peso="travel_time", vmax_kmh=120.0, metricas=None):
+        s, t = self.indice[origem], self.indice[destino]
+        custo, caminho = self._busca_bidirecional(
+            s, t, peso, self.potencial_bidirecional(s, t, vmax_kmh), metricas)
+        if caminho is None:
+            return None
+        return [int(self.ids[i]) for i in caminho]
+
+    def pareto(self, origem, destino, epsilon=0.0, vmax_kmh=120.0, metricas=None):
+        """Rotas não dominadas em (tempo, distância) numa única busca multicritério.
+
+        Cada rótulo carrega as duas somas, então as métricas das rotas saem da
+        própria busca. Os rótulos saem do heap em ordem lexicográfica de
+        (tempo + h_tempo, distância + h_dist); como num nó eles chegam com tempo
+        crescente, um rótulo só é dominado se sua distância não for menor que a
+        menor já fechada ali (ou, com o limite inferior, no destino). `epsilon`
+        > 0 só afrouxa a comparação com o destino: descarta rótulos cujo limite
+        inferior de distância não melhora em (1 + epsilon) a melhor rota já
+        encontrada. Nos nós intermediários a dominância é exata, então o erro
+        não se acumula ao longo do caminho: toda rota da fronteira completa tem
+        na resposta uma rota pelo menos tão rápida e no máximo (1 + epsilon)
+        vezes mais longa; em particular a última é no máximo (1 + epsilon) vezes
+        a mais curta, e a primeira é a mais rápida exata.
+
+        Retorna uma lista de {"rota", "tempo", "distância"} do mais rápido ao
+        mais curto (vazia se não há caminho).
+        """
+        inicio = time.perf_counter() if metricas is not None else 0.0
+        s, t = self.indice[origem], self.indice[destino]
+        offsets, alvos, w_t = self._listas("travel_time")
+        w_d = self._listas("length")[2]
+        ex, ey, ez = self._vetores_unitarios()
+        xt, yt, zt = ex[t], ey[t], ez[t]
+        fator_t = RAIO_TERRA_M / (vmax_kmh * 1000.0 / 3600.0)
+        sqrt = math.sqrt
+        # A tolerância só vale contra o destino (ver acima).
+        folga = 1.0 / (1.0 + epsilon)
+
+        # Rótulos em listas paralelas: nó, tempo, distância, rótulo pai.
+        r_no, r_t, r_d, r_pai = [s], [0.0], [0.0], [-1]
+        corda = sqrt((ex[s] - xt) ** 2 + (ey[s] - yt) ** 2 + (ez[s] - zt) ** 2)
+        heap = [(corda * fator_t, corda * RAIO_TERRA_M, 0)]
+        melhor_d = {}
+        no_destino = []
+        push, pop = heapq.heappush, heapq.heappop
+        remocoes = relaxadas = fechados = 0
+
+        while heap:
+            _, fd, r = pop(heap)
+            remocoes += 1
+            u = r_no[r]
+            du = r_d[r]
+            # Dominado por um rótulo já fechado no nó ou, pelo limite inferior, no destino.
+            if du >= melhor_d.get(u, math.inf) or fd >= melhor_d.get(t, math.inf) * folga:
+                continue
+            melhor_d[u] = du
+            fechados += 1
+            if u == t:
+                no_destino.append(r)
+                continue
+            tu = r_t[r]
+            relaxadas += offsets[u + 1] - offsets[u]
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos[j]
+                nd = du + w_d[j]
+                if nd >= melhor_d.get(v, math.inf):
+                    continue
+                c = sqrt((ex[v] - xt) ** 2 + (ey[v] - yt) ** 2 + (ez[v] - zt) ** 2)
+                limite_d = nd + c * RAIO_TERRA_M
+                if limite_d >= melhor_d.get(t, math.inf) * folga:
+                    continue
+                nt = tu + w_t[j]
+                r_no.append(v)
+                r_t.append(nt)
+                r_d.append(nd)
+                r_pai.append(r)
+                push(heap, (nt + c * fator_t, limite_d, len(r_no) - 1))
+
+        self.expandidos = fechados
+        if metricas is not None:
+            metricas.fechados += fechados
+            metricas.relaxadas += relaxadas
+            metricas.remocoes += remocoes
+            metricas.insercoes += len(r_no)
+            metricas.tempo_busca += time.perf_counter() - inicio
+
+        rotas = []
+        for r in no_destino:
+            caminho = []
+            x = r
+            while x >= 0:
+                caminho.append(int(self.ids[r_no[x]]))
+                x = r_pai[x]
+            caminho.reverse()
+            rotas.append({"rota": caminho, "tempo": r_t[r], "distância": r_d[r]})
+        return rotas
+
+    def arvore(self, s, peso="travel_time", reverso=False, limite=math.inf):
+        """Dijkstra completo a partir do índice s (ou até s, se reverso=True).
+
+        Retorna arrays (dist, pred) de tamanho n_nos; nós não alcançados (ou além
+        de `limite`) ficam com dist = inf e pred = -1.
+        """
+        offsets, alvos, w = self._listas(peso, reverso)
+        dist = [math.inf] * self.n_nos
+        pred = [-1] * self.n_nos
+        dist[s] = 0.0
+        heap = [(0.0, s)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            du, u = pop(heap)
+            if du > dist[u]:
+                continue
+            if du > limite:
+                break
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos[j]
+                nd = du + w[j]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = u
+                    push(heap, (nd, v))
+
+        dist = np.array(dist)
+        pred = np.array(pred, dtype=np.int64)
+        fora = dist > limite
+        dist[fora] = math.inf
+        pred[fora] = -1
+        return dist, pred
+
+    def alcance(self, fontes, limite, peso="travel_time", reverso=False):
+        """Dijkstra a partir de várias fontes (índices) que para em `limite`.
+
+        Só os nós assentados com custo ≤ limite são visitados e guardados, então o
+        trabalho é proporcional à área alcançada e não ao grafo. Retorna arrays
+        (índices, custos) na ordem em que os nós foram assentados.
+        """
+        offsets, alvos, w = self._listas(peso, reverso)
+        dist = {}
+        heap = []
+        for s in fontes:
+            if s not in dist:
+                dist[s] = 0.0
+                heap.append((0.0, s))
+        heapq.heapify(heap)
+        push, pop = heapq.heappush, heapq.heappop
+        assentados = []
+        custos = []
+
+        while heap:
+            du, u = pop(heap)
+            if du > dist[u]:
+                continue
+            if du > limite:
+                break
+            assentados.append(u)
+            custos.append(du)
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos[j]
+                nd = du + w[j]
+                if nd <= limite and nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    push(heap, (nd, v))
+        self.expandidos = len(assentados)
+        return np.array(assentados, dtype=np.int64), np.array(custos, dtype=np.float64)
+
+    def alternativas(self, origem, destino, peso="travel_time", k=3, esticamento=0.25,
+                     compartilhamento=0.7, plateau_min=0.1):
+        """Até k rotas (a ótima primeiro) pelo método dos platôs.
+
+        Uma árvore a partir da origem e outra (reversa) até o destino, ambas
+        limitadas a (1 + esticamento) × ótimo. Um platô é uma cadeia de arestas
+        presente nas duas árvores; cada platô define a rota origem → platô →
+        destino, ótima em cada trecho. Aceitamos, da melhor para a pior pontuação
+        (custo − comprimento do platô), as rotas com:
+          - custo ≤ (1 + esticamento) × ótimo;
+          - platô ≥ plateau_min × ótimo (otimalidade local ao redor do desvio);
+          - trecho em comum com cada rota já escolhida ≤ compartilhamento × ótimo.
+
+        Retorna uma lista de {"rota", "custo", "compartilhado"}, onde
+        "compartilhado" é a fração do custo da rota que coincide com a ótima.
+        """
+        s, t = self.indice[origem], self.indice[destino]
+        otimo, _ = self._busca_bidirecional(s, t, peso)
+        if otimo is None:
+            return []
+        limite = (1.0 + esticamento) * otimo
+        df, pf = self.arvore(s, peso, limite=limite)
+        db, pb = self.arvore(t, peso, reverso=True, limite=limite)
+
+        # Na árvore reversa pb[v] é o próximo nó de v rumo ao destino; a aresta
+        # v → pb[v] está num platô quando também é aresta da árvore direta.
+        v = np.flatnonzero((pb >= 0) & np.isfinite(df) & (df + db <= limite))
+        w = pb[v]
+        plateau = pf[w] == v
+        prox = np.full(self.n_nos, -1, dtype=np.int64)
+        prox[v[plateau]] = w[plateau]
+        tem_anterior = np.zeros(self.n_nos, dtype=bool)
+        tem_anterior[w[plateau]] = True
+        inicios = np.flatnonzero((prox >= 0) & ~tem_anterior).tolist()
+
+        # A rota ótima (árvore reversa a partir da origem) entra sempre, e primeiro.
+        candidatos = [(-math.inf, otimo, s)]
+        prox_l = prox.tolist()
+        for a in inicios:
+            if a == s:
+                continue
+            b = a
+            while prox_l[b] >= 0:
+                b = prox_l[b]
+            comprimento = float(df[b] - df[a])
+            custo = float(df[a] + db[a])
+            if comprimento >= plateau_min * otimo:
+                candidatos.append((custo - comprimento, custo, a))
+        candidatos.sort()
+
+        pf_l, pb_l, df_l, db_l = pf.tolist(), pb.tolist(), df.tolist(), db.tolist()
+
+        def montar(a):
+            # Árvore direta até a, depois segue pb (platô + árvore reversa) até t.
+            ida = [a]
+            while ida[-1] != s:
+                ida.append(pf_l[ida[-1]])
+            ida.reverse()
+            while ida[-1] != t:
+                ida.append(pb_l[ida[-1]])
+            # Custo de cada aresta a partir das distâncias nas árvores.
+            arestas = {}
+            for x, y in zip(ida[:-1], ida[1:]):
+                arestas[(x, y)] = df_l[y] - df_l[x] if pf_l[y] == x else db_l[x] - db_l[y]
+            return ida, arestas
+
+        escolhidas = []
+        for _, custo, a in candidatos:
+            if len(escolhidas) >= k:
+                break
+            caminho, arestas = montar(a)
+            if len(set(caminho)) != len(caminho):
+                continue  # ida e volta se cruzam: não é um caminho simples
+            comum = [sum(c for e, c in arestas.items() if e in outra) for _, outra, _ in escolhidas]
+            if any(x > compartilhamento * otimo for x in comum):
+                continue
+            escolhidas.append((caminho, arestas, custo))
+
+        ref = escolhidas[0][1]
+        return [{
+            "rota": [int(self.ids[i]) for i in caminho],
+            "custo": custo,
+            "compartilhado": sum(c for e, c in arestas.items() if e in ref) / custo if custo else 1.0,
+        } for caminho, arestas, custo in escolhidas]
+
+    def um_para_muitos(self, s, alvos, peso="travel_time", secundario="length"):
+        """Dijkstra a partir do índice s que para assim que todos os alvos forem assentados.
+
+        Retorna {índice: (custo em `peso`, soma de `secundario` no mesmo caminho)}
+        para os alvos alcançáveis.
+        """
+        offsets, alvos_csr, w = self._listas(peso)
+        w2 = self._listas(secundario)[2]
+        dist = {s: 0.0}
+        dist2 = {s: 0.0}
+        restantes = set(alvos)
+        resultado = {}
+        heap = [(0.0, s)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap and restantes:
+            du, u = pop(heap)
+            if du > dist[u]:
+                continue
+            if u in restantes:
+                restantes.discard(u)
+                resultado[u] = (du, dist2[u])
+            d2u = dist2[u]
+            for j in range(offsets[u], offsets[u + 1]):
+                v = alvos_csr[j]
+                nd = du + w[j]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    dist2[v] = d2u + w2[j]
+                    push(heap, (nd, v))
+        return resultado
+
+    # ------------------------
+    # Métricas
+    # ------------------------
+    def peso_caminho(self, rota, peso):
+        """Soma o peso do caminho usando a menor aresta paralela (como nx.path_weight)."""
+        offsets, alvos, w = self._listas(peso)
+        total = 0.0
+        for a, b in zip(rota[:-1], rota[1:]):
+            u, v = self.indice[a], self.indice[b]
+            total += min(w[j] for j in range(offsets[u], offsets[u + 1]) if alvos[j] == v)
+        return total
@@ -1,12 +1,81 @@
-import osmnx as ox
-import networkx as nx
-import math
+import numpy as np
+import json
+import os
 import re
+import time
+
+from CacheRotas import CacheRotas
+from FiltrosArestas import normalizar_filtro
+from GrafoCompacto import GrafoCompacto
+from GrafoParticionado import GrafoParticionado, caminho_ladrilhos, particionar
+from HierarquiaContracao import HierarquiaContracao, caminho_hierarquia
+from IndiceEspacial import IndiceEspacial
+from Instrumentacao import Instrumentacao, MetricasBusca
+from Landmarks import Landmarks, caminho_landmarks
+from MatrizRotas import calcular_matriz
+from PerfisVelocidade import PERFIS, calcular_tempos, interpretar_maxspeed, maxspeed_em_kmh, versao_perfil
+from SnapshotGrafo import caminho_snapshot, carregar_snapshot, ler_cabecalho, salvar_snapshot, snapshot_valido
+
+# osmnx (e com ele networkx, pandas, sklearn), shapely e matplotlib são
+# importados só nos métodos que precisam deles: baixar ou ler GraphML, plotar,
+# isócronas. Carregar o snapshot e rotear usa apenas NumPy (e SciPy, se houver).
+
+# Buscas por nó sem estrutura auxiliar: qualquer uma delas pode ser respondida
+# pela árvore de caminhos mínimos a partir da origem (cache_arvores).
+ALGORITMOS_POR_NO = ("dijkstra", "astar", "bidijkstra", "biastar")
+
 
 class GrafoManager:
-    def __init__(self, arquivo="grafo_brasilia.graphml"):
-        self.grafo = None
+    def __init__(self, arquivo="grafo_brasilia.graphml", cache_arvores=False, perfil="padrao",
+                 instrumentar=False):
+        if perfil not in PERFIS:
+            raise ValueError(f"Perfil de velocidade desconhecido: {perfil}")
+        self.perfil = perfil
+        self._grafo = None
+        self._arquivo_pendente = None
+        self.compacto = None
+        self.particionado = None
+        self._espacial = None
+        self._renderizador = None
+        self._hierarquias = {}
+        self._landmarks = {}
+        self._horarios = None
+        self._conversoes = None
         self.arquivo = arquivo
+        # Qualquer mudança no grafo ou nos pesos incrementa a versão; ela faz parte
+        # das chaves do cache, então rotas calculadas antes nunca são reaproveitadas.
+        self.versao = 0
+        self.cache = CacheRotas()
+        self.cache_arvores = cache_arvores
+        self.arquivo_trafego = os.path.splitext(arquivo)[0] + ".trafego.jsonl"
+        self.ultimo_instante_trafego = None
+        # Contadores de trabalho por consulta (nós fechados, heap, tempos por fase).
+        # Desligada, as buscas seguem pelo caminho sem contadores.
+        self.instrumentacao = Instrumentacao(ativo=instrumentar)
+        self._tempo_snapping = 0.0
+        # Tolerância da busca bicritério ("pareto"): a rota mais rápida é sempre
+        # exata; as demais podem ser trocadas por uma pelo menos tão rápida e no
+        # máximo 1% mais longa (inclusive a mais curta), o que mantém a fronteira
+        # pequena.
+        self.epsilon_pareto = 0.01
+
+    # O MultiDiGraph só é necessário para plotar; quando o grafo vem do snapshot
+    # binário ele é lido do GraphML apenas no primeiro acesso.
+    @property
+    def grafo(self):
+        if self._grafo is None and self._arquivo_pendente:
+            import osmnx as ox
+            arquivo, self._arquivo_pendente = self._arquivo_pendente, None
+            G = ox.load_graphml(arquivo)
+            # O grafo compacto é a referência: já reflete perfil e trânsito aplicados.
+            self._copiar_tempos_para_grafo(G)
+            self._grafo = G
+        return self._grafo
+
+    @grafo.setter
+    def grafo(self, G):
+        self._grafo = G
+        self._arquivo_pendente = None
 
     # ------------------------
     # Sanitização de ponto
@@ -38,133 +107,777 @@ class GrafoManager:
     # ------------------------
     def baixar_grafo(self, ponto_central, distancia=3000):
         try:
+            import osmnx as ox
             ponto_central = self._sanitize_point(ponto_central)
             print(f"Ponto central usado: {ponto_central} | Distância: {distancia} m")
             G = ox.graph_from_point(ponto_central, dist=distancia, network_type="drive", simplify=True)
             self.adicionar_tempo_ao_grafo(G)
             ox.save_graphml(G, self.arquivo)
-            self.grafo = G
+            self._definir_grafo(G)
+            self._salvar_snapshot(self.arquivo)
             print("Grafo baixado e salvo com sucesso.")
         except Exception as e:
             print("Erro ao baixar ou salvar o grafo:", repr(e))
 
-    def carregar_grafo(self, arquivo=None):
+    def importar_osm(self, arquivo_osm, ponto_central=None, distancia=None):
+        """Como baixar_grafo, mas a partir de um extrato OSM local (.osm ou .pbf), sem rede."""
+        try:
+            import osmnx as ox
+            from Conversoes import caminho_restricoes, salvar_restricoes
+            from IngestaoOSM import grafo_de_osm
+            if ponto_central is not None:
+                ponto_central = self._sanitize_point(ponto_central)
+                distancia = 3000 if distancia is None else distancia
+                print(f"Ponto central usado: {ponto_central} | Distância: {distancia} m")
+            restricoes = []
+            G = grafo_de_osm(arquivo_osm, ponto_central, distancia, restricoes=restricoes)
+            self.adicionar_tempo_ao_grafo(G)
+            ox.save_graphml(G, self.arquivo)
+            salvar_restricoes(restricoes, caminho_restricoes(self.arquivo))
+            self._definir_grafo(G)
+            self._salvar_snapshot(self.arquivo)
+            print(f"Grafo importado de {arquivo_osm} e salvo com sucesso "
+                  f"({G.number_of_nodes()} nós, {G.number_of_edges()} arestas, "
+                  f"{len(restricoes)} restrições de conversão).")
+        except Exception as e:
+            print("Erro ao importar o extrato OSM:", repr(e))
+
+    def carregar_grafo(self, arquivo=None, usar_snapshot=True):
         arquivo = arquivo or self.arquivo
         try:
+            snapshot = caminho_snapshot(arquivo)
+            if usar_snapshot and snapshot_valido(snapshot, arquivo):
+                self.compacto = carregar_snapshot(snapshot)
+                self.particionado = None
+                if ler_cabecalho(snapshot).get("versao_tempo") != self._versao_tempo():
+                    self._recalcular_tempos_compacto()
+                self._nova_versao()
+                self._grafo = None
+                self._arquivo_pendente = arquivo if os.path.exists(arquivo) else None
+                print("Grafo carregado do snapshot com sucesso.")
+                return
+
+            import osmnx as ox
             G = ox.load_graphml(arquivo)
             self.adicionar_tempo_ao_grafo(G)
-            self.grafo = G
+            self._definir_grafo(G)
+            if usar_snapshot:
+                self._salvar_snapshot(arquivo)
             print("Grafo carregado com sucesso.")
         except Exception as e:
             print("Erro ao carregar o grafo:", repr(e))
 
+    def _definir_grafo(self, G):
+        self.grafo = G
+        self.compacto = GrafoCompacto.de_grafo(G)
+        self.particionado = None
+        self._nova_versao()
+
+    def _nova_versao(self):
+        self.versao += 1
+        self.cache.limpar()
+
+    def _salvar_snapshot(self, arquivo):
+        try:
+            salvar_snapshot(self.compacto, caminho_snapshot(arquivo), arquivo, self._versao_tempo())
+        except Exception as e:
+            print("Aviso: não foi possível salvar o snapshot:", repr(e))
+
+    # ------------------------
+    # Grafo em ladrilhos
+    # ------------------------
+    def particionar(self, tamanho_grau=0.05, diretorio=None):
+        """Grava o grafo atual em ladrilhos geográficos (ver GrafoParticionado).
+
+        Carregado do snapshot, o grafo está mapeado em disco e as arestas são
+        lidas em blocos: a região não precisa caber na memória para ser particionada.
+        """
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        diretorio = diretorio or caminho_ladrilhos(self.arquivo)
+        particionar(self.compacto, diretorio, tamanho_grau)
+        print(f"Grafo particionado em {diretorio}")
+
+    def carregar_particionado(self, diretorio=None, max_ladrilhos=64):
+        """Usa o grafo em ladrilhos para rotear, lendo só as regiões que a busca alcança."""
+        diretorio = diretorio or caminho_ladrilhos(self.arquivo)
+        try:
+            self.particionado = GrafoParticionado(diretorio, max_ladrilhos=max_ladrilhos)
+            self.compacto = None
+            self.grafo = None
+            self._nova_versao()
+            print("Grafo particionado carregado com sucesso.")
+        except Exception as e:
+            print("Erro ao carregar o grafo particionado:", repr(e))
+
     # ------------------------
     # Travel time
     # ------------------------
     def _parse_maxspeed(self, val):
-        if val is None:
-            return None
+        if isinstance(val, (list, tuple)):
+            val = val[0]
         try:
-            if isinstance(val, (list, tuple)):
-                val = val[0]
-            if isinstance(val, str):
-                m = re.search(r'(\d+)', val)
-                if m:
-                    return float(m.group(1))
-                else:
-                    return None
-            return float(val)
-        except Exception:
+            return interpretar_maxspeed(val)
+        except TypeError:
             return None
 
+    def _versao_tempo(self):
+        # Muda quando o perfil de velocidades muda; o snapshot guarda esta versão.
+        return versao_perfil(PERFIS[self.perfil])
+
     def adicionar_tempo_ao_grafo(self, G=None):
         if G is None:
             G = self.grafo
         if G is None:
             return
 
-        velocidades = {
-            "motorway": 120,
-            "trunk": 90,
-            "primary": 60,
-            "secondary": 40,
-            "tertiary": 30,
-            "residential": 20,
-            "service": 15,
-        }
-
-        for u, v, k, data in G.edges(keys=True, data=True):
-            comprimento = data.get("length", 0.0) or data.get("distance", 1.0)
-            maxspeed = data.get("maxspeed")
-            parsed = self._parse_maxspeed(maxspeed)
-
+        # Uma única passada extrai as colunas; highway e maxspeed são codificados
+        # por valor distinto, então cada string de maxspeed é lida uma só vez.
+        dados, comprimentos, cod_hw, cod_ms = [], [], [], []
+        classes, valores_ms = {}, {}
+        for _, _, data in G.edges(data=True):
+            dados.append(data)
+            comprimentos.append(data.get("length", 0.0) or data.get("distance", 1.0))
             hw = data.get("highway")
             if isinstance(hw, (list, tuple)):
                 hw = hw[0]
+            cod_hw.append(classes.setdefault(hw, len(classes)))
+            ms = data.get("maxspeed")
+            if isinstance(ms, (list, tuple)):
+                ms = ms[0]
+            cod_ms.append(valores_ms.setdefault(ms, len(valores_ms)))
 
-            velocidade_kmh = parsed or velocidades.get(hw, 30)
-            if hw == "residential":
-                velocidade_kmh *= 0.7
+        if dados:
+            tempos = calcular_tempos(
+                comprimentos,
+                np.array(cod_hw),
+                list(classes),
+                maxspeed_em_kmh(list(valores_ms))[np.array(cod_ms)],
+                PERFIS[self.perfil],
+            )
+            for data, tempo in zip(dados, tempos.tolist()):
+                data["travel_time"] = tempo
 
-            velocidade_m_s = max(velocidade_kmh * 1000.0 / 3600.0, 1.0)
-            data["travel_time"] = comprimento / velocidade_m_s
+        if G is self._grafo:
+            self.compacto = GrafoCompacto.de_grafo(G)
+            self._nova_versao()
+
+    def _recalcular_tempos_compacto(self):
+        c = self.compacto
+        tempos = calcular_tempos(c.pesos["length"], c.classe, c.classes, c.maxspeed, PERFIS[self.perfil])
+        c.pesos["travel_time"] = tempos.astype(np.float32)
+        c.invalidar_cache()
+
+    def aplicar_perfil(self, nome):
+        """Troca o perfil de velocidade recalculando travel_time direto nos arrays."""
+        if nome not in PERFIS:
+            raise ValueError(f"Perfil de velocidade desconhecido: {nome}")
+        self.perfil = nome
+        if self.compacto is None:
+            return
+        self._recalcular_tempos_compacto()
+        if self._grafo is not None:
+            self._copiar_tempos_para_grafo(self._grafo)
+        # Hierarquia e landmarks de travel_time foram montados com o perfil anterior.
+        self._hierarquias.pop("travel_time", None)
+        self._landmarks.pop("travel_time", None)
+        self._nova_versao()
+
+    def _copiar_tempos_para_grafo(self, G, arestas=None):
+        c = self.compacto
+        if arestas is None:
+            arestas = np.arange(c.n_arestas)
+        origens = c.ids[c.origens()[arestas]].tolist()
+        alvos = c.ids[c.alvos[arestas]].tolist()
+        for u, v, k, tempo in zip(origens, alvos, c.chaves[arestas].tolist(),
+                                  c.pesos["travel_time"][arestas].tolist()):
+            G[u][v][k]["travel_time"] = tempo
+
+    # ------------------------
+    # Trânsito em tempo real
+    # ------------------------
+    def atualizar_velocidades(self, deltas, instante=None, registrar=True):
+        """Aplica velocidades observadas em algumas arestas, sem reconstruir o grafo.
+
+        Cada delta é um dict com "velocidade_kmh" (None devolve a aresta ao perfil)
+        e a aresta: "u", "v" e opcionalmente "chave", ou "osmid" (todas as arestas
+        da via). O custo é proporcional ao número de arestas alteradas. Cada chamada
+        incrementa gm.versao e, com registrar=True, é anexada ao log de trânsito
+        para ser reproduzida por reproduzir_log() após um reinício.
+        Retorna o número de arestas alteradas.
+        """
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        c = self.compacto
+        instante = time.time() if instante is None else float(instante)
+        normalizados, arestas, tempos = [], [], []
+        for delta in deltas:
+            if "osmid" in delta:
+                d = {"osmid": int(delta["osmid"])}
+                js = c.arestas_da_via(d["osmid"])
+            else:
+                d = {"u": int(delta["u"]), "v": int(delta["v"])}
+                if delta.get("chave") is not None:
+                    d["chave"] = int(delta["chave"])
+                js = c.arestas_entre(d["u"], d["v"], d.get("chave"))
+            kmh = delta.get("velocidade_kmh")
+            d["velocidade_kmh"] = None if kmh is None else float(kmh)
+            normalizados.append(d)
+
+            comprimento = c.pesos["length"][js].astype(np.float64)
+            if kmh is None:
+                novos = calcular_tempos(comprimento, c.classe[js], c.classes, c.maxspeed[js],
+                                        PERFIS[self.perfil])
+            else:
+                # Velocidade observada é a final: sem fatores do perfil.
+                novos = np.where(comprimento > 0, comprimento, 1.0) / max(float(kmh) / 3.6, 1.0)
+            arestas.append(js)
+            tempos.append(novos)
+
+        if not arestas:
+            return 0
+        arestas = np.concatenate(arestas)
+        tempos = np.concatenate(tempos)
+        c.atualizar_pesos("travel_time", arestas, tempos)
+
+        if self._grafo is not None:
+            self._copiar_tempos_para_grafo(self._grafo, arestas)
+
+        # Hierarquia e landmarks de travel_time deixam de valer com os novos pesos.
+        self._hierarquias.pop("travel_time", None)
+        self._landmarks.pop("travel_time", None)
+        self._nova_versao()
+        self.ultimo_instante_trafego = instante
+
+        if registrar:
+            with open(self.arquivo_trafego, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"instante": instante, "deltas": normalizados}) + "\n")
+        return len(arestas)
+
+    def reproduzir_log(self, arquivo=None, desde=None):
+        """Reaplica o log de trânsito (entradas com instante > desde) em ordem."""
+        arquivo = arquivo or self.arquivo_trafego
+        if not os.path.exists(arquivo):
+            return 0
+        aplicadas = 0
+        with open(arquivo, encoding="utf-8") as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                entrada = json.loads(linha)
+                if desde is not None and entrada["instante"] <= desde:
+                    continue
+                self.atualizar_velocidades(entrada["deltas"], instante=entrada["instante"], registrar=False)
+                aplicadas += 1
+        return aplicadas
 
     # ------------------------
     # Obter nó mais próximo
     # ------------------------
+    def indice_espacial(self):
+        if self.compacto is not None:
+            nos = self.compacto
+        elif self.particionado is not None:
+            # Grafo em ladrilhos: só ids e coordenadas dos nós, sem o grafo inteiro.
+            nos = self.particionado.coordenadas_nos()
+        else:
+            raise RuntimeError("Grafo não carregado")
+        # Reconstruído apenas quando o grafo é trocado.
+        if self._espacial is None or self._espacial.compacto is not nos:
+            self._espacial = IndiceEspacial(nos)
+        return self._espacial
+
     def obter_no_mais_proximo(self, lat, lon):
-        if self.grafo is None:
+        return int(self.obter_nos_mais_proximos(lat, lon)[0])
+
+    def obter_nos_mais_proximos(self, lats, lons):
+        """Versão vetorizada: recebe arrays/listas de lat e lon e devolve um array de ids."""
+        if not self.instrumentacao.ativo:
+            return self.indice_espacial().nos_mais_proximos(lats, lons)
+        t0 = time.perf_counter()
+        nos = self.indice_espacial().nos_mais_proximos(lats, lons)
+        dt = time.perf_counter() - t0
+        self.instrumentacao.registrar_tempo("snapping", dt)
+        # Entra nas métricas da próxima chamada a calcular_rotas.
+        self._tempo_snapping += dt
+        return nos
+
+    def obter_arestas_mais_proximas(self, lats, lons):
+        if self.compacto is None:
+            raise RuntimeError("Ajuste a arestas requer o grafo compacto (indisponível no grafo particionado)")
+        return self.indice_espacial().arestas_mais_proximas(lats, lons)
+
+    # ------------------------
+    # Renderização
+    # ------------------------
+    def renderizador(self, **opcoes):
+        """Renderizador (Agg, sem janela) com a malha desenhada uma vez; ver Renderizador."""
+        from Renderizador import Renderizador
+        if self.compacto is None:
             raise RuntimeError("Grafo não carregado")
-        return ox.distance.nearest_nodes(self.grafo, lon, lat)
+        r = self._renderizador
+        if r is None or r.compacto is not self.compacto or opcoes:
+            r = self._renderizador = Renderizador(self.compacto, **opcoes)
+        return r
 
     # ------------------------
-    # Distância haversine
+    # Contraction Hierarchies
     # ------------------------
-    def _haversine_m(self, u, v):
-        G = self.grafo
-        lat1, lon1 = float(G.nodes[u].get("y", G.nodes[u].get("lat"))), float(G.nodes[u].get("x", G.nodes[u].get("lon")))
-        lat2, lon2 = float(G.nodes[v].get("y", G.nodes[v].get("lat"))), float(G.nodes[v].get("x", G.nodes[v].get("lon")))
-        R = 6371000
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi, dlambda = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
-        a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        return 2 * R * math.asin(math.sqrt(a))
+    def preparar_ch(self, pesos=("length", "travel_time"), verbose=False):
+        """Carrega (ou gera e salva ao lado do grafo) as hierarquias dos pesos pedidos."""
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        for peso in pesos:
+            arquivo = caminho_hierarquia(self.arquivo, peso)
+            ch = HierarquiaContracao.carregar(arquivo, self.compacto)
+            if ch is None:
+                ch = HierarquiaContracao.construir(self.compacto, peso, verbose=verbose)
+                ch.salvar(arquivo)
+            self._hierarquias[peso] = ch
+
+    def hierarquia(self, peso):
+        ch = self._hierarquias.get(peso)
+        if ch is None or ch.compacto is not self.compacto:
+            ch = HierarquiaContracao.carregar(caminho_hierarquia(self.arquivo, peso), self.compacto)
+            if ch is None:
+                raise RuntimeError(f"Hierarquia de '{peso}' não preparada; chame preparar_ch()")
+            self._hierarquias[peso] = ch
+        return ch
+
+    # ------------------------
+    # ALT (landmarks)
+    # ------------------------
+    def preparar_alt(self, pesos=("travel_time",), quantidade=16, metodo="avoid"):
+        """Carrega (ou seleciona e salva ao lado do grafo) os landmarks dos pesos pedidos."""
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        for peso in pesos:
+            arquivo = caminho_landmarks(self.arquivo, peso)
+            lm = Landmarks.carregar(arquivo, self.compacto)
+            if lm is None or len(lm.indices) != quantidade:
+                lm = Landmarks.construir(self.compacto, peso, quantidade=quantidade, metodo=metodo)
+                lm.salvar(arquivo)
+            self._landmarks[peso] = lm
+
+    def landmarks(self, peso):
+        lm = self._landmarks.get(peso)
+        if lm is None or lm.compacto is not self.compacto:
+            lm = Landmarks.carregar(caminho_landmarks(self.arquivo, peso), self.compacto)
+            if lm is None:
+                raise RuntimeError(f"Landmarks de '{peso}' não preparados; chame preparar_alt()")
+            self._landmarks[peso] = lm
+        return lm
 
     # ------------------------
     # Calcular rotas
     # ------------------------
-    def calcular_rotas(self, origem, destino):
-        if self.grafo is None:
+    def _buscar(self, origem, destino, peso, algoritmo, filtro=None):
+        """Retorna (rota, MetricasBusca ou None se a instrumentação estiver desligada)."""
+        metricas = MetricasBusca() if self.instrumentacao.ativo else None
+        chave_alg = algoritmo if filtro is None else (algoritmo, filtro)
+        rota = self.cache.obter_rota(origem, destino, peso, chave_alg, self.versao)
+        if rota is None:
+            rota = self._buscar_sem_cache(origem, destino, peso, algoritmo, metricas, filtro)
+            self.cache.guardar_rota(origem, destino, peso, chave_alg, self.versao, rota)
+        elif metricas is not None:
+            metricas.cache = True
+        if metricas is not None:
+            self.instrumentacao.registrar_busca(algoritmo, peso, metricas)
+        return rota, metricas
+
+    def _motor(self):
+        return self.compacto if self.compacto is not None else self.particionado
+
+    def _buscar_sem_cache(self, origem, destino, peso, algoritmo, metricas=None, filtro=None):
+        if self.compacto is None:
+            # Grafo em ladrilhos: só Dijkstra e A* (as estruturas auxiliares pedem o grafo inteiro).
+            if algoritmo not in ("dijkstra", "astar") or filtro is not None:
+                raise ValueError(f"Algoritmo '{algoritmo}' indisponível no grafo particionado")
+            return self._conferir_rota(
+                getattr(self.particionado, algoritmo)(origem, destino, peso=peso, metricas=metricas),
+                origem, destino)
+
+        # Visão sem as arestas evitadas; sem filtro é o próprio grafo compacto.
+        c = self.compacto.filtrado(filtro)
+        if self.cache_arvores and algoritmo in ALGORITMOS_POR_NO:
+            # Uma árvore um-para-todos responde qualquer destino a partir da origem
+            # (só para as buscas exatas por nó; as demais seguem para o seu motor).
+            s = c.indice[origem]
+            chave_peso = peso if filtro is None else (peso, filtro)
+            pred = self.cache.obter_arvore(origem, chave_peso, self.versao)
+            if pred is None:
+                _, pred = c.arvore(s, peso)
+                self.cache.guardar_arvore(origem, chave_peso, self.versao, pred)
+            rota = c.caminho_da_arvore(pred, s, c.indice[destino])
+        elif algoritmo == "dijkstra":
+            rota = c.dijkstra(origem, destino, peso=peso, metricas=metricas)
+        elif algoritmo == "astar":
+            rota = c.astar(origem, destino, peso=peso, metricas=metricas)
+        elif algoritmo == "bidijkstra":
+            rota = c.bidijkstra(origem, destino, peso=peso, metricas=metricas)
+        elif algoritmo == "biastar":
+            rota = c.biastar(origem, destino, peso=peso, metricas=metricas)
+        elif algoritmo == "ch":
+            if filtro is not None:
+                raise ValueError("A hierarquia é pré-calculada sem filtros; use outro algoritmo")
+            rota = self.hierarquia(peso).rota(origem, destino, metricas=metricas)
+        elif algoritmo == "conversoes":
+            # Busca por arestas: restrições do OSM e custo de conversão.
+            rota = self.conversoes().rota(origem, destino, peso=peso, filtro=filtro, metricas=metricas)
+        elif algoritmo == "alt":
+            # Tirar arestas só aumenta distâncias: os limites dos landmarks continuam válidos.
+            lm = self.landmarks(peso)
+            s, t = c.indice[origem], c.indice[destino]
+            rota = c.astar(origem, destino, peso=peso, heuristica=lm.heuristica(s, t),
+                           metricas=metricas)
+        else:
+            raise ValueError(f"Algoritmo desconhecido: {algoritmo}")
+        return self._conferir_rota(rota, origem, destino)
+
+    def _medir_rota(self, motor, rota, peso, algoritmo, filtro=None):
+        """(distância, tempo) da rota; com "conversoes", pelas arestas que a busca
+        escolheria e com o custo das conversões no tempo."""
+        if algoritmo == "conversoes":
+            conv = self.conversoes()
+            arestas = conv.arestas_do_caminho(rota, peso, filtro)
+            return conv.custo_arestas(arestas, "length"), conv.custo_arestas(arestas, "travel_time")
+        return motor.peso_caminho(rota, "length"), motor.peso_caminho(rota, "travel_time")
+
+    @staticmethod
+    def _conferir_rota(rota, origem, destino):
+        if rota is None:
+            raise ValueError(f"Sem caminho entre {origem} e {destino}")
+        return rota
+
+    def _fronteira(self, origem, destino, epsilon, filtro=None):
+        """Fronteira de Pareto (tempo × distância) com cache; retorna (rotas, MetricasBusca)."""
+        if self.compacto is None:
+            raise ValueError("Busca bicritério indisponível no grafo particionado")
+        metricas = MetricasBusca() if self.instrumentacao.ativo else None
+        chave = ("pareto", origem, destino, epsilon, filtro, self.versao)
+        frente = self.cache.rotas.obter(chave)
+        if frente is None:
+            frente = self.compacto.filtrado(filtro).pareto(origem, destino, epsilon=epsilon,
+                                                           metricas=metricas)
+            self.cache.rotas.guardar(chave, frente)
+        elif metricas is not None:
+            metricas.cache = True
+        if metricas is not None:
+            self.instrumentacao.registrar_busca("pareto", "length+travel_time", metricas)
+        if not frente:
+            raise ValueError(f"Sem caminho entre {origem} e {destino}")
+        return frente, metricas
+
+    def calcular_rotas_pareto(self, origem, destino, epsilon=None, evitar=None):
+        """Rotas não dominadas entre a mais rápida e a mais curta, numa única busca.
+
+        Retorna uma lista de (rota, métricas) ordenada da mais rápida para a mais
+        curta; as métricas vêm da própria busca.
+        """
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return []
+        try:
+            epsilon = self.epsilon_pareto if epsilon is None else epsilon
+            frente, _ = self._fronteira(origem, destino, epsilon, normalizar_filtro(evitar))
+            return [(list(r["rota"]), {
+                "nós rota": len(r["rota"]),
+                "distância": r["distância"],
+                "tempo": r["tempo"],
+                "versão": self.versao
+            }) for r in frente]
+        except Exception as e:
+            print("Erro ao calcular rotas:", repr(e))
+            return []
+
+    def calcular_alternativas(self, origem, destino, peso="travel_time", k=3, esticamento=0.25,
+                              compartilhamento=0.7, evitar=None):
+        """Até k rotas distintas (a ótima primeiro), de uma busca direta e uma reversa.
+
+        Ver GrafoCompacto.alternativas. Retorna uma lista de (rota, métricas).
+        """
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return []
+        try:
+            filtro = normalizar_filtro(evitar)
+            chave = ("alternativas", origem, destino, peso, k, esticamento, compartilhamento, filtro,
+                     self.versao)
+            alternativas = self.cache.rotas.obter(chave)
+            if alternativas is None:
+                alternativas = self.compacto.filtrado(filtro).alternativas(
+                    origem, destino, peso=peso, k=k, esticamento=esticamento,
+                    compartilhamento=compartilhamento)
+                self.cache.rotas.guardar(chave, alternativas)
+            resultado = []
+            for alt in alternativas:
+                rota = list(alt["rota"])
+                resultado.append((rota, {
+                    "nós rota": len(rota),
+                    "distância": self.compacto.peso_caminho(rota, "length"),
+                    "tempo": self.compacto.peso_caminho(rota, "travel_time"),
+                    "compartilhado": alt["compartilhado"],
+                    "versão": self.versao
+                }))
+            return resultado
+        except Exception as e:
+            print("Erro ao calcular rotas:", repr(e))
+            return []
+
+    def calcular_rotas(self, origem, destino, algoritmo_dist="dijkstra", algoritmo_tempo="astar",
+                       evitar=None):
+        """Rotas de menor distância e de menor tempo.
+
+        `evitar` é um perfil de filtro ("evitar_arteriais", "evitar_servico",
+        combinações com "+") ou um conjunto de classes de via a ignorar.
+        """
+        motor = self._motor()
+        if motor is None:
             print("Grafo não carregado!")
             return None, None, None, None
         try:
-            # Dijkstra → menor distância
-            rota_dist = nx.dijkstra_path(self.grafo, origem, destino, weight="length")
-            dist_d = nx.path_weight(self.grafo, rota_dist, weight="length")
-            tempo_d = nx.path_weight(self.grafo, rota_dist, weight="travel_time")
+            filtro = normalizar_filtro(evitar)
+            if filtro is not None:
+                if self.compacto is None:
+                    raise ValueError("Filtros de vias indisponíveis no grafo particionado")
+                motor = self.compacto.filtrado(filtro)
+            instrumentar = self.instrumentacao.ativo
+            relogio = time.perf_counter
 
-            # A* → menor tempo
-            vmax_kmh = 120.0
-            vmax_ms = vmax_kmh * 1000.0 / 3600.0
-            def heur(u, v):
-                return self._haversine_m(u, v) / vmax_ms
+            if algoritmo_dist == algoritmo_tempo == "pareto":
+                # Uma só busca bicritério: as pontas da fronteira são a rota mais
+                # curta (a até epsilon_pareto da distância mínima) e a mais rápida,
+                # já com as duas somas acumuladas.
+                frente, busca_d = self._fronteira(origem, destino, self.epsilon_pareto, filtro)
+                curta, rapida = frente[-1], frente[0]
+                rota_dist, dist_d, tempo_d = list(curta["rota"]), curta["distância"], curta["tempo"]
+                rota_tempo, dist_a, tempo_a = list(rapida["rota"]), rapida["distância"], rapida["tempo"]
+                busca_a, peso_d, peso_a = busca_d, 0.0, 0.0
+            else:
+                # Menor distância com algoritmo_dist (por nós, CH, ALT ou com conversões)
+                rota_dist, busca_d = self._buscar(origem, destino, "length", algoritmo_dist, filtro)
+                t0 = relogio() if instrumentar else 0.0
+                dist_d, tempo_d = self._medir_rota(motor, rota_dist, "length", algoritmo_dist, filtro)
+                peso_d = relogio() - t0 if instrumentar else 0.0
 
-            rota_tempo = nx.astar_path(self.grafo, origem, destino, heuristic=heur, weight="travel_time")
-            dist_a = nx.path_weight(self.grafo, rota_tempo, weight="length")
-            tempo_a = nx.path_weight(self.grafo, rota_tempo, weight="travel_time")
+                # Menor tempo com algoritmo_tempo, despachado como em _buscar_sem_cache
+                rota_tempo, busca_a = self._buscar(origem, destino, "travel_time", algoritmo_tempo, filtro)
+                t0 = relogio() if instrumentar else 0.0
+                dist_a, tempo_a = self._medir_rota(motor, rota_tempo, "travel_time", algoritmo_tempo, filtro)
+                peso_a = relogio() - t0 if instrumentar else 0.0
 
             m_d = {
                 "nós rota": len(rota_dist),
                 "distância": dist_d,
-                "tempo": tempo_d
+                "tempo": tempo_d,
+                "versão": self.versao
             }
             m_a = {
                 "nós rota": len(rota_tempo),
                 "distância": dist_a,
-                "tempo": tempo_a
+                "tempo": tempo_a,
+                "versão": self.versao
             }
 
+            if instrumentar:
+                snapping, self._tempo_snapping = self._tempo_snapping, 0.0
+                for m, busca, t_peso in ((m_d, busca_d, peso_d), (m_a, busca_a, peso_a)):
+                    m["busca"] = busca.como_dict()
+                    m["busca"]["tempo peso caminho (s)"] = t_peso
+                    m["busca"]["tempo snapping (s)"] = snapping
+                    self.instrumentacao.registrar_tempo("peso_caminho", t_peso)
+
             return rota_dist, rota_tempo, m_d, m_a
         except Exception as e:
             print("Erro ao calcular rotas:", repr(e))
             return None, None, None, None
+
+    # ------------------------
+    # Matriz origem-destino
+    # ------------------------
+    def _resolver_indices(self, pontos):
+        """Aceita ids de nó ou coordenadas (lat, lon); coordenadas são ajustadas em lote."""
+        pontos = list(pontos)
+        coords = [i for i, p in enumerate(pontos) if isinstance(p, (list, tuple, str))]
+        indices = [None] * len(pontos)
+        if coords:
+            latlon = [self._sanitize_point(pontos[i]) for i in coords]
+            idx, _ = self.indice_espacial().indices_mais_proximos(
+                [p[0] for p in latlon], [p[1] for p in latlon])
+            for i, j in zip(coords, idx.tolist()):
+                indices[i] = j
+        for i, p in enumerate(pontos):
+            if indices[i] is None:
+                indices[i] = self.compacto.indice[int(p)]
+        return indices
+
+    def calcular_matriz(self, origens, destinos, peso="travel_time", processos=None):
+        """Matrizes N x M de distância (m) e tempo (s) entre origens e destinos.
+
+        As rotas minimizam `peso` ("travel_time" ou "length"); a outra grandeza é
+        medida ao longo da mesma rota. Pares sem caminho ficam com inf.
+        """
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        secundario = "length" if peso == "travel_time" else "travel_time"
+        custo, outro = calcular_matriz(
+            self.compacto,
+            self._resolver_indices(origens),
+            self._resolver_indices(destinos),
+            peso=peso,
+            secundario=secundario,
+            processos=processos,
+        )
+        if peso == "length":
+            return custo, outro
+        return outro, custo
+
+    # ------------------------
+    # Conversões (busca por arestas)
+    # ------------------------
+    def preparar_conversoes(self, custos=None, restricoes=None):
+        """Configura o algoritmo "conversoes": custos por tipo de conversão (s) e restrições.
+
+        Sem `restricoes`, usa as salvas ao lado do grafo por importar_osm
+        (<grafo>.restricoes.json). Ver Conversoes.
+        """
+        from Conversoes import GrafoConversoes, caminho_restricoes, carregar_restricoes
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        if restricoes is None:
+            restricoes = carregar_restricoes(caminho_restricoes(self.arquivo))
+        self._conversoes = GrafoConversoes(self.compacto, restricoes, custos)
+        # Rotas já em cache com "conversoes" usavam outros custos.
+        self._nova_versao()
+        return self._conversoes
+
+    def conversoes(self):
+        """GrafoConversoes do grafo atual; refeito (com as restrições salvas) se o grafo mudou."""
+        from Conversoes import GrafoConversoes, caminho_restricoes, carregar_restricoes
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        if self._conversoes is None or self._conversoes.compacto is not self.compacto:
+            custos = self._conversoes.custos if self._conversoes is not None else None
+            self._conversoes = GrafoConversoes(
+                self.compacto, carregar_restricoes(caminho_restricoes(self.arquivo)), custos)
+        return self._conversoes
+
+    # ------------------------
+    # Horário de partida
+    # ------------------------
+    def perfis_horarios(self):
+        """Perfis de velocidade por faixa de 15 min (ver TempoDependente).
+
+        Usa os perfis salvos ao lado do grafo (.horarios.npz), se houver; senão um
+        perfil por classe de via entre o perfil atual e o de pico num dia útil.
+        """
+        from TempoDependente import PerfisHorarios, caminho_horarios
+        if self.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        if self._horarios is not None and self._horarios[0] == self.perfil \
+                and self._horarios[1].compacto is self.compacto:
+            return self._horarios[1]
+        horarios = PerfisHorarios.carregar(caminho_horarios(self.arquivo), self.compacto)
+        if horarios is None:
+            horarios = PerfisHorarios.por_classe(self.compacto, livre=self.perfil)
+        self._horarios = (self.perfil, horarios)
+        return horarios
+
+    def calcular_rota_partida(self, origem, destino, partida, algoritmo="astar", evitar=None):
+        """Rota mais rápida saindo no horário `partida` ("07:30", datetime ou segundos do dia).
+
+        Retorna (rota, métricas) com distância, tempo, partida e chegada, ou (None, None).
+        """
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return None, None
+        try:
+            from TempoDependente import formatar_horario, interpretar_horario
+            horarios = self.perfis_horarios()
+            rota, tempo = horarios.rota(origem, destino, partida, algoritmo, normalizar_filtro(evitar))
+            if rota is None:
+                raise ValueError(f"Sem caminho entre {origem} e {destino}")
+            inicio = interpretar_horario(partida)
+            return rota, {
+                "nós rota": len(rota),
+                "distância": self.compacto.peso_caminho(rota, "length"),
+                "tempo": tempo,
+                "partida": formatar_horario(inicio),
+                "chegada": formatar_horario(inicio + tempo),
+                "versão": self.versao
+            }
+        except Exception as e:
+            print("Erro ao calcular rota com horário de partida:", repr(e))
+            return None, None
+
+    def perfil_de_viagem(self, origem, destino, inicio="00:00", fim="24:00", passo=900, evitar=None):
+        """Tempo de viagem origem → destino em função do horário de partida.
+
+        Retorna (partidas em s do dia, durações em s), amostradas a cada `passo` s.
+        """
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return None, None
+        try:
+            return self.perfis_horarios().perfil_viagem(origem, destino, inicio, fim, passo,
+                                                        filtro=normalizar_filtro(evitar))
+        except Exception as e:
+            print("Erro ao calcular perfil de viagem:", repr(e))
+            return None, None
+
+    # ------------------------
+    # Execução paralela
+    # ------------------------
+    def executor(self, processos=None, algoritmo=None, bloco=64):
+        """Pool com o grafo atual em memória compartilhada (submit/map com futures); ver ExecutorRotas."""
+        from ExecutorRotas import ExecutorRotas
+        return ExecutorRotas(self, processos=processos, algoritmo=algoritmo, bloco=bloco)
+
+    # ------------------------
+    # Isócronas
+    # ------------------------
+    @staticmethod
+    def _lista_de_pontos(origens):
+        # Um único id ou uma única coordenada (lat, lon) viram lista de um ponto.
+        if isinstance(origens, (int, np.integer, str)):
+            return [origens]
+        if isinstance(origens, tuple) and len(origens) == 2 and \
+                all(isinstance(v, (float, np.floating)) for v in origens):
+            return [origens]
+        return list(origens)
+
+    def calcular_isocrona(self, origens, faixas=(300, 600), peso="travel_time",
+                          geometria="poligono", evitar=None):
+        """Área alcançável a partir de uma ou mais origens, por faixa de custo.
+
+        `origens` aceita ids de nó ou coordenadas (lat, lon); várias origens
+        formam uma única isócrona (busca com múltiplas fontes). As faixas são
+        limites em `peso` (segundos para travel_time) e a busca para na maior.
+        Ver Isocronas.isocrona para o formato do resultado.
+        """
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return None
+        try:
+            from Isocronas import isocrona
+            fontes = self._resolver_indices(self._lista_de_pontos(origens))
+            return isocrona(self.compacto.filtrado(normalizar_filtro(evitar)), fontes, faixas,
+                            peso=peso, geometria=geometria)
+        except Exception as e:
+            print("Erro ao calcular isócrona:", repr(e))
+            return None
+
+    def calcular_isocronas(self, origens, faixas=(300, 600), peso="travel_time",
+                           geometria="poligono", evitar=None, processos=None):
+        """Uma isócrona independente por origem, em paralelo com processos > 1."""
+        if self.compacto is None:
+            print("Grafo não carregado!")
+            return []
+        try:
+            from Isocronas import isocronas_em_lote
+            return isocronas_em_lote(self.compacto.filtrado(normalizar_filtro(evitar)),
+                                     self._resolver_indices(origens), faixas, peso=peso,
+                                     geometria=geometria, processos=processos)
+        except Exception as e:
+            print("Erro ao calcular isócronas:", repr(e))
+            return []
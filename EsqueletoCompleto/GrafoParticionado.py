@@ -0,0 +1,315 @@
+import heapq
+import json
+import math
+import os
+import shutil
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from GrafoCompacto import RAIO_TERRA_M
+
+VERSAO_FORMATO = 1
+
+
+def caminho_ladrilhos(arquivo):
+    return os.path.splitext(arquivo)[0] + ".ladrilhos"
+
+
+# ------------------------
+# Particionamento
+# ------------------------
+def particionar(compacto, diretorio, tamanho_grau=0.05, bloco_nos=1 << 18):
+    """Divide o grafo compacto em ladrilhos geográficos de `tamanho_grau` graus.
+
+    Cada ladrilho guarda seus nós e TODAS as arestas que saem deles, inclusive
+    as que atravessam a fronteira: para essas fica registrado o id, o ladrilho
+    e as coordenadas do nó de destino. Assim uma busca atravessa ladrilhos sem
+    perder arestas e o resultado é o mesmo do grafo monolítico.
+
+    Os nós são lidos em blocos de `bloco_nos`, e as arestas de cada bloco vão
+    para arquivos parciais do seu ladrilho. Com o compacto mapeado do snapshot
+    (o padrão de `carregar_grafo`), só as tabelas por nó ficam inteiras em
+    memória; os arrays das arestas nunca são materializados de uma vez.
+    """
+    lat0, lon0 = float(compacto.y.min()), float(compacto.x.min())
+    linha = np.floor((compacto.y - lat0) / tamanho_grau).astype(np.int64)
+    coluna = np.floor((compacto.x - lon0) / tamanho_grau).astype(np.int64)
+    n_colunas = int(coluna.max()) + 1 if compacto.n_nos else 1
+    ladrilho = linha * n_colunas + coluna
+    del linha, coluna
+
+    temp = diretorio + ".tmp"
+    shutil.rmtree(temp, ignore_errors=True)
+    partes = os.path.join(temp, "partes")
+    os.makedirs(partes)
+
+    # Blocos em ordem crescente de nó e ordenação estável dentro de cada bloco:
+    # nos ladrilhos os nós (e suas arestas, já agrupadas por origem no CSR)
+    # mantêm a ordem original.
+    tipos = {}
+    for ini in range(0, compacto.n_nos, bloco_nos):
+        fim = min(ini + bloco_nos, compacto.n_nos)
+        offsets = np.asarray(compacto.offsets[ini:fim + 1])
+        e0, e1 = int(offsets[0]), int(offsets[-1])
+        grau = np.diff(offsets)
+        lad_nos = ladrilho[ini:fim]
+        lad_arestas = np.repeat(lad_nos, grau)
+        destino = np.asarray(compacto.alvos[e0:e1])
+        nos = {"ids": compacto.ids[ini:fim], "x": compacto.x[ini:fim],
+               "y": compacto.y[ini:fim], "grau": grau}
+        arestas = {
+            "alvo_id": compacto.ids[destino],
+            "alvo_ladrilho": ladrilho[destino],
+            "alvo_x": compacto.x[destino],
+            "alvo_y": compacto.y[destino],
+            "length": compacto.pesos["length"][e0:e1],
+            "travel_time": compacto.pesos["travel_time"][e0:e1],
+            "chaves": compacto.chaves[e0:e1],
+        }
+        for campos, lads in ((nos, lad_nos), (arestas, lad_arestas)):
+            ordem = np.argsort(lads, kind="stable")
+            grupos, inicios = np.unique(lads[ordem], return_index=True)
+            limites = np.append(inicios, len(ordem))
+            for nome, arr in campos.items():
+                arr = np.asarray(arr)[ordem]
+                tipos[nome] = arr.dtype
+                for k, lad in enumerate(grupos.tolist()):
+                    with open(os.path.join(partes, f"{lad}.{nome}"), "ab") as f:
+                        arr[limites[k]:limites[k + 1]].tofile(f)
+
+    # Um ladrilho cujos nós não têm arestas de saída fica sem os arquivos
+    # parciais de arestas.
+    resumo = {}
+    for lad in np.unique(ladrilho).tolist():
+        def ler(nome):
+            arquivo = os.path.join(partes, f"{lad}.{nome}")
+            if not os.path.exists(arquivo):
+                return np.empty(0, dtype=tipos[nome])
+            return np.fromfile(arquivo, dtype=tipos[nome])
+
+        grau = ler("grau")
+        offsets = np.zeros(len(grau) + 1, dtype=np.int64)
+        np.cumsum(grau, out=offsets[1:])
+        alvo_ladrilho = ler("alvo_ladrilho")
+        np.savez(
+            os.path.join(temp, f"{lad}.npz"),
+            ids=ler("ids"),
+            x=ler("x"),
+            y=ler("y"),
+            offsets=offsets,
+            alvo_id=ler("alvo_id"),
+            alvo_ladrilho=alvo_ladrilho,
+            alvo_x=ler("alvo_x"),
+            alvo_y=ler("alvo_y"),
+            length=ler("length"),
+            travel_time=ler("travel_time"),
+            chaves=ler("chaves"),
+        )
+        resumo[str(lad)] = {"nos": int(len(grau)), "arestas": int(offsets[-1]),
+                            "fronteira": int((alvo_ladrilho != lad).sum())}
+    shutil.rmtree(partes)
+
+    # Tabela global nó → ladrilho (ordenada por id para busca binária), com as
+    # coordenadas para ajustar pontos à malha sem abrir os ladrilhos.
+    ordem = np.argsort(compacto.ids)
+    np.save(os.path.join(temp, "nos_ids.npy"), compacto.ids[ordem])
+    np.save(os.path.join(temp, "nos_ladrilho.npy"), ladrilho[ordem])
+    np.save(os.path.join(temp, "nos_x.npy"), compacto.x[ordem])
+    np.save(os.path.join(temp, "nos_y.npy"), compacto.y[ordem])
+    with open(os.path.join(temp, "cabecalho.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "versao_formato": VERSAO_FORMATO,
+            "tamanho_grau": tamanho_grau,
+            "origem": [lat0, lon0],
+            "n_colunas": n_colunas,
+            "ladrilhos": resumo,
+        }, f, indent=2)
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(temp, diretorio)
+
+
+# ------------------------
+# Ladrilho em memória
+# ------------------------
+class CoordenadasNos:
+    """Só ids e coordenadas dos nós: o que o IndiceEspacial usa para ajustar pontos."""
+
+    def __init__(self, ids, x, y):
+        self.ids = ids
+        self.x = x
+        self.y = y
+        self.n_nos = len(ids)
+
+
+class _Ladrilho:
+    def __init__(self, arquivo):
+        dados = np.load(arquivo)
+        self.ids = dados["ids"].tolist()
+        self.indice = {n: i for i, n in enumerate(self.ids)}
+        self.lat = dados["y"].tolist()
+        self.lon = dados["x"].tolist()
+        self.offsets = dados["offsets"].tolist()
+        self.alvo_id = dados["alvo_id"].tolist()
+        self.alvo_ladrilho = dados["alvo_ladrilho"].tolist()
+        self.alvo_lat = dados["alvo_y"].tolist()
+        self.alvo_lon = dados["alvo_x"].tolist()
+        self.pesos = {"length": dados["length"].tolist(), "travel_time": dados["travel_time"].tolist()}
+
+
+class GrafoParticionado:
+    """Roteamento sobre ladrilhos carregados sob demanda.
+
+    Só os ladrilhos alcançados pela fronteira da busca são lidos do disco. Ao fim
+    de cada consulta, se houver mais de `max_ladrilhos` em memória, os menos
+    usados recentemente são descartados. Durante a consulta nada é descartado:
+    a fronteira costuma ir e voltar entre ladrilhos vizinhos e relê-los a cada
+    passo custaria muito mais que mantê-los.
+    """
+
+    def __init__(self, diretorio, max_ladrilhos=64):
+        with open(os.path.join(diretorio, "cabecalho.json"), encoding="utf-8") as f:
+            self.cabecalho = json.load(f)
+        if self.cabecalho.get("versao_formato") != VERSAO_FORMATO:
+            raise ValueError(f"Formato de ladrilhos incompatível em {diretorio}")
+        self.diretorio = diretorio
+        self.max_ladrilhos = max_ladrilhos
+        self._nos_ids = np.load(os.path.join(diretorio, "nos_ids.npy"), mmap_mode="r")
+        self._nos_ladrilho = np.load(os.path.join(diretorio, "nos_ladrilho.npy"), mmap_mode="r")
+        self._carregados = OrderedDict()
+        self._coordenadas = None
+        self.leituras = 0
+        self.expandidos = 0
+
+    def ladrilho_do_no(self, no):
+        i = int(np.searchsorted(self._nos_ids, no))
+        if i >= len(self._nos_ids) or int(self._nos_ids[i]) != no:
+            raise KeyError(no)
+        return int(self._nos_ladrilho[i])
+
+    def coordenadas_nos(self):
+        """CoordenadasNos de todos os nós (~24 bytes por nó), lidas uma vez."""
+        if self._coordenadas is None:
+            arquivo_x = os.path.join(self.diretorio, "nos_x.npy")
+            if os.path.exists(arquivo_x):
+                x = np.load(arquivo_x)
+                y = np.load(os.path.join(self.diretorio, "nos_y.npy"))
+                self._coordenadas = CoordenadasNos(np.asarray(self._nos_ids), x, y)
+            else:
+                # Diretório gravado antes das tabelas de coordenadas: lê só
+                # ids, x e y de cada ladrilho.
+                ids, x, y = [], [], []
+                for lad in self.cabecalho["ladrilhos"]:
+                    with np.load(os.path.join(self.diretorio, f"{lad}.npz")) as dados:
+                        ids.append(dados["ids"])
+                        x.append(dados["x"])
+                        y.append(dados["y"])
+                self._coordenadas = CoordenadasNos(np.concatenate(ids), np.concatenate(x), np.concatenate(y))
+        return self._coordenadas
+
+    def _ladrilho(self, lad):
+        tile = self._carregados.get(lad)
+        if tile is None:
+            tile = _Ladrilho(os.path.join(self.diretorio, f"{lad}.npz"))
+            self.leituras += 1
+            self._carregados[lad] = tile
+        else:
+            self._carregados.move_to_end(lad)
+        return tile
+
+    def _aparar(self):
+        while len(self._carregados) > self.max_ladrilhos:
+            self._carregados.popitem(last=False)
+
+    # ------------------------
+    # Buscas
+    # ------------------------
+    def _busca(self, origem, destino, peso, vmax_kmh=None, metricas=None):
+        inicio = time.perf_counter()
+        try:
+            return self._busca_ladrilhos(origem, destino, peso, vmax_kmh)
+        finally:
+            if metricas is not None:
+                # Aqui só o total de nós fechados e o tempo; os contadores finos
+                # ficam no GrafoCompacto, que é o motor usado no dia a dia.
+                metricas.fechados += self.expandidos
+                metricas.tempo_busca += time.perf_counter() - inicio
+
+    def _busca_ladrilhos(self, origem, destino, peso, vmax_kmh):
+        if vmax_kmh is not None:
+            lad_t = self._ladrilho(self.ladrilho_do_no(destino))
+            i = lad_t.indice[destino]
+            lat_t, lon_t = math.radians(lad_t.lat[i]), math.radians(lad_t.lon[i])
+            cos_t = math.cos(lat_t)
+            fator = 2 * RAIO_TERRA_M / (vmax_kmh * 1000.0 / 3600.0)
+
+            def h(lat, lon):
+                lat, lon = math.radians(lat), math.radians(lon)
+                a = math.sin((lat_t - lat) / 2) ** 2 + \
+                    math.cos(lat) * cos_t * math.sin((lon_t - lon) / 2) ** 2
+                return fator * math.asin(math.sqrt(min(a, 1.0)))
+        else:
+            h = None
+
+        lad_s = self.ladrilho_do_no(origem)
+        dist = {origem: 0.0}
+        pred = {}
+        fechados = set()
+        heap = [(0.0, origem, lad_s)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            _, u, lad = pop(heap)
+            if u in fechados:
+                continue
+            if u == destino:
+                self.expandidos = len(fechados) + 1
+                return pred
+            fechados.add(u)
+            tile = self._ladrilho(lad)
+            w = tile.pesos[peso]
+            i = tile.indice[u]
+            du = dist[u]
+            for j in range(tile.offsets[i], tile.offsets[i + 1]):
+                v = tile.alvo_id[j]
+                nd = du + w[j]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    chave = nd if h is None else nd + h(tile.alvo_lat[j], tile.alvo_lon[j])
+                    push(heap, (chave, v, tile.alvo_ladrilho[j]))
+        self.expandidos = len(fechados)
+        return None
+
+    def _caminho(self, pred, origem, destino):
+        if pred is None:
+            return None
+        caminho = [destino]
+        while caminho[-1] != origem:
+            caminho.append(pred[caminho[-1]])
+        caminho.reverse()
+        return caminho
+
+    def dijkstra(self, origem, destino, peso="length", metricas=None):
+        try:
+            return self._caminho(self._busca(origem, destino, peso, metricas=metricas), origem, destino)
+        finally:
+            self._aparar()
+
+    def astar(self, origem, destino, peso="travel_time", vmax_kmh=120.0, metricas=None):
+        try:
+            return self._caminho(self._busca(origem, destino, peso, vmax_kmh, metricas), origem, destino)
+        finally:
+            self._aparar()
+
+    def peso_caminho(self, rota, peso):
+        total = 0.0
+        for a, b in zip(rota[:-1], rota[1:]):
+            tile = self._ladrilho(self.ladrilho_do_no(a))
+            i = tile.indice[a]
+            w = tile.pesos[peso]
+            total += min(w[j] for j in range(tile.offsets[i], tile.offsets[i + 1]) if tile.alvo_id[j] == b)
+        self._aparar()
+        return total
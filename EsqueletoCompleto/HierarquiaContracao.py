@@ -0,0 +1,306 @@
+import hashlib
+import heapq
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def assinatura_pesos(compacto, peso):
+    """Identifica a topologia e os pesos usados na contração (para detectar hierarquia velha)."""
+    h = hashlib.sha1()
+    for arr in (compacto.ids, compacto.offsets, compacto.alvos, compacto.pesos[peso]):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def caminho_hierarquia(arquivo, peso):
+    return os.path.splitext(arquivo)[0] + f".ch_{peso}.npz"
+
+
+class HierarquiaContracao:
+    """Contraction Hierarchies sobre um peso ("length" ou "travel_time") do GrafoCompacto.
+
+    O pré-processamento contrai os nós em ordem de importância, adicionando atalhos
+    (u, x) via o nó contraído v quando não há caminho-testemunha tão curto quanto
+    u→v→x. A consulta é um Dijkstra bidirecional que só sobe na hierarquia; o
+    caminho encontrado é desempacotado recursivamente até as arestas originais.
+    """
+
+    def __init__(self, compacto, peso, rank, u, v, w, meio, assinatura=None):
+        self.compacto = compacto
+        self.peso = peso
+        self.rank = np.asarray(rank, dtype=np.int32)
+        self.u = np.asarray(u, dtype=np.int32)
+        self.v = np.asarray(v, dtype=np.int32)
+        self.w = np.asarray(w, dtype=np.float64)
+        self.meio = np.asarray(meio, dtype=np.int32)
+        self.assinatura = assinatura
+        # Nós expandidos (somando os dois lados) pela última consulta.
+        self.expandidos = 0
+        self._montar_buscas()
+
+    # ------------------------
+    # Pré-processamento
+    # ------------------------
+    @classmethod
+    def construir(cls, compacto, peso="travel_time", limite_testemunha=60, verbose=False):
+        n = compacto.n_nos
+        offsets = compacto.offsets.tolist()
+        alvos = compacto.alvos.tolist()
+        pesos = compacto.pesos[peso].tolist()
+
+        # Grafo de trabalho: saida[u][x] = (peso, meio); arestas paralelas ficam com a menor.
+        saida = [dict() for _ in range(n)]
+        entrada = [dict() for _ in range(n)]
+        for a in range(n):
+            for j in range(offsets[a], offsets[a + 1]):
+                b, wj = alvos[j], pesos[j]
+                if a != b and wj < saida[a].get(b, (math.inf,))[0]:
+                    saida[a][b] = (wj, -1)
+                    entrada[b][a] = (wj, -1)
+
+        contraido = [False] * n
+        vizinhos_contraidos = [0] * n
+        arestas = {}
+
+        def testemunha(origem, evitar, limite, alvos_x):
+            # Dijkstra limitado no grafo restante, ignorando `evitar`; para quando
+            # todos os alvos foram assentados ou o custo passou do limite.
+            dist = {origem: 0.0}
+            heap = [(0.0, origem)]
+            faltam = len(alvos_x)
+            assentados = 0
+            while heap and faltam and assentados < limite_testemunha:
+                d, a = heapq.heappop(heap)
+                if d > dist[a]:
+                    continue
+                if d > limite:
+                    break
+                if a in alvos_x:
+                    faltam -= 1
+                assentados += 1
+                for b, (wb, _) in saida[a].items():
+                    if b == evitar:
+                        continue
+                    nd = d + wb
+                    if nd < dist.get(b, math.inf):
+                        dist[b] = nd
+                        heapq.heappush(heap, (nd, b))
+            return dist
+
+        def atalhos(v):
+            novos = []
+            ins = [(a, wa) for a, (wa, _) in entrada[v].items()]
+            outs = [(x, wx) for x, (wx, _) in saida[v].items()]
+            if not ins or not outs:
+                return novos, len(ins) + len(outs)
+            max_out = max(wx for _, wx in outs)
+            alvos_x = {x for x, _ in outs}
+            for a, wa in ins:
+                dist = testemunha(a, v, wa + max_out, alvos_x - {a})
+                for x, wx in outs:
+                    if x == a:
+                        continue
+                    via = wa + wx
+                    if dist.get(x, math.inf) > via:
+                        novos.append((a, x, via))
+            return novos, len(ins) + len(outs)
+
+        def prioridade(v):
+            # Diferença de arestas + vizinhos já contraídos (espalha a contração).
+            novos, grau = atalhos(v)
+            return 2 * (len(novos) - grau) + vizinhos_contraidos[v], novos
+
+        heap = [(prioridade(v)[0], v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = np.empty(n, dtype=np.int32)
+        ordem = 0
+        t0 = time.time()
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contraido[v]:
+                continue
+            # Atualização preguiçosa: se a prioridade piorou, devolve ao heap.
+            nova, novos = prioridade(v)
+            if heap and nova > heap[0][0]:
+                heapq.heappush(heap, (nova, v))
+                continue
+
+            for a, x, via in novos:
+                if via < saida[a].get(x, (math.inf,))[0]:
+                    saida[a][x] = (via, v)
+                    entrada[x][a] = (via, v)
+            contraido[v] = True
+            rank[v] = ordem
+            ordem += 1
+            # As arestas de v vão para a hierarquia final e saem do grafo de
+            # trabalho, que passa a conter apenas nós ainda não contraídos.
+            for a, (wa, m) in entrada[v].items():
+                arestas[(a, v)] = (wa, m)
+                del saida[a][v]
+                vizinhos_contraidos[a] += 1
+            for x, (wx, m) in saida[v].items():
+                arestas[(v, x)] = (wx, m)
+                del entrada[x][v]
+                vizinhos_contraidos[x] += 1
+            saida[v] = entrada[v] = None
+            if verbose and ordem % 10000 == 0:
+                print(f"  {ordem}/{n} nós contraídos ({time.time() - t0:.1f} s)")
+
+        chaves = list(arestas)
+        return cls(
+            compacto, peso, rank,
+            [a for a, _ in chaves],
+            [x for _, x in chaves],
+            [arestas[c][0] for c in chaves],
+            [arestas[c][1] for c in chaves],
+            assinatura=assinatura_pesos(compacto, peso),
+        )
+
+    def _montar_buscas(self):
+        n = self.compacto.n_nos
+        sobe = self.rank[self.v] > self.rank[self.u]
+
+        def csr(origem, alvo, sel):
+            o, a = origem[sel], alvo[sel]
+            ordem = np.argsort(o, kind="stable")
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(o, minlength=n), out=offsets[1:])
+            return offsets.tolist(), a[ordem].tolist(), self.w[sel][ordem].tolist()
+
+        # Para frente: arestas u→v que sobem. Para trás: arestas u→v que descem,
+        # percorridas de v para u (também subindo no rank).
+        self._frente = csr(self.u, self.v, sobe)
+        self._tras = csr(self.v, self.u, ~sobe)
+        self._meio = None
+
+    # ------------------------
+    # Persistência
+    # ------------------------
+    def salvar(self, arquivo):
+        np.savez(arquivo, rank=self.rank, u=self.u, v=self.v, w=self.w, meio=self.meio,
+                 peso=np.array(self.peso), assinatura=np.array(self.assinatura or ""))
+
+    @classmethod
+    def carregar(cls, arquivo, compacto):
+        """Retorna None se o arquivo não existe ou foi gerado para outro grafo/pesos."""
+        if not os.path.exists(arquivo):
+            return None
+        dados = np.load(arquivo)
+        peso = str(dados["peso"])
+        assinatura = str(dados["assinatura"])
+        if len(dados["rank"]) != compacto.n_nos or assinatura != assinatura_pesos(compacto, peso):
+            return None
+        return cls(compacto, peso, dados["rank"], dados["u"], dados["v"], dados["w"],
+                   dados["meio"], assinatura=assinatura)
+
+    # ------------------------
+    # Consulta
+    # ------------------------
+    def _busca(self, s, t, metricas=None):
+        inicio = time.perf_counter()
+        buscas = (self._frente, self._tras)
+        dist = ({s: 0.0}, {t: 0.0})
+        pred = ({}, {})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        melhor, encontro = math.inf, None
+        pop, push = heapq.heappop, heapq.heappush
+
+        lado = 0
+        expandidos = remocoes = descartados = relaxadas = 0
+        while heaps[0] or heaps[1]:
+            if not heaps[lado] or (heaps[1 - lado] and heaps[1 - lado][0][0] < heaps[lado][0][0]):
+                lado = 1 - lado
+            d, a = pop(heaps[lado])
+            remocoes += 1
+            if d >= melhor:
+                # O outro lado ainda pode ter candidatos menores; só esvazia este.
+                descartados += len(heaps[lado])
+                heaps[lado].clear()
+                continue
+            if d > dist[lado][a]:
+                continue
+            outro = dist[1 - lado].get(a)
+            if outro is not None and d + outro < melhor:
+                melhor, encontro = d + outro, a
+            dl, pl = dist[lado], pred[lado]
+
+            # Stall-on-demand: se um nó mais alto já alcançado chega em `a` mais
+            # barato pela aresta que desce, `a` não está em nenhum caminho ótimo.
+            offsets, alvos, w = buscas[1 - lado]
+            if any(dl.get(alvos[j], math.inf) + w[j] < d for j in range(offsets[a], offsets[a + 1])):
+                continue
+
+            expandidos += 1
+            offsets, alvos, w = buscas[lado]
+            relaxadas += offsets[a + 1] - offsets[a]
+            for j in range(offsets[a], offsets[a + 1]):
+                b = alvos[j]
+                nd = d + w[j]
+                if nd < dl.get(b, math.inf):
+                    dl[b] = nd
+                    pl[b] = a
+                    push(heaps[lado], (nd, b))
+
+        self.expandidos = expandidos
+        if metricas is not None:
+            # Toda inserção termina removida, descartada ou ainda no heap.
+            metricas.fechados += expandidos
+            metricas.relaxadas += relaxadas
+            metricas.remocoes += remocoes
+            metricas.insercoes += remocoes + descartados + len(heaps[0]) + len(heaps[1])
+            metricas.tempo_busca += time.perf_counter() - inicio
+        if encontro is None:
+            return None, None
+        ida = [encontro]
+        while ida[-1] != s:
+            ida.append(pred[0][ida[-1]])
+        ida.reverse()
+        volta = [encontro]
+        while volta[-1] != t:
+            volta.append(pred[1][volta[-1]])
+        return melhor, ida + volta[1:]
+
+    def _desempacotar(self, caminho):
+        if self._meio is None:
+            self._meio = {(a, b): m for a, b, m in
+                          zip(self.u.tolist(), self.v.tolist(), self.meio.tolist())}
+        meio = self._meio
+        resultado = [caminho[0]]
+        for a, b in zip(caminho[:-1], caminho[1:]):
+            pilha = [(a, b)]
+            while pilha:
+                x, y = pilha.pop()
+                m = meio[(x, y)]
+                if m < 0:
+                    resultado.append(y)
+                else:
+                    pilha.append((m, y))
+                    pilha.append((x, m))
+        return resultado
+
+    def rota(self, origem, destino, metricas=None):
+        c = self.compacto
+        s, t = c.indice[origem], c.indice[destino]
+        custo, caminho = self._busca(s, t, metricas)
+        if caminho is None:
+            return None
+        return [int(c.ids[i]) for i in self._desempacotar(caminho)]
+
+
+# ------------------------
+# Pré-processamento offline
+# ------------------------
+if __name__ == "__main__":
+    from GrafoManager import GrafoManager
+
+    arquivo = sys.argv[1] if len(sys.argv) > 1 else "grafo_brasilia.graphml"
+    gm = GrafoManager(arquivo)
+    gm.carregar_grafo()
+    for nome in ("length", "travel_time"):
+        t0 = time.time()
+        gm.preparar_ch(pesos=(nome,), verbose=True)
+        print(f"Hierarquia '{nome}' pronta em {time.time() - t0:.1f} s")
@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+
+from GrafoCompacto import RAIO_TERRA_M
+
+
+class IndiceEspacial:
+    """Índice espacial dos nós do GrafoCompacto, construído uma vez e reaproveitado.
+
+    As coordenadas são projetadas num plano equirretangular centrado no grafo
+    (erro desprezível na escala de uma cidade). Usa cKDTree do SciPy quando
+    disponível e, sem ele, uma busca por força bruta vetorizada em blocos.
+    """
+
+    def __init__(self, compacto, bloco=2048, passo_aresta_m=25.0):
+        self.compacto = compacto
+        self.bloco = bloco
+        self.passo_aresta_m = passo_aresta_m
+        self._amostras = None
+        self.lat0 = float(np.mean(compacto.y)) if compacto.n_nos else 0.0
+        self._kx = math.radians(1.0) * RAIO_TERRA_M * math.cos(math.radians(self.lat0))
+        self._ky = math.radians(1.0) * RAIO_TERRA_M
+        self.pontos = np.column_stack(self.projetar(compacto.y, compacto.x))
+        self.arvore = _kdtree(self.pontos)
+
+    def projetar(self, lats, lons):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        return lons * self._kx, lats * self._ky
+
+    # ------------------------
+    # Nós mais próximos
+    # ------------------------
+    def _vizinhos(self, xy, k):
+        k = min(k, len(self.pontos))
+        if self.arvore is not None:
+            dist, idx = self.arvore.query(xy, k=k)
+            return dist.reshape(len(xy), k), idx.reshape(len(xy), k)
+
+        dist = np.empty((len(xy), k))
+        idx = np.empty((len(xy), k), dtype=np.int64)
+        for i in range(0, len(xy), self.bloco):
+            parte = xy[i:i + self.bloco]
+            d2 = ((parte[:, None, :] - self.pontos[None, :, :]) ** 2).sum(axis=2)
+            sel = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            dsel = np.take_along_axis(d2, sel, axis=1)
+            ordem = np.argsort(dsel, axis=1)
+            idx[i:i + self.bloco] = np.take_along_axis(sel, ordem, axis=1)
+            dist[i:i + self.bloco] = np.sqrt(np.take_along_axis(dsel, ordem, axis=1))
+        return dist, idx
+
+    def indices_mais_proximos(self, lats, lons, k_refino=4):
+        """Índices (no CSR) e distâncias em metros dos nós mais próximos de cada ponto."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        xy = np.column_stack(self.projetar(lats, lons))
+        _, cand = self._vizinhos(xy, k_refino)
+
+        # Refina os k candidatos com haversine, como o nearest_nodes do OSMnx.
+        phi1 = np.radians(lats)[:, None]
+        phi2 = np.radians(self.compacto.y[cand])
+        dphi = phi2 - phi1
+        dlam = np.radians(self.compacto.x[cand] - lons[:, None])
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+        dist = 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(a))
+        melhor = np.argmin(dist, axis=1)
+        linhas = np.arange(len(lats))
+        return cand[linhas, melhor], dist[linhas, melhor]
+
+    def nos_mais_proximos(self, lats, lons, retornar_dist=False):
+        idx, dist = self.indices_mais_proximos(lats, lons)
+        ids = self.compacto.ids[idx]
+        return (ids, dist) if retornar_dist else ids
+
+    # ------------------------
+    # Arestas mais próximas
+    # ------------------------
+    def _amostras_arestas(self):
+        """Pontos ao longo de cada aresta, a no máximo `passo_aresta_m` uns dos outros.
+
+        Retorna (aresta de cada amostra, KD-tree das amostras ou None sem SciPy).
+        Construído na primeira consulta de arestas.
+        """
+        if self._amostras is None:
+            c = self.compacto
+            a = self.pontos[c.origens()]
+            ab = self.pontos[c.alvos] - a
+            partes = np.maximum(np.ceil(np.sqrt((ab ** 2).sum(axis=1)) / self.passo_aresta_m), 1).astype(np.int64)
+            aresta = np.repeat(np.arange(c.n_arestas), partes + 1)
+            # Frações 0, 1/partes, ..., 1 de cada aresta.
+            passo = _expandir_faixas(np.zeros(c.n_arestas, dtype=np.int64), partes + 1)
+            t = passo / partes[aresta]
+            self._amostras = (aresta, _kdtree(a[aresta] + ab[aresta] * t[:, None]))
+        return self._amostras
+
+    def arestas_mais_proximas(self, lats, lons):
+        """Projeta cada ponto na aresta mais próxima do grafo.
+
+        As arestas são tratadas como segmentos retos entre os nós (a geometria
+        detalhada do OSM é ignorada) e amostradas a cada `passo_aresta_m`. A
+        amostra mais próxima dá um limite d0; toda aresta a menos de d0 tem uma
+        amostra a menos de d0 + passo/2, então só essas são medidas e o
+        resultado é exato mesmo para arestas longas com as duas pontas longe.
+        Retorna um dicionário de arrays com u, v, chave, fracao (posição da
+        projeção ao longo da aresta, 0..1), distancia (m, do ponto até a
+        projeção) e aresta (índice no CSR).
+        """
+        c = self.compacto
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        n = len(lats)
+        if c.n_arestas == 0:
+            raise ValueError("Nenhuma aresta próxima encontrada")
+        xy = np.column_stack(self.projetar(lats, lons))
+        aresta_amostra, arvore = self._amostras_arestas()
+
+        if arvore is not None:
+            d0, _ = arvore.query(xy)
+            # Folga de 1 mm contra arredondamento na fronteira do raio.
+            vizinhas = arvore.query_ball_point(xy, d0 + self.passo_aresta_m / 2 + 1e-3)
+            ponto = np.repeat(np.arange(n), [len(v) for v in vizinhas])
+            arestas = aresta_amostra[np.concatenate(vizinhas).astype(np.int64)]
+            # Várias amostras da mesma aresta: cada par (ponto, aresta) uma vez.
+            par = np.unique(ponto * c.n_arestas + arestas)
+            melhor, t, dist = self._melhor_aresta(xy, par // c.n_arestas, par % c.n_arestas, n)
+        else:
+            melhor, t, dist = self._melhor_aresta_bruta(xy)
+
+        return {
+            "u": c.ids[c.origens()[melhor]],
+            "v": c.ids[c.alvos[melhor]],
+            "chave": c.chaves[melhor],
+            "fracao": t,
+            "distancia": dist,
+            "aresta": melhor,
+        }
+
+    def _melhor_aresta(self, xy, ponto, arestas, n):
+        """Entre os pares candidatos (ponto, aresta), a aresta mais próxima de cada ponto."""
+        c = self.compacto
+        a = self.pontos[c.origens()[arestas]]
+        b = self.pontos[c.alvos[arestas]]
+        p = xy[ponto]
+        ab = b - a
+        comp2 = (ab ** 2).sum(axis=1)
+        t = np.where(comp2 > 0, ((p - a) * ab).sum(axis=1) / np.where(comp2 > 0, comp2, 1.0), 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        proj = a + ab * t[:, None]
+        dist = np.sqrt(((p - proj) ** 2).sum(axis=1))
+
+        ordem = np.lexsort((arestas, dist, ponto))
+        primeiro = np.ones(len(ordem), dtype=bool)
+        primeiro[1:] = ponto[ordem][1:] != ponto[ordem][:-1]
+        sel = ordem[primeiro]
+        if len(sel) != n:
+            raise ValueError("Há pontos sem nenhuma aresta próxima")
+        return arestas[sel], t[sel], dist[sel]
+
+    def _melhor_aresta_bruta(self, xy):
+        # Sem SciPy: distância de cada ponto a todas as arestas, em blocos.
+        c = self.compacto
+        a = self.pontos[c.origens()]
+        ab = self.pontos[c.alvos] - a
+        comp2 = np.where((ab ** 2).sum(axis=1) > 0, (ab ** 2).sum(axis=1), 1.0)
+        por_bloco = max(1, (1 << 20) // c.n_arestas)
+        melhor, fracao, distancia = [], [], []
+        for i in range(0, len(xy), por_bloco):
+            p = xy[i:i + por_bloco, None, :]
+            t = np.clip(((p - a) * ab).sum(axis=2) / comp2, 0.0, 1.0)
+            d = np.sqrt(((p - a - ab * t[:, :, None]) ** 2).sum(axis=2))
+            j = np.argmin(d, axis=1)  # empate: menor índice de aresta
+            linhas = np.arange(len(j))
+            melhor.append(j)
+            fracao.append(t[linhas, j])
+            distancia.append(d[linhas, j])
+        return np.concatenate(melhor), np.concatenate(fracao), np.concatenate(distancia)
+
+
+def _expandir_faixas(inicios, tamanhos):
+    """Concatena range(inicio, inicio + tamanho) para cada par, sem laço Python."""
+    total = int(tamanhos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    desloc = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return desloc + np.arange(total)
+
+
+def _kdtree(pontos):
+    # SciPy só é importado quando o primeiro índice é construído (a importação
+    # de scipy.spatial custa centenas de ms no início do processo).
+    try:
+        from scipy.spatial import cKDTree
+    except Exception:
+        return None
+    return cKDTree(pontos)
@@ -0,0 +1,296 @@
+"""Construção da malha viária "drive" a partir de um extrato OSM local (.osm, .osm.gz, .osm.bz2, .pbf).
+
+    python IngestaoOSM.py distrito-federal.osm.pbf grafo_brasilia.graphml
+    python IngestaoOSM.py exemplos/amostra_asa_sul.osm saida.graphml --ponto -15.8351,-47.9128 --distancia 3000
+
+Substitui o download do ox.graph_from_point em máquinas sem rede, com
+resultado reprodutível. O arquivo é lido em streaming, em duas passadas, sem
+nunca ficar inteiro em memória:
+
+1. vias: só as que passam no filtro "drive" do OSMnx ficam (ids dos nós e
+   etiquetas úteis);
+2. nós: só as coordenadas dos nós usados por essas vias (e, com --ponto,
+   dentro do recorte com a mesma folga de 500 m do OSMnx).
+
+Depois seguem os passos do graph_from_point: sentido único (oneway/rotatória),
+comprimento das arestas, maior componente fracamente conexa, simplificação,
+recorte final e street_count. XML é lido com a biblioteca padrão; .pbf
+requer o pacote pyosmium.
+
+As relações de restrição de conversão (type=restriction, de via para via por
+um nó) são lidas na primeira passada e resolvidas em pares de arestas do grafo
+final, usados pelo roteamento com conversões (Conversoes).
+"""
+import argparse
+import bz2
+import datetime as dt
+import gzip
+import math
+import re
+import xml.etree.ElementTree as ET
+from itertools import groupby
+
+try:
+    import osmium
+except Exception:
+    osmium = None
+
+# Filtro "drive" do OSMnx (settings.default_access + filtros["drive"]); como no
+# Overpass, cada "!~" é uma busca de expressão regular no valor da etiqueta.
+FILTRO_DRIVE = (
+    ("area", re.compile("yes")),
+    ("access", re.compile("private")),
+    ("highway", re.compile(
+        "abandoned|bridleway|bus_guideway|construction|corridor|cycleway|elevator|escalator|"
+        "footway|no|path|pedestrian|planned|platform|proposed|raceway|razed|rest_area|service|"
+        "services|steps|track")),
+    ("motor_vehicle", re.compile("no")),
+    ("motorcar", re.compile("no")),
+    ("service", re.compile("alley|driveway|emergency_access|parking|parking_aisle|private")),
+)
+ETIQUETAS_VIA = ("access", "area", "bridge", "est_width", "highway", "junction", "landuse", "lanes",
+                 "maxspeed", "name", "oneway", "ref", "service", "tunnel", "width")
+ETIQUETAS_NO = ("highway", "junction", "railway", "ref")
+VALORES_MAO_UNICA = {"yes", "true", "1", "-1", "reverse", "T", "F"}
+VALORES_INVERTIDOS = {"-1", "reverse", "T"}
+FOLGA_RECORTE_M = 500.0
+
+
+def via_dirigivel(etiquetas):
+    if "highway" not in etiquetas:
+        return False
+    return not any(chave in etiquetas and padrao.search(etiquetas[chave])
+                   for chave, padrao in FILTRO_DRIVE)
+
+
+# ------------------------
+# Leitura em streaming
+# ------------------------
+def _abrir(arquivo):
+    if arquivo.endswith(".gz"):
+        return gzip.open(arquivo, "rb")
+    if arquivo.endswith(".bz2"):
+        return bz2.open(arquivo, "rb")
+    return open(arquivo, "rb")
+
+
+def _elementos_xml(arquivo, tipos):
+    """Elementos de primeiro nível com tag em `tipos`, descartados logo após o uso."""
+    with _abrir(arquivo) as f:
+        contexto = ET.iterparse(f, events=("start", "end"))
+        _, raiz = next(contexto)
+        for evento, elem in contexto:
+            if evento != "end" or elem.tag not in ("node", "way", "relation"):
+                continue
+            if elem.tag in tipos:
+                yield elem
+            # Limpa a raiz: sem isso a árvore parcial guardaria o arquivo inteiro.
+            raiz.clear()
+
+
+def _vias_xml(arquivo, relacoes=None):
+    for elem in _elementos_xml(arquivo, ("way", "relation") if relacoes is not None else ("way",)):
+        etiquetas = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+        if elem.tag == "relation":
+            membros = [(m.get("type"), int(m.get("ref")), m.get("role")) for m in elem.iter("member")]
+            _guardar_restricao(relacoes, etiquetas, membros)
+            continue
+        yield int(elem.get("id")), [int(nd.get("ref")) for nd in elem.iter("nd")], etiquetas
+
+
+def _nos_xml(arquivo):
+    for elem in _elementos_xml(arquivo, ("node",)):
+        etiquetas = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+        yield int(elem.get("id")), float(elem.get("lat")), float(elem.get("lon")), etiquetas
+
+
+def _vias_pbf(arquivo, relacoes=None):
+    tipos = osmium.osm.WAY | osmium.osm.RELATION if relacoes is not None else osmium.osm.WAY
+    for obj in osmium.FileProcessor(arquivo, tipos):
+        etiquetas = {t.k: t.v for t in obj.tags}
+        if obj.is_relation():
+            _guardar_restricao(relacoes, etiquetas, [(m.type, m.ref, m.role) for m in obj.members])
+            continue
+        yield obj.id, [n.ref for n in obj.nodes], etiquetas
+
+
+def _nos_pbf(arquivo):
+    for no in osmium.FileProcessor(arquivo, osmium.osm.NODE):
+        if no.location.valid():
+            yield no.id, no.location.lat, no.location.lon, {t.k: t.v for t in no.tags}
+
+
+def _guardar_restricao(relacoes, etiquetas, membros):
+    """Anexa a restrição de conversão (via -> nó -> via) descrita pela relação, se for uma."""
+    if etiquetas.get("type") not in ("restriction", "restriction:motorcar"):
+        return
+    if "motorcar" in etiquetas.get("except", "").split(";"):
+        return
+    valor = etiquetas.get("restriction:motorcar") or etiquetas.get("restriction") or ""
+    if valor.startswith("no_"):
+        tipo = "proibida"
+    elif valor.startswith("only_"):
+        tipo = "obrigatoria"
+    else:
+        return
+    papeis = {}
+    for tipo_membro, ref, papel in membros:
+        papeis.setdefault(papel, []).append((tipo_membro[:1], ref))
+    de, via, para = papeis.get("from", []), papeis.get("via", []), papeis.get("to", [])
+    # Só "de" via, "por" nó e "para" via; restrições com via intermediária ficam de fora.
+    if len(de) != 1 or len(via) != 1 or len(para) != 1 or via[0][0] != "n" \
+            or de[0][0] != "w" or para[0][0] != "w":
+        return
+    relacoes.append({"de": de[0][1], "via": via[0][1], "para": para[0][1], "tipo": tipo,
+                     "restricao": valor})
+
+
+def _leitores(arquivo):
+    if arquivo.lower().endswith(".pbf"):
+        if osmium is None:
+            raise RuntimeError("Leitura de .pbf requer o pacote pyosmium (pip install osmium)")
+        return _vias_pbf, _nos_pbf
+    return _vias_xml, _nos_xml
+
+
+def _recorte(ponto_central, distancia, folga_m=0.0):
+    """(norte, sul, leste, oeste) a `distancia` + `folga_m` metros do ponto."""
+    lat, lon = ponto_central
+    d = distancia + folga_m
+    dlat = d / 111320.0
+    dlon = d / (111320.0 * math.cos(math.radians(lat)))
+    return lat + dlat, lat - dlat, lon + dlon, lon - dlon
+
+
+# ------------------------
+# Construção do grafo
+# ------------------------
+def ler_extrato(arquivo, ponto_central=None, distancia=None, relacoes=None):
+    """Duas passadas pelo arquivo: (vias dirigíveis, nós usados por elas).
+
+    Se `relacoes` for uma lista, recebe as restrições de conversão encontradas.
+    """
+    ler_vias, ler_nos = _leitores(arquivo)
+    vias = []
+    usados = set()
+    for osmid, refs, etiquetas in ler_vias(arquivo, relacoes):
+        if not via_dirigivel(etiquetas):
+            continue
+        refs = [r for r, _ in groupby(refs)]  # nós repetidos em sequência
+        vias.append((osmid, refs, {k: etiquetas[k] for k in ETIQUETAS_VIA if k in etiquetas}))
+        usados.update(refs)
+
+    limites = _recorte(ponto_central, distancia, FOLGA_RECORTE_M) if ponto_central else None
+    nos = {}
+    for osmid, lat, lon, etiquetas in ler_nos(arquivo):
+        if osmid not in usados:
+            continue
+        if limites and not (limites[1] <= lat <= limites[0] and limites[3] <= lon <= limites[2]):
+            continue
+        dados = {"y": lat, "x": lon}
+        dados.update({k: etiquetas[k] for k in ETIQUETAS_NO if k in etiquetas})
+        nos[osmid] = dados
+    return vias, nos
+
+
+def _adicionar_vias(G, vias, nos):
+    for osmid, refs, etiquetas in vias:
+        mao_unica = etiquetas.get("oneway") in VALORES_MAO_UNICA or etiquetas.get("junction") == "roundabout"
+        if mao_unica and etiquetas.get("oneway") in VALORES_INVERTIDOS:
+            refs = refs[::-1]
+        atributos = dict(etiquetas, osmid=osmid, oneway=mao_unica)
+        # Nós fora do extrato (ou do recorte) partem a via em trechos, como o
+        # truncate do OSMnx faria ao remover esses nós.
+        trecho = []
+        for ref in refs + [None]:
+            if ref is not None and ref in nos:
+                trecho.append(ref)
+                continue
+            arestas = list(zip(trecho[:-1], trecho[1:]))
+            if arestas:
+                G.add_edges_from(arestas, **atributos, reversed=False)
+                if not mao_unica:
+                    G.add_edges_from([(v, u) for u, v in arestas], **atributos, reversed=True)
+            trecho = []
+
+
+def resolver_restricoes(G, relacoes):
+    """Restrições em pares de arestas do grafo: {"de": [u, via], "para": [via, w], "tipo"}.
+
+    Depois da simplificação uma aresta pode reunir várias vias (osmid em lista);
+    vale qualquer aresta que chega ao nó de via pela via "de" e sai pela via "para".
+    """
+    def vias(d):
+        osmid = d.get("osmid")
+        return set(osmid) if isinstance(osmid, (list, tuple)) else {osmid}
+
+    resolvidas = []
+    for r in relacoes:
+        via = r["via"]
+        if via not in G:
+            continue
+        entradas = {u for u, _, d in G.in_edges(via, data=True) if r["de"] in vias(d)}
+        saidas = {w for _, w, d in G.out_edges(via, data=True) if r["para"] in vias(d)}
+        for u in sorted(entradas):
+            for w in sorted(saidas):
+                resolvidas.append({"de": [u, via], "para": [via, w], "tipo": r["tipo"]})
+    return resolvidas
+
+
+def grafo_de_osm(arquivo, ponto_central=None, distancia=None, simplificar=True, manter_tudo=False,
+                 restricoes=None):
+    """MultiDiGraph "drive" com `length`, no mesmo formato do ox.graph_from_point.
+
+    Se `restricoes` for uma lista, recebe as restrições de conversão já
+    resolvidas em arestas do grafo devolvido (ver resolver_restricoes).
+    """
+    import networkx as nx
+    import osmnx as ox
+
+    relacoes = [] if restricoes is not None else None
+    vias, nos = ler_extrato(arquivo, ponto_central, distancia, relacoes)
+    if not vias or not nos:
+        raise ValueError(f"Nenhuma via dirigível encontrada em {arquivo}")
+
+    G = nx.MultiDiGraph(created_date=dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        created_with=f"IngestaoOSM (OSMnx {ox.__version__})",
+                        crs=ox.settings.default_crs)
+    G.add_nodes_from(nos.items())
+    _adicionar_vias(G, vias, nos)
+    del vias, nos
+    G.remove_nodes_from([n for n, grau in G.degree() if grau == 0])
+    ox.distance.add_edge_lengths(G)
+
+    if not manter_tudo:
+        G = ox.truncate.largest_component(G, strongly=False)
+    if simplificar:
+        G = ox.simplify_graph(G)
+    G_folga = G
+    if ponto_central:
+        norte, sul, leste, oeste = _recorte(ponto_central, distancia)
+        G = ox.truncate.truncate_graph_bbox(G, (oeste, sul, leste, norte))
+        if not manter_tudo:
+            G = ox.truncate.largest_component(G, strongly=False)
+    # Ruas por interseção contadas no grafo com folga, como no OSMnx.
+    nx.set_node_attributes(G, ox.stats.count_streets_per_node(G_folga, nodes=G.nodes), "street_count")
+    if restricoes is not None:
+        restricoes.extend(resolver_restricoes(G, relacoes))
+    return G
+
+
+def main(argv=None):
+    from GrafoManager import GrafoManager
+
+    ap = argparse.ArgumentParser(description="Gera o GraphML da malha 'drive' a partir de um extrato OSM")
+    ap.add_argument("extrato", help=".osm, .osm.gz, .osm.bz2 ou .pbf")
+    ap.add_argument("saida", nargs="?", default="grafo_brasilia.graphml")
+    ap.add_argument("--ponto", default=None, help='recorte em volta de "lat,lon"')
+    ap.add_argument("--distancia", type=float, default=3000, help="metros a partir de --ponto")
+    args = ap.parse_args(argv)
+
+    GrafoManager(args.saida).importar_osm(args.extrato, ponto_central=args.ponto,
+                                          distancia=args.distancia if args.ponto else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Limites (superiores) dos baldes dos histogramas.
+BALDES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BALDES_NOS = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000, 300000)
+
+
+class MetricasBusca:
+    """Contadores de uma única busca, preenchidos pelo motor quando recebidos."""
+
+    __slots__ = ("fechados", "relaxadas", "insercoes", "remocoes",
+                 "tempo_busca", "tempo_heuristica", "cache")
+
+    def __init__(self):
+        self.fechados = 0
+        self.relaxadas = 0
+        self.insercoes = 0
+        self.remocoes = 0
+        self.tempo_busca = 0.0
+        self.tempo_heuristica = 0.0
+        self.cache = False
+
+    def como_dict(self):
+        return {
+            "nós fechados": self.fechados,
+            "arestas relaxadas": self.relaxadas,
+            "inserções heap": self.insercoes,
+            "remoções heap": self.remocoes,
+            "tempo busca (s)": self.tempo_busca,
+            "tempo heurística (s)": self.tempo_heuristica,
+            "tempo relaxamento (s)": max(self.tempo_busca - self.tempo_heuristica, 0.0),
+            "cache": self.cache,
+        }
+
+
+class Histograma:
+    def __init__(self, baldes):
+        self.baldes = tuple(baldes)
+        self.contagens = [0] * (len(self.baldes) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Instrumentacao:
+    """Agrega as métricas das consultas em contadores e histogramas.
+
+    Desligada (`ativo=False`), os motores nem recebem um MetricasBusca e o custo
+    por consulta é um teste de atributo. `exportar_prometheus()` gera o formato
+    texto de exposição do Prometheus.
+    """
+
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.contadores = defaultdict(float)
+        self.histogramas = {}
+
+    def _histograma(self, nome, rotulos, baldes):
+        chave = (nome, rotulos)
+        h = self.histogramas.get(chave)
+        if h is None:
+            h = self.histogramas[chave] = Histograma(baldes)
+        return h
+
+    def registrar_busca(self, algoritmo, peso, metricas):
+        rotulos = (("algoritmo", algoritmo), ("peso", peso))
+        with self._trava:
+            c = self.contadores
+            c[("rotas_consultas_total", rotulos)] += 1
+            if metricas.cache:
+                c[("rotas_cache_acertos_total", rotulos)] += 1
+                return
+            c[("rotas_nos_fechados_total", rotulos)] += metricas.fechados
+            c[("rotas_arestas_relaxadas_total", rotulos)] += metricas.relaxadas
+            c[("rotas_heap_insercoes_total", rotulos)] += metricas.insercoes
+            c[("rotas_heap_remocoes_total", rotulos)] += metricas.remocoes
+            c[("rotas_tempo_heuristica_segundos_total", rotulos)] += metricas.tempo_heuristica
+            self._histograma("rotas_busca_segundos", rotulos, BALDES_SEGUNDOS).observar(metricas.tempo_busca)
+            self._histograma("rotas_nos_fechados", rotulos, BALDES_NOS).observar(metricas.fechados)
+
+    def registrar_tempo(self, nome, segundos, rotulos=()):
+        """Fases fora da busca: "snapping", "peso_caminho", "http"."""
+        with self._trava:
+            self._histograma(f"rotas_{nome}_segundos", tuple(rotulos), BALDES_SEGUNDOS).observar(segundos)
+
+    def contar(self, nome, rotulos=(), valor=1):
+        with self._trava:
+            self.contadores[(f"rotas_{nome}_total", tuple(rotulos))] += valor
+
+    # ------------------------
+    # Exportação
+    # ------------------------
+    @staticmethod
+    def _rotulos(rotulos, extra=()):
+        itens = tuple(rotulos) + tuple(extra)
+        if not itens:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in itens) + "}"
+
+    def exportar_prometheus(self):
+        linhas = []
+        with self._trava:
+            nomes = sorted({nome for nome, _ in self.contadores})
+            for nome in nomes:
+                linhas.append(f"# TYPE {nome} counter")
+                for (n, rotulos), valor in sorted(self.contadores.items()):
+                    if n == nome:
+                        linhas.append(f"{nome}{self._rotulos(rotulos)} {valor:g}")
+            nomes = sorted({nome for nome, _ in self.histogramas})
+            for nome in nomes:
+                linhas.append(f"# TYPE {nome} histogram")
+                for (n, rotulos), h in sorted(self.histogramas.items()):
+                    if n != nome:
+                        continue
+                    acumulado = 0
+                    for limite, qtd in zip(self._baldes_texto(h), h.contagens):
+                        acumulado += qtd
+                        linhas.append(f"{nome}_bucket{self._rotulos(rotulos, (('le', limite),))} {acumulado}")
+                    linhas.append(f"{nome}_sum{self._rotulos(rotulos)} {h.soma:g}")
+                    linhas.append(f"{nome}_count{self._rotulos(rotulos)} {h.total}")
+        return "\n".join(linhas) + "\n"
+
+    @staticmethod
+    def _baldes_texto(h):
+        return [f"{b:g}" for b in h.baldes] + ["+Inf"]
+
+    def resumo(self):
+        """Contadores e médias dos histogramas em um dicionário simples."""
+        with self._trava:
+            saida = {f"{n}{self._rotulos(r)}": v for (n, r), v in self.contadores.items()}
+            for (n, r), h in self.histogramas.items():
+                saida[f"{n}_media{self._rotulos(r)}"] = h.soma / h.total if h.total else 0.0
+        return saida
@@ -0,0 +1,120 @@
+import math
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from GrafoCompacto import RAIO_TERRA_M
+from IndiceEspacial import _expandir_faixas
+
+# Grafo compartilhado pelos processos do pool (herdado sem cópia com "fork").
+_compacto = None
+
+
+def _inicializar(compacto):
+    global _compacto
+    _compacto = compacto
+
+
+# ------------------------
+# Geometria
+# ------------------------
+def _segmentos(compacto, indices, custos, limite, peso):
+    """Segmentos (lon, lat) alcançáveis em até `limite` a partir dos nós assentados.
+
+    Uma aresta u → v entra inteira se custo(u) + w ≤ limite; senão entra só a
+    fração (limite − custo(u)) / w a partir de u, que é até onde se chega
+    antes de esgotar o orçamento.
+    """
+    dentro = custos <= limite
+    nos, cu = indices[dentro], custos[dentro]
+    grau = compacto.offsets[nos + 1] - compacto.offsets[nos]
+    arestas = _expandir_faixas(compacto.offsets[nos], grau)
+    cu = np.repeat(cu, grau)
+    w = compacto.pesos[peso][arestas].astype(np.float64)
+    if compacto._filtro is not None:
+        w[~compacto.mascara(compacto._filtro)[arestas]] = np.inf
+    fracao = np.where(w > 0, (limite - cu) / np.where(w > 0, w, 1.0), 1.0)
+    fracao = np.minimum(fracao, 1.0)
+    sel = fracao > 0
+    arestas, fracao = arestas[sel], fracao[sel]
+
+    u = compacto.origens()[arestas]
+    v = compacto.alvos[arestas]
+    x0, y0 = compacto.x[u], compacto.y[u]
+    x1 = x0 + (compacto.x[v] - x0) * fracao
+    y1 = y0 + (compacto.y[v] - y0) * fracao
+    return np.stack([np.column_stack([x0, y0]), np.column_stack([x1, y1])], axis=1)
+
+
+def _poligono(segmentos, largura_m):
+    """União dos segmentos com um buffer de `largura_m`, calculada em metros."""
+    if len(segmentos) == 0:
+        return None
+    import shapely
+    lat0 = float(segmentos[:, :, 1].mean())
+    kx = math.radians(1.0) * RAIO_TERRA_M * math.cos(math.radians(lat0))
+    ky = math.radians(1.0) * RAIO_TERRA_M
+    # Buffer de cada segmento e união vetorizados (shapely 2): bem mais rápido
+    # que o buffer de um único MultiLineString com milhares de partes sobrepostas.
+    linhas = shapely.linestrings(segmentos * np.array([kx, ky]))
+    area = shapely.union_all(shapely.buffer(linhas, largura_m, quad_segs=4))
+    return shapely.transform(area, lambda xy: xy / np.array([kx, ky]))
+
+
+# ------------------------
+# Isócronas
+# ------------------------
+def isocrona(compacto, fontes, faixas, peso="travel_time", geometria="poligono", largura_m=40.0):
+    """Isócrona a partir de um conjunto de fontes (índices do CSR).
+
+    Uma única busca limitada pela maior faixa; as faixas menores são recortes
+    dela (cumulativas: a de 10 min contém a de 5 min). `geometria` é
+    "poligono" (segmentos + polígono), "segmentos" ou None (só os nós).
+    Retorna {"nos": {id: custo}, "faixas": [{"limite", "nós", "segmentos", "poligono"}]}.
+    """
+    faixas = sorted(float(f) for f in faixas)
+    if not faixas or faixas[0] < 0:
+        raise ValueError("Faixas da isócrona devem ser não negativas")
+    indices, custos = compacto.alcance(fontes, faixas[-1], peso=peso)
+
+    resultado = []
+    for limite in faixas:
+        faixa = {"limite": limite, "nós": int(np.count_nonzero(custos <= limite)),
+                 "segmentos": None, "poligono": None}
+        if geometria is not None:
+            import shapely
+            seg = _segmentos(compacto, indices, custos, limite, peso)
+            faixa["segmentos"] = shapely.multilinestrings(seg)
+            if geometria == "poligono":
+                faixa["poligono"] = _poligono(seg, largura_m)
+        resultado.append(faixa)
+
+    return {
+        "nos": dict(zip(compacto.ids[indices].tolist(), custos.tolist())),
+        "faixas": resultado,
+    }
+
+
+def _lote(fontes, faixas, peso, geometria, largura_m):
+    return [isocrona(_compacto, [s], faixas, peso, geometria, largura_m) for s in fontes]
+
+
+def isocronas_em_lote(compacto, fontes, faixas, peso="travel_time", geometria="poligono",
+                      largura_m=40.0, processos=None, bloco=4):
+    """Uma isócrona por fonte, distribuídas em blocos por um ProcessPoolExecutor."""
+    fontes = [int(s) for s in fontes]
+    processos = processos or 1
+
+    if processos <= 1 or len(fontes) <= bloco:
+        return [isocrona(compacto, [s], faixas, peso, geometria, largura_m) for s in fontes]
+
+    metodos = mp.get_all_start_methods()
+    contexto = mp.get_context("fork" if "fork" in metodos else None)
+    partes = [fontes[i:i + bloco] for i in range(0, len(fontes), bloco)]
+    with ProcessPoolExecutor(max_workers=min(processos, os.cpu_count() or 1),
+                             mp_context=contexto, initializer=_inicializar,
+                             initargs=(compacto,)) as pool:
+        futuros = [pool.submit(_lote, p, faixas, peso, geometria, largura_m) for p in partes]
+        return [iso for f in futuros for iso in f.result()]
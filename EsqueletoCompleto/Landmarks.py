@@ -0,0 +1,179 @@
+import os
+import random
+
+import numpy as np
+
+from HierarquiaContracao import assinatura_pesos
+
+# Distâncias infinitas viram um valor finito grande: as diferenças continuam sendo
+# limites inferiores válidos e evitamos inf - inf = nan dentro da heurística.
+INALCANCAVEL = 1e12
+
+
+def caminho_landmarks(arquivo, peso):
+    return os.path.splitext(arquivo)[0] + f".alt_{peso}.npz"
+
+
+class Landmarks:
+    """Heurística ALT (A*, Landmarks, desigualdade triangular).
+
+    Para cada landmark L guardamos d(L, v) e d(v, L) para todos os nós. Pela
+    desigualdade triangular, d(v, t) >= max(d(L, t) - d(L, v), d(v, L) - d(t, L)),
+    um limite bem mais justo que a linha reta a 120 km/h.
+    """
+
+    def __init__(self, compacto, peso, indices, dist_de, dist_para, assinatura=None):
+        self.compacto = compacto
+        self.peso = peso
+        self.indices = np.asarray(indices, dtype=np.int64)
+        # float64: arredondar d(L, v) para float32 pode deixar a diferença acima da
+        # distância real e tornar a heurística inadmissível.
+        self.dist_de = np.asarray(dist_de, dtype=np.float64)
+        self.dist_para = np.asarray(dist_para, dtype=np.float64)
+        self.assinatura = assinatura
+        self._de = [linha.tolist() for linha in self.dist_de]
+        self._para = [linha.tolist() for linha in self.dist_para]
+
+    # ------------------------
+    # Seleção dos landmarks
+    # ------------------------
+    @classmethod
+    def construir(cls, compacto, peso="travel_time", quantidade=16, metodo="avoid", semente=0):
+        if metodo not in ("farthest", "avoid"):
+            raise ValueError(f"Método de seleção desconhecido: {metodo}")
+        rnd = random.Random(semente)
+        n = compacto.n_nos
+        indices, de, para = [], [], []
+
+        def adicionar(idx):
+            d_de, _ = compacto.arvore(idx, peso)
+            d_para, _ = compacto.arvore(idx, peso, reverso=True)
+            indices.append(idx)
+            de.append(np.where(np.isinf(d_de), INALCANCAVEL, d_de))
+            para.append(np.where(np.isinf(d_para), INALCANCAVEL, d_para))
+
+        def mais_distante(dist):
+            alcancavel = dist < INALCANCAVEL
+            if indices:
+                alcancavel[indices] = False
+            if not alcancavel.any():
+                return None
+            return int(np.argmax(np.where(alcancavel, dist, -1.0)))
+
+        # O primeiro landmark é o nó mais distante de um nó aleatório.
+        inicial, _ = compacto.arvore(rnd.randrange(n), peso)
+        primeiro = mais_distante(np.where(np.isinf(inicial), INALCANCAVEL, inicial))
+        adicionar(primeiro if primeiro is not None else rnd.randrange(n))
+
+        while len(indices) < min(quantidade, n):
+            proximo = None
+            if metodo == "avoid":
+                # Algumas raízes não levam a nenhuma folha útil; tenta outras antes
+                # de cair no critério "farthest".
+                for _ in range(5):
+                    proximo = cls._escolher_avoid(compacto, peso, indices, de, para, rnd)
+                    if proximo is not None:
+                        break
+            if proximo is None:
+                # Maximiza a menor distância (ida + volta) aos landmarks já escolhidos.
+                menor = np.min(np.array(de) + np.array(para), axis=0)
+                proximo = mais_distante(menor)
+            if proximo is None:
+                break
+            adicionar(proximo)
+
+        return cls(compacto, peso, indices, np.array(de), np.array(para),
+                   assinatura=assinatura_pesos(compacto, peso))
+
+    @staticmethod
+    def _escolher_avoid(compacto, peso, indices, de, para, rnd):
+        """Seleção "avoid" (Goldberg & Werneck): procura a região onde os limites são piores.
+
+        Numa árvore de caminhos mínimos a partir de uma raiz, o peso de cada nó é
+        o quanto os landmarks atuais subestimam d(raiz, v). Descemos da raiz pelo
+        filho de maior subárvore (ignorando subárvores que já contêm landmark)
+        até uma folha, que vira o novo landmark.
+        """
+        n = compacto.n_nos
+        de_arr, para_arr = np.array(de), np.array(para)
+        # Raiz aleatória, com preferência por nós longe dos landmarks atuais.
+        candidatos = np.argsort(np.min(de_arr + para_arr, axis=0))[-max(1, n // 10):]
+        raiz = int(candidatos[rnd.randrange(len(candidatos))])
+        dist, pred = compacto.arvore(raiz, peso)
+        alcancados = np.flatnonzero(np.isfinite(dist))
+        if len(alcancados) <= 1:
+            return None
+
+        limite = np.max(np.maximum(de_arr[:, alcancados] - de_arr[:, [raiz]],
+                                   para_arr[:, [raiz]] - para_arr[:, alcancados]), axis=0)
+        folga = np.zeros(n)
+        folga[alcancados] = np.maximum(dist[alcancados] - np.maximum(limite, 0.0), 0.0)
+
+        tamanho = folga.copy()
+        tem_landmark = np.zeros(n, dtype=bool)
+        tem_landmark[indices] = True
+        # Acumula de baixo para cima (nós mais distantes primeiro).
+        for v in alcancados[np.argsort(dist[alcancados])[::-1]].tolist():
+            p = pred[v]
+            if tem_landmark[v]:
+                tamanho[v] = 0.0
+            if p >= 0:
+                tamanho[p] += tamanho[v]
+                tem_landmark[p] |= tem_landmark[v]
+
+        filhos = {}
+        for v in alcancados.tolist():
+            if pred[v] >= 0:
+                filhos.setdefault(int(pred[v]), []).append(v)
+        v = raiz
+        while v in filhos:
+            melhor = max(filhos[v], key=lambda f: tamanho[f])
+            if tamanho[melhor] <= 0:
+                break
+            v = melhor
+        return None if v == raiz or v in indices else v
+
+    # ------------------------
+    # Persistência
+    # ------------------------
+    def salvar(self, arquivo):
+        np.savez(arquivo, indices=self.indices, dist_de=self.dist_de, dist_para=self.dist_para,
+                 peso=np.array(self.peso), assinatura=np.array(self.assinatura or ""))
+
+    @classmethod
+    def carregar(cls, arquivo, compacto):
+        """Retorna None se o arquivo não existe, foi gerado para outro grafo/pesos ou em float32."""
+        if not os.path.exists(arquivo):
+            return None
+        dados = np.load(arquivo)
+        peso = str(dados["peso"])
+        assinatura = str(dados["assinatura"])
+        if dados["dist_de"].shape[1] != compacto.n_nos or assinatura != assinatura_pesos(compacto, peso):
+            return None
+        if dados["dist_de"].dtype != np.float64:
+            # Tabelas antigas em float32 não garantem limites inferiores; refaz.
+            return None
+        return cls(compacto, peso, dados["indices"], dados["dist_de"], dados["dist_para"],
+                   assinatura=assinatura)
+
+    # ------------------------
+    # Heurística
+    # ------------------------
+    def heuristica(self, s, t, ativos=4):
+        """Função h(v) para o A* até t, usando os `ativos` landmarks mais úteis para (s, t)."""
+        limites = np.maximum(self.dist_de[:, t] - self.dist_de[:, s],
+                             self.dist_para[:, s] - self.dist_para[:, t])
+        escolhidos = np.argsort(limites)[::-1][:ativos].tolist()
+        termos = [(self._de[i], self._de[i][t], self._para[i], self._para[i][t]) for i in escolhidos]
+
+        def h(v):
+            melhor = 0.0
+            for de, de_t, para, para_t in termos:
+                a = de_t - de[v]
+                b = para[v] - para_t
+                if a > melhor:
+                    melhor = a
+                if b > melhor:
+                    melhor = b
+            return melhor
+        return h
@@ -0,0 +1,62 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Grafo compartilhado pelos processos do pool. Com "fork" o objeto é herdado sem
+# cópia (e, vindo do snapshot, as páginas mapeadas são as mesmas do processo pai).
+_compacto = None
+
+
+def _inicializar(compacto):
+    global _compacto
+    _compacto = compacto
+
+
+def _linhas(origens, destinos, peso, secundario):
+    alvos = set(destinos)
+    linhas = []
+    for s in origens:
+        res = _compacto.um_para_muitos(s, alvos, peso=peso, secundario=secundario)
+        custo = np.full(len(destinos), np.inf)
+        outro = np.full(len(destinos), np.inf)
+        for j, t in enumerate(destinos):
+            if t in res:
+                custo[j], outro[j] = res[t]
+        linhas.append((custo, outro))
+    return linhas
+
+
+def calcular_matriz(compacto, origens, destinos, peso="travel_time", secundario="length",
+                    processos=None, bloco=8):
+    """Matrizes N x M (custo em `peso` e `secundario` no mesmo caminho) entre índices do CSR.
+
+    Cada origem distinta roda uma única busca um-para-muitos. Com processos > 1
+    as origens são distribuídas em blocos por um ProcessPoolExecutor.
+    """
+    origens = [int(o) for o in origens]
+    destinos = [int(d) for d in destinos]
+    distintas = list(dict.fromkeys(origens))
+    processos = processos or 1
+
+    if processos <= 1 or len(distintas) <= bloco:
+        _inicializar(compacto)
+        try:
+            linhas = _linhas(distintas, destinos, peso, secundario)
+        finally:
+            _inicializar(None)
+    else:
+        metodos = mp.get_all_start_methods()
+        contexto = mp.get_context("fork" if "fork" in metodos else None)
+        partes = [distintas[i:i + bloco] for i in range(0, len(distintas), bloco)]
+        with ProcessPoolExecutor(max_workers=min(processos, os.cpu_count() or 1),
+                                 mp_context=contexto, initializer=_inicializar,
+                                 initargs=(compacto,)) as pool:
+            futuros = [pool.submit(_linhas, p, destinos, peso, secundario) for p in partes]
+            linhas = [linha for f in futuros for linha in f.result()]
+
+    por_origem = dict(zip(distintas, linhas))
+    custo = np.vstack([por_origem[o][0] for o in origens]) if origens else np.empty((0, len(destinos)))
+    outro = np.vstack([por_origem[o][1] for o in origens]) if origens else np.empty((0, len(destinos)))
+    return custo, outro
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Perfis de velocidade nomeados. "velocidades" é em km/h por classe de via
+# (highway), "fatores" multiplica a velocidade final de algumas classes e
+# "velocidade_padrao" vale para classes fora da tabela.
+PERFIS = {
+    "padrao": {
+        "velocidades": {
+            "motorway": 120,
+            "trunk": 90,
+            "primary": 60,
+            "secondary": 40,
+            "tertiary": 30,
+            "residential": 20,
+            "service": 15,
+        },
+        "fatores": {"residential": 0.7},
+        "velocidade_padrao": 30,
+    },
+    "pico": {
+        "velocidades": {
+            "motorway": 70,
+            "trunk": 50,
+            "primary": 35,
+            "secondary": 25,
+            "tertiary": 20,
+            "residential": 20,
+            "service": 10,
+        },
+        "fatores": {"residential": 0.7},
+        "velocidade_padrao": 20,
+    },
+}
+
+
+def versao_perfil(perfil):
+    texto = json.dumps(perfil, sort_keys=True)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:12]
+
+
+@lru_cache(maxsize=4096)
+def interpretar_maxspeed(val):
+    """Converte um valor de maxspeed do OSM em km/h (None se não der para ler).
+
+    Memoizado: um grafo tem poucas dezenas de valores distintos de maxspeed.
+    """
+    if val is None:
+        return None
+    try:
+        if isinstance(val, str):
+            m = re.search(r'(\d+)', val)
+            if m:
+                return float(m.group(1))
+            else:
+                return None
+        return float(val)
+    except Exception:
+        return None
+
+
+def maxspeed_em_kmh(valores):
+    """Array float com a maxspeed de cada valor (NaN quando ausente ou inválida)."""
+    kmh = [interpretar_maxspeed(v) for v in valores]
+    return np.array([np.nan if v is None else v for v in kmh], dtype=np.float64)
+
+
+def calcular_tempos(comprimento, classe, classes, maxspeed_kmh, perfil):
+    """travel_time (s) de todas as arestas de uma vez.
+
+    comprimento: metros por aresta; classe: índice em `classes` (nome do highway);
+    maxspeed_kmh: km/h por aresta, NaN quando a via não informa.
+    """
+    velocidades = perfil["velocidades"]
+    fatores = perfil.get("fatores", {})
+    padrao = perfil.get("velocidade_padrao", 30)
+    vel_classe = np.array([velocidades.get(c, padrao) for c in classes], dtype=np.float64)
+    fator_classe = np.array([fatores.get(c, 1.0) for c in classes], dtype=np.float64)
+
+    classe = np.asarray(classe)
+    maxspeed_kmh = np.asarray(maxspeed_kmh, dtype=np.float64)
+    # maxspeed 0 ou ausente cai na tabela do perfil.
+    sem_limite = np.isnan(maxspeed_kmh) | (maxspeed_kmh == 0)
+    kmh = np.where(sem_limite, vel_classe[classe], maxspeed_kmh) * fator_classe[classe]
+    velocidade_m_s = np.maximum(kmh * 1000.0 / 3600.0, 1.0)
+
+    comprimento = np.asarray(comprimento, dtype=np.float64)
+    comprimento = np.where(comprimento > 0, comprimento, 1.0)
+    return comprimento / velocidade_m_s
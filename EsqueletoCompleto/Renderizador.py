@@ -0,0 +1,178 @@
+import math
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from PIL import Image
+
+CORES_PADRAO = ("red", "blue", "green", "orange", "purple")
+
+# Renderizador herdado pelos processos do pool (fork), já com a camada base pronta.
+_renderizador = None
+
+
+def _inicializar(renderizador):
+    global _renderizador
+    _renderizador = renderizador
+
+
+def _lote(trabalhos):
+    return [_renderizador.renderizar(**t) for t in trabalhos]
+
+
+class Renderizador:
+    """Desenha rotas sobre uma camada base da malha viária desenhada uma única vez.
+
+    A malha inteira é desenhada uma vez (Agg, sem janela e sem pyplot) e o fundo
+    fica guardado; cada imagem restaura esse fundo e desenha por cima só as
+    rotas pedidas. Vistas enquadradas na rota redesenham apenas as vias dentro
+    do recorte, a partir dos segmentos pré-calculados. As arestas são segmentos
+    retos entre os nós.
+    """
+
+    def __init__(self, compacto, largura_px=1200, dpi=100, cor_fundo="#111111", cor_vias="#999999",
+                 largura_vias=0.4):
+        self.compacto = compacto
+        self.largura_px = largura_px
+        self.dpi = dpi
+        self.cor_fundo = cor_fundo
+        self.cor_vias = cor_vias
+        self.largura_vias = largura_vias
+        self._figura_base = None
+        self.segmentos = self._segmentos_unicos()
+        self.extensao = self._enquadrar(compacto.x.min(), compacto.x.max(),
+                                        compacto.y.min(), compacto.y.max(), 0.02)
+
+    def _segmentos_unicos(self):
+        # Vias de mão dupla viram um segmento só (u, v) com u < v.
+        c = self.compacto
+        u, v = c.origens().astype(np.int64), c.alvos.astype(np.int64)
+        pares = np.unique(np.column_stack([np.minimum(u, v), np.maximum(u, v)]), axis=0)
+        a, b = pares[:, 0], pares[:, 1]
+        return np.stack([np.column_stack([c.x[a], c.y[a]]), np.column_stack([c.x[b], c.y[b]])], axis=1)
+
+    @staticmethod
+    def _enquadrar(x0, x1, y0, y1, margem):
+        dx, dy = max(x1 - x0, 1e-6), max(y1 - y0, 1e-6)
+        return (float(x0 - dx * margem), float(x1 + dx * margem),
+                float(y0 - dy * margem), float(y1 + dy * margem))
+
+    def _tamanho(self, extensao):
+        # Proporção real do recorte (graus de longitude encolhem com a latitude).
+        x0, x1, y0, y1 = extensao
+        razao = (x1 - x0) * math.cos(math.radians((y0 + y1) / 2)) / (y1 - y0)
+        return self.largura_px / self.dpi, self.largura_px / razao / self.dpi
+
+    def _figura(self, extensao):
+        fig = Figure(figsize=self._tamanho(extensao), dpi=self.dpi, facecolor=self.cor_fundo)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        ax.set_facecolor(self.cor_fundo)
+        ax.set_xlim(extensao[0], extensao[1])
+        ax.set_ylim(extensao[2], extensao[3])
+        ax.set_axis_off()
+        return fig, ax
+
+    def _vias(self, ax, extensao):
+        x0, x1, y0, y1 = extensao
+        seg = self.segmentos
+        if extensao != self.extensao:
+            xs, ys = seg[:, :, 0], seg[:, :, 1]
+            seg = seg[(xs.max(axis=1) >= x0) & (xs.min(axis=1) <= x1) &
+                      (ys.max(axis=1) >= y0) & (ys.min(axis=1) <= y1)]
+        ax.add_collection(LineCollection(seg, colors=self.cor_vias, linewidths=self.largura_vias))
+
+    # ------------------------
+    # Camada base
+    # ------------------------
+    def _base(self):
+        # Figura da malha inteira, desenhada uma vez; cada imagem restaura o fundo
+        # salvo (blit) e desenha só as rotas por cima, sem redesenhar as vias.
+        if self._figura_base is None:
+            fig, ax = self._figura(self.extensao)
+            self._vias(ax, self.extensao)
+            fig.canvas.draw()
+            self._figura_base = (fig, ax, fig.canvas.copy_from_bbox(fig.bbox))
+        return self._figura_base
+
+    def camada_base(self):
+        """Raster RGBA da malha inteira (desenhado na primeira chamada)."""
+        fig, _, fundo = self._base()
+        fig.canvas.restore_region(fundo)
+        return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+    # ------------------------
+    # Rotas
+    # ------------------------
+    def renderizar(self, rotas, arquivo=None, cores=None, rotulos=None, largura_linha=3.0,
+                   enquadrar=False, margem=0.15):
+        """Desenha as rotas (listas de ids de nó) e salva em `arquivo`, se informado.
+
+        enquadrar=True recorta a vista em volta das rotas; senão usa a malha
+        inteira já desenhada. Retorna o caminho salvo ou o array RGBA da imagem.
+        """
+        c = self.compacto
+        cores = list(cores or CORES_PADRAO)
+        idx = [np.fromiter((c.indice[n] for n in rota), dtype=np.int64, count=len(rota)) for rota in rotas]
+
+        if enquadrar and any(len(i) for i in idx):
+            todos = np.concatenate(idx)
+            extensao = self._enquadrar(c.x[todos].min(), c.x[todos].max(),
+                                       c.y[todos].min(), c.y[todos].max(), margem)
+            fig, ax = self._figura(extensao)
+            self._vias(ax, extensao)
+            fundo = None
+        else:
+            fig, ax, fundo = self._base()
+            fig.canvas.restore_region(fundo)
+
+        artistas = [ax.plot(c.x[i], c.y[i], color=cores[k % len(cores)], linewidth=largura_linha,
+                            solid_capstyle="round", zorder=2)[0] for k, i in enumerate(idx)]
+        if rotulos:
+            alcas = [Line2D([0], [0], color=cores[k % len(cores)], lw=largura_linha, label=r)
+                     for k, r in enumerate(rotulos)]
+            artistas.append(ax.legend(handles=alcas, loc="upper left", fontsize=9, frameon=True))
+
+        if fundo is None:
+            fig.canvas.draw()
+        else:
+            try:
+                for artista in artistas:
+                    ax.draw_artist(artista)
+            finally:
+                for artista in artistas:
+                    artista.remove()
+        imagem = np.asarray(fig.canvas.buffer_rgba())
+
+        if arquivo is None:
+            return imagem.copy()
+        # PNG com compressão leve: a codificação padrão custa tanto quanto o desenho.
+        opcoes = {"compress_level": 1} if arquivo.lower().endswith(".png") else {}
+        Image.fromarray(imagem).save(arquivo, **opcoes)
+        return arquivo
+
+    def renderizar_lote(self, trabalhos, processos=None, bloco=8):
+        """Renderiza vários pedidos (dicionários com os argumentos de `renderizar`).
+
+        Com processos > 1 os pedidos são divididos em blocos entre processos
+        criados por fork, que herdam a camada base já desenhada.
+        """
+        trabalhos = list(trabalhos)
+        processos = processos or 1
+        self.camada_base()
+        if processos <= 1 or len(trabalhos) <= bloco:
+            return [self.renderizar(**t) for t in trabalhos]
+
+        metodos = mp.get_all_start_methods()
+        contexto = mp.get_context("fork" if "fork" in metodos else None)
+        partes = [trabalhos[i:i + bloco] for i in range(0, len(trabalhos), bloco)]
+        with ProcessPoolExecutor(max_workers=min(processos, os.cpu_count() or 1),
+                                 mp_context=contexto, initializer=_inicializar,
+                                 initargs=(self,)) as pool:
+            futuros = [pool.submit(_lote, p) for p in partes]
+            return [r for f in futuros for r in f.result()]
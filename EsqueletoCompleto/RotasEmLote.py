@@ -0,0 +1,234 @@
+"""Roteamento em lote de pares origem-destino lidos de CSV ou Parquet.
+
+    python RotasEmLote.py pares.csv resultados.csv --grafo grafo_brasilia.graphml --processos 8
+    python RotasEmLote.py pares.parquet resultados.csv --caminho --retomar
+
+A entrada é lida em blocos de `--bloco` linhas, com as colunas lat_origem,
+lon_origem, lat_destino, lon_destino (ou origem/destino com ids de nó). Cada
+bloco é ajustado à malha numa única consulta ao índice espacial e dividido
+entre os processos; enquanto ele é roteado, o próximo já é lido e ajustado.
+Os resultados (id, nós de origem e destino, distância, tempo, nós no caminho e,
+com --caminho, a sequência de nós) são escritos em CSV à medida que saem.
+
+Ao fim de cada bloco o arquivo de saída é sincronizado e um checkpoint
+(<saida>.checkpoint.json) registra as linhas concluídas e o tamanho da saída.
+Com --retomar, a saída é truncada nesse ponto e a leitura pula as linhas já
+feitas, então um job interrompido continua de onde parou sem duplicar linhas.
+"""
+import argparse
+import csv
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except Exception:
+    pq = None
+
+from FiltrosArestas import normalizar_filtro
+from GrafoManager import GrafoManager
+
+COLUNAS_COORD = ("lat_origem", "lon_origem", "lat_destino", "lon_destino")
+COLUNAS_SAIDA = ("id", "no_origem", "no_destino", "distancia_m", "tempo_s", "nos")
+
+# GrafoManager herdado pelos workers do pool (fork).
+_gm = None
+
+
+def _inicializar(gm):
+    global _gm
+    _gm = gm
+
+
+def _rotear(origens, destinos, peso, algoritmo, filtro, com_caminho):
+    c = _gm.compacto
+    saida = []
+    for o, d in zip(origens, destinos):
+        try:
+            rota, _ = _gm._buscar(o, d, peso, algoritmo, filtro)
+        except (ValueError, KeyError):
+            # Sem caminho ou nó fora do grafo: linha sem distância/tempo, o lote segue.
+            saida.append((None, None, 0, None))
+            continue
+        distancia, tempo = _gm._medir_rota(c, rota, peso, algoritmo, filtro)
+        saida.append((distancia, tempo, len(rota), rota if com_caminho else None))
+    return saida
+
+
+def caminho_checkpoint(saida):
+    return saida + ".checkpoint.json"
+
+
+# ------------------------
+# Entrada
+# ------------------------
+def ler_blocos(entrada, tamanho, pular=0):
+    """DataFrames de até `tamanho` linhas, a partir da linha `pular` (sem contar o cabeçalho)."""
+    if entrada.lower().endswith((".parquet", ".pq")):
+        if pq is None:
+            raise RuntimeError("Leitura de Parquet requer o pacote pyarrow")
+        vistas = 0
+        for lote in pq.ParquetFile(entrada).iter_batches(batch_size=tamanho):
+            df = lote.to_pandas()
+            inicio = min(max(pular - vistas, 0), len(df))
+            vistas += len(df)
+            if inicio < len(df):
+                yield df.iloc[inicio:]
+        return
+    yield from pd.read_csv(entrada, chunksize=tamanho,
+                           skiprows=range(1, pular + 1) if pular else None)
+
+
+def nos_do_bloco(gm, df):
+    """Ids dos nós de origem e destino: colunas origem/destino ou coordenadas ajustadas em lote."""
+    if "origem" in df.columns and "destino" in df.columns:
+        return df["origem"].to_numpy(np.int64), df["destino"].to_numpy(np.int64)
+    faltando = [c for c in COLUNAS_COORD if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes na entrada: {', '.join(faltando)}")
+    n = len(df)
+    lats = np.concatenate([df["lat_origem"].to_numpy(float), df["lat_destino"].to_numpy(float)])
+    lons = np.concatenate([df["lon_origem"].to_numpy(float), df["lon_destino"].to_numpy(float)])
+    nos = gm.obter_nos_mais_proximos(lats, lons)
+    return nos[:n], nos[n:]
+
+
+# ------------------------
+# Processamento
+# ------------------------
+def _ler_checkpoint(saida, parametros):
+    arquivo = caminho_checkpoint(saida)
+    if not os.path.exists(arquivo) or not os.path.exists(saida):
+        return 0, 0
+    with open(arquivo, encoding="utf-8") as f:
+        ponto = json.load(f)
+    if ponto.get("parametros") != parametros:
+        raise ValueError("Checkpoint gerado com outros parâmetros; rode sem --retomar")
+    return ponto["linhas"], ponto["bytes_saida"]
+
+
+def _gravar_checkpoint(saida, linhas, bytes_saida, parametros):
+    arquivo = caminho_checkpoint(saida)
+    with open(arquivo + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"linhas": linhas, "bytes_saida": bytes_saida, "parametros": parametros}, f)
+    os.replace(arquivo + ".tmp", arquivo)
+
+
+def processar(gm, entrada, saida, peso="travel_time", algoritmo="astar", evitar=None,
+              processos=None, bloco=50000, sub_bloco=500, caminho=False, retomar=False):
+    """Roteia todos os pares de `entrada` e grava em `saida` (CSV). Retorna as linhas feitas."""
+    if gm.compacto is None:
+        raise RuntimeError("Grafo não carregado")
+    filtro = normalizar_filtro(evitar)
+    parametros = {"entrada": os.path.abspath(entrada), "peso": peso, "algoritmo": algoritmo,
+                  "evitar": sorted(filtro) if filtro else None, "caminho": caminho,
+                  "grafo": os.path.abspath(gm.arquivo)}
+    feitas, tamanho = _ler_checkpoint(saida, parametros) if retomar else (0, 0)
+
+    modo = "r+" if feitas else "w"
+    arquivo = open(saida, modo, newline="", encoding="utf-8")
+    if feitas:
+        arquivo.truncate(tamanho)
+        arquivo.seek(tamanho)
+    escritor = csv.writer(arquivo)
+    if not feitas:
+        escritor.writerow(COLUNAS_SAIDA + (("caminho",) if caminho else ()))
+
+    processos = processos or os.cpu_count() or 1
+    pool = None
+    if processos > 1:
+        metodos = mp.get_all_start_methods()
+        contexto = mp.get_context("fork" if "fork" in metodos else None)
+        pool = ProcessPoolExecutor(max_workers=processos, mp_context=contexto,
+                                   initializer=_inicializar, initargs=(gm,))
+    else:
+        _inicializar(gm)
+
+    def enviar(df, inicio):
+        origens, destinos = nos_do_bloco(gm, df)
+        ids = df["id"].tolist() if "id" in df.columns else list(range(inicio, inicio + len(df)))
+        partes = [(origens[i:i + sub_bloco].tolist(), destinos[i:i + sub_bloco].tolist())
+                  for i in range(0, len(df), sub_bloco)]
+        if pool is None:
+            resultados = [_rotear(o, d, peso, algoritmo, filtro, caminho) for o, d in partes]
+        else:
+            resultados = [pool.submit(_rotear, o, d, peso, algoritmo, filtro, caminho) for o, d in partes]
+        return ids, origens, destinos, resultados
+
+    def escrever(ids, origens, destinos, resultados):
+        linhas = []
+        for r in resultados:
+            linhas.extend(r if pool is None else r.result())
+        for id_, o, d, (dist, tempo, nos, rota) in zip(ids, origens.tolist(), destinos.tolist(), linhas):
+            linha = [id_, o, d, _numero(dist), _numero(tempo), nos]
+            if caminho:
+                linha.append(" ".join(map(str, rota)) if rota else "")
+            escritor.writerow(linha)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+    def concluir(n, dados):
+        nonlocal feitas
+        escrever(*dados)
+        feitas += n
+        _gravar_checkpoint(saida, feitas, arquivo.tell(), parametros)
+        print(f"{feitas} linhas concluídas ({(feitas - retomadas) / (time.perf_counter() - inicio):.0f} linhas/s)")
+
+    inicio = time.perf_counter()
+    retomadas = feitas
+    pendente = None
+    try:
+        for df in ler_blocos(entrada, bloco, feitas):
+            atual = (len(df), enviar(df, feitas + (pendente[0] if pendente else 0)))
+            # O bloco anterior termina enquanto este já está na fila do pool.
+            if pendente is not None:
+                concluir(*pendente)
+            pendente = atual
+        if pendente is not None:
+            concluir(*pendente)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        arquivo.close()
+    return feitas
+
+
+def _numero(valor):
+    return "" if valor is None or not math.isfinite(valor) else f"{valor:.3f}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Roteamento em lote de pares origem-destino")
+    ap.add_argument("entrada", help="CSV ou Parquet com os pares")
+    ap.add_argument("saida", help="CSV de resultados")
+    ap.add_argument("--grafo", default="grafo_brasilia.graphml")
+    ap.add_argument("--peso", default="travel_time", choices=("length", "travel_time"))
+    ap.add_argument("--algoritmo", default="astar",
+                    choices=("dijkstra", "astar", "bidijkstra", "biastar", "ch", "alt", "conversoes"))
+    ap.add_argument("--evitar", default=None, help='perfil de filtro, ex.: "evitar_arteriais"')
+    ap.add_argument("--processos", type=int, default=None)
+    ap.add_argument("--bloco", type=int, default=50000, help="linhas lidas por vez")
+    ap.add_argument("--caminho", action="store_true", help="grava a sequência de nós de cada rota")
+    ap.add_argument("--retomar", action="store_true", help="continua a partir do checkpoint")
+    args = ap.parse_args(argv)
+
+    gm = GrafoManager(args.grafo)
+    gm.carregar_grafo()
+    if args.algoritmo == "ch":
+        gm.preparar_ch(pesos=(args.peso,))
+    elif args.algoritmo == "alt":
+        gm.preparar_alt(pesos=(args.peso,))
+    feitas = processar(gm, args.entrada, args.saida, args.peso, args.algoritmo, args.evitar,
+                       args.processos, args.bloco, caminho=args.caminho, retomar=args.retomar)
+    print(f"Resultados gravados em {args.saida} ({feitas} linhas)")
+
+
+if __name__ == "__main__":
+    main()
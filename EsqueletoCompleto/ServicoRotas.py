@@ -0,0 +1,445 @@
+"""Serviço HTTP/JSON de rotas (asyncio), para uso local.
+
+    python ServicoRotas.py --grafo grafo_brasilia.graphml --porta 8080 --processos 4
+
+Carrega o grafo uma vez e atende:
+
+    GET  /saude
+    GET  /metricas                       (formato texto do Prometheus)
+    GET  /no_mais_proximo?lat=..&lon=..
+    POST /no_mais_proximo  {"pontos": [[lat, lon], ...]}
+    POST /rota             {"origem": [lat, lon] ou id, "destino": ..., "algoritmo_dist": "dijkstra",
+                            "algoritmo_tempo": "astar", "evitar": "evitar_arteriais"}
+    POST /matriz           {"origens": [...], "destinos": [...], "peso": "travel_time"}
+
+As buscas rodam num pool de processos criado com fork depois da carga: os
+workers herdam o GrafoManager, com os arrays do snapshot mapeados em memória
+(mesmas páginas do processo pai). Pedidos de snapping concorrentes são juntados
+numa única consulta vetorizada ao índice espacial. Com `max_pendentes` buscas
+em andamento o serviço responde 503 com Retry-After em vez de enfileirar sem
+limite. Ver CargaServico.py para o gerador de carga.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from FiltrosArestas import PERFIS_FILTRO
+from GrafoManager import GrafoManager
+from Instrumentacao import Instrumentacao
+from MatrizRotas import calcular_matriz
+
+MAX_CORPO = 1 << 20
+MAX_PONTOS = 10000
+# "pareto" só vale nos dois critérios ao mesmo tempo; "ch" e "alt" pedem as
+# estruturas preparadas ao lado do grafo (preparar_ch / preparar_alt).
+ALGORITMOS = ("dijkstra", "astar", "bidijkstra", "biastar", "ch", "alt", "conversoes", "pareto")
+PRE_CALCULADOS = {"ch": "preparar_ch", "alt": "preparar_alt"}
+RAZOES = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+          413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# GrafoManager herdado pelos workers do pool (fork).
+_gm = None
+
+
+def _inicializar(gm):
+    global _gm
+    _gm = gm
+
+
+def _aquecer(_):
+    return os.getpid()
+
+
+def _rota(origem, destino, algoritmo_dist, algoritmo_tempo, evitar):
+    rota_d, rota_t, m_d, m_a = _gm.calcular_rotas(origem, destino, algoritmo_dist, algoritmo_tempo,
+                                                  evitar=evitar)
+    if rota_d is None:
+        return None
+    return {"distancia": dict(m_d, rota=rota_d), "tempo": dict(m_a, rota=rota_t)}
+
+
+def _matriz(origens, destinos, peso):
+    secundario = "length" if peso == "travel_time" else "travel_time"
+    custo, outro = calcular_matriz(_gm.compacto, origens, destinos, peso=peso, secundario=secundario)
+    distancia, tempo = (custo, outro) if peso == "length" else (outro, custo)
+    return _sem_inf(distancia), _sem_inf(tempo)
+
+
+def _sem_inf(matriz):
+    # JSON não tem Infinity: pares sem caminho viram null.
+    return [[v if math.isfinite(v) else None for v in linha] for linha in matriz.tolist()]
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _conferir_coordenadas(lats, lons):
+    # nan/inf passariam pelo float() e só falhariam no índice espacial.
+    if not (np.isfinite(lats).all() and np.isfinite(lons).all()):
+        raise ErroRequisicao(400, "Coordenadas devem ser números finitos")
+
+
+# ------------------------
+# Snapping em lote
+# ------------------------
+class AgrupadorSnapping:
+    """Junta os pedidos de snapping que chegam numa janela curta numa só consulta.
+
+    Cada pedido entra na fila com seus pontos; a fila é processada quando passa
+    `janela_s` desde o primeiro pedido ou quando acumula `max_lote` pontos.
+    """
+
+    def __init__(self, espacial, janela_s=0.002, max_lote=1024):
+        self.espacial = espacial
+        self.janela_s = janela_s
+        self.max_lote = max_lote
+        self._fila = []
+        self._pontos = 0
+        self._agendado = None
+        self.lotes = 0
+        self.pedidos = 0
+
+    async def indices(self, lats, lons):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._fila.append((lats, lons, futuro))
+        self._pontos += len(lats)
+        if self._pontos >= self.max_lote:
+            self._processar()
+        elif self._agendado is None:
+            self._agendado = loop.call_later(self.janela_s, self._processar)
+        return await futuro
+
+    def _processar(self):
+        if self._agendado is not None:
+            self._agendado.cancel()
+            self._agendado = None
+        fila, self._fila, self._pontos = self._fila, [], 0
+        if not fila:
+            return
+        try:
+            idx, dist = self.espacial.indices_mais_proximos(
+                np.concatenate([f[0] for f in fila]), np.concatenate([f[1] for f in fila]))
+        except Exception as e:
+            for _, _, futuro in fila:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        self.lotes += 1
+        self.pedidos += len(fila)
+        pos = 0
+        for lats, _, futuro in fila:
+            k = len(lats)
+            if not futuro.done():
+                futuro.set_result((idx[pos:pos + k], dist[pos:pos + k]))
+            pos += k
+
+
+# ------------------------
+# Serviço
+# ------------------------
+class ServicoRotas:
+    def __init__(self, gm, processos=None, max_pendentes=None, janela_snapping_s=0.002):
+        if gm.compacto is None:
+            raise RuntimeError("Grafo não carregado")
+        self.gm = gm
+        self.processos = processos or os.cpu_count() or 1
+        self.max_pendentes = max_pendentes or 4 * self.processos
+        self.pendentes = 0
+        self.agrupador = AgrupadorSnapping(gm.indice_espacial(), janela_snapping_s)
+        self.metricas = Instrumentacao(ativo=True)
+        self.preparados = self._carregar_preparados()
+        # `evitar` aceita perfis nomeados e classes de via do grafo ou dos perfis.
+        self.filtros_validos = set(PERFIS_FILTRO).union(gm.compacto.classes, *PERFIS_FILTRO.values())
+        self._pool = None
+        self._rotas = {
+            ("GET", "/saude"): self._saude,
+            ("GET", "/metricas"): self._metricas,
+            ("GET", "/no_mais_proximo"): self._no_mais_proximo,
+            ("POST", "/no_mais_proximo"): self._no_mais_proximo,
+            ("POST", "/rota"): self._rota,
+            ("POST", "/matriz"): self._matriz,
+        }
+
+    def _carregar_preparados(self):
+        """{(algoritmo, peso)} de CH/ALT já preparados; carregados aqui, os workers os herdam."""
+        preparados = set()
+        for peso in self.gm.compacto.PESOS:
+            for algoritmo, carregar in (("ch", self.gm.hierarquia), ("alt", self.gm.landmarks)):
+                try:
+                    carregar(peso)
+                    preparados.add((algoritmo, peso))
+                except RuntimeError:
+                    pass
+        return preparados
+
+    def iniciar_pool(self):
+        """Cria os workers antes do laço de eventos, com o grafo já carregado."""
+        c = self.gm.compacto
+        for peso in c.PESOS:
+            c._listas(peso)  # herdadas pelos workers em vez de recriadas em cada um
+        metodos = mp.get_all_start_methods()
+        contexto = mp.get_context("fork" if "fork" in metodos else None)
+        self._pool = ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto,
+                                         initializer=_inicializar, initargs=(self.gm,))
+        list(self._pool.map(_aquecer, range(self.processos)))
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _no_pool(self, funcao, *args):
+        if self.pendentes >= self.max_pendentes:
+            self.metricas.contar("http_rejeitadas")
+            raise ErroRequisicao(503, "Serviço sobrecarregado, tente novamente")
+        self.pendentes += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, funcao, *args)
+        finally:
+            self.pendentes -= 1
+
+    # ------------------------
+    # Pontos
+    # ------------------------
+    async def _indices(self, pontos):
+        """Índices no CSR de uma lista de ids e/ou coordenadas [lat, lon]."""
+        if not isinstance(pontos, list) or not pontos:
+            raise ErroRequisicao(400, "Lista de pontos vazia ou inválida")
+        if len(pontos) > MAX_PONTOS:
+            raise ErroRequisicao(413, f"Mais de {MAX_PONTOS} pontos")
+        indices = [None] * len(pontos)
+        coords = []
+        for i, p in enumerate(pontos):
+            if isinstance(p, (list, tuple)) and len(p) == 2:
+                coords.append(i)
+            else:
+                try:
+                    indices[i] = self.gm.compacto.indice[int(p)]
+                except (KeyError, TypeError, ValueError):
+                    raise ErroRequisicao(400, f"Nó desconhecido: {p!r}")
+        if coords:
+            try:
+                lats = np.array([float(pontos[i][0]) for i in coords])
+                lons = np.array([float(pontos[i][1]) for i in coords])
+            except (TypeError, ValueError):
+                raise ErroRequisicao(400, "Coordenadas inválidas")
+            _conferir_coordenadas(lats, lons)
+            idx, _ = await self.agrupador.indices(lats, lons)
+            for i, j in zip(coords, idx.tolist()):
+                indices[i] = j
+        return indices
+
+    # ------------------------
+    # Endpoints
+    # ------------------------
+    async def _saude(self, consulta, corpo):
+        c = self.gm.compacto
+        return {
+            "nos": c.n_nos,
+            "arestas": c.n_arestas,
+            "versao": self.gm.versao,
+            "processos": self.processos,
+            "pendentes": self.pendentes,
+            "bbox": [float(c.y.min()), float(c.x.min()), float(c.y.max()), float(c.x.max())],
+        }
+
+    async def _metricas(self, consulta, corpo):
+        self.metricas.contadores[("rotas_snapping_lotes_total", ())] = self.agrupador.lotes
+        self.metricas.contadores[("rotas_snapping_pedidos_total", ())] = self.agrupador.pedidos
+        return self.metricas.exportar_prometheus()
+
+    async def _no_mais_proximo(self, consulta, corpo):
+        if corpo is None:
+            try:
+                lats = np.array([float(v) for v in consulta["lat"]])
+                lons = np.array([float(v) for v in consulta["lon"]])
+            except (KeyError, ValueError):
+                raise ErroRequisicao(400, "Informe lat e lon")
+        else:
+            pontos = corpo.get("pontos")
+            if not isinstance(pontos, list) or not pontos or len(pontos) > MAX_PONTOS:
+                raise ErroRequisicao(400, "Informe de 1 a %d pontos" % MAX_PONTOS)
+            try:
+                lats = np.array([float(p[0]) for p in pontos])
+                lons = np.array([float(p[1]) for p in pontos])
+            except (TypeError, ValueError, IndexError):
+                raise ErroRequisicao(400, "Coordenadas inválidas")
+        _conferir_coordenadas(lats, lons)
+        idx, dist = await self.agrupador.indices(lats, lons)
+        ids = self.gm.compacto.ids[idx].tolist()
+        return {"nos": [{"id": n, "distancia_m": d} for n, d in zip(ids, dist.tolist())]}
+
+    async def _rota(self, consulta, corpo):
+        if "origem" not in corpo or "destino" not in corpo:
+            raise ErroRequisicao(400, "Informe origem e destino")
+        algoritmo_dist = corpo.get("algoritmo_dist", "dijkstra")
+        algoritmo_tempo = corpo.get("algoritmo_tempo", "astar")
+        evitar = corpo.get("evitar")
+        self._conferir_parametros(algoritmo_dist, algoritmo_tempo, evitar)
+        s, t = await self._indices([corpo["origem"], corpo["destino"]])
+        ids = self.gm.compacto.ids
+        resultado = await self._no_pool(_rota, int(ids[s]), int(ids[t]), algoritmo_dist, algoritmo_tempo,
+                                        evitar)
+        # Com os parâmetros já conferidos, a única falha esperada é não haver caminho.
+        if resultado is None:
+            raise ErroRequisicao(404, "Rota não encontrada")
+        return resultado
+
+    def _conferir_parametros(self, algoritmo_dist, algoritmo_tempo, evitar):
+        """400 para o que calcular_rotas recusaria (ele só imprime o erro e devolve None)."""
+        for algoritmo, peso in ((algoritmo_dist, "length"), (algoritmo_tempo, "travel_time")):
+            if algoritmo not in ALGORITMOS:
+                raise ErroRequisicao(400, f"Algoritmo desconhecido: {algoritmo!r}; use {', '.join(ALGORITMOS)}")
+            if algoritmo in PRE_CALCULADOS and (algoritmo, peso) not in self.preparados:
+                raise ErroRequisicao(400, f"Algoritmo '{algoritmo}' não preparado para '{peso}' "
+                                          f"(rode {PRE_CALCULADOS[algoritmo]}() antes de iniciar o serviço)")
+        if (algoritmo_dist == "pareto") != (algoritmo_tempo == "pareto"):
+            raise ErroRequisicao(400, "'pareto' deve ser usado em algoritmo_dist e algoritmo_tempo juntos")
+        if evitar is None:
+            return
+        if isinstance(evitar, str):
+            itens = evitar.split("+")
+        elif isinstance(evitar, list) and all(isinstance(i, str) for i in evitar):
+            itens = evitar
+        else:
+            raise ErroRequisicao(400, "evitar deve ser um perfil ou uma lista de perfis/classes de via")
+        desconhecidos = [i for i in itens if i not in self.filtros_validos]
+        if desconhecidos:
+            raise ErroRequisicao(400, f"Perfil de filtro desconhecido: {', '.join(desconhecidos)}; "
+                                      f"use {', '.join(PERFIS_FILTRO)} ou classes de via")
+        if "ch" in (algoritmo_dist, algoritmo_tempo):
+            raise ErroRequisicao(400, "A hierarquia é pré-calculada sem filtros; use outro algoritmo")
+
+    async def _matriz(self, consulta, corpo):
+        peso = corpo.get("peso", "travel_time")
+        if peso not in self.gm.compacto.PESOS:
+            raise ErroRequisicao(400, f"Peso desconhecido: {peso}")
+        origens = await self._indices(corpo.get("origens"))
+        destinos = await self._indices(corpo.get("destinos"))
+        distancia, tempo = await self._no_pool(_matriz, origens, destinos, peso)
+        return {"distancia": distancia, "tempo": tempo}
+
+    # ------------------------
+    # HTTP
+    # ------------------------
+    async def _despachar(self, metodo, alvo, corpo):
+        partes = urlsplit(alvo)
+        tratador = self._rotas.get((metodo, partes.path))
+        if tratador is None:
+            conhecido = any(caminho == partes.path for _, caminho in self._rotas)
+            raise ErroRequisicao(405 if conhecido else 404, f"{metodo} {partes.path} não suportado")
+        if metodo == "POST":
+            try:
+                corpo = json.loads(corpo or b"{}")
+            except ValueError:
+                raise ErroRequisicao(400, "JSON inválido")
+            if not isinstance(corpo, dict):
+                raise ErroRequisicao(400, "O corpo deve ser um objeto JSON")
+        else:
+            corpo = None
+        return await tratador(parse_qs(partes.query), corpo)
+
+    async def _atender(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                metodo, alvo, versao = linha.decode("latin-1").split()
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                tamanho = int(cabecalhos.get("content-length", 0))
+                manter = versao == "HTTP/1.1" and cabecalhos.get("connection", "").lower() != "close"
+                if tamanho > MAX_CORPO:
+                    self._responder(escritor, 413, {"erro": "Corpo muito grande"}, False)
+                    await escritor.drain()
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+                inicio = time.perf_counter()
+                try:
+                    status, resposta = 200, await self._despachar(metodo, alvo, corpo)
+                except ErroRequisicao as e:
+                    status, resposta = e.status, {"erro": str(e)}
+                except Exception as e:
+                    status, resposta = 500, {"erro": repr(e)}
+                caminho = urlsplit(alvo).path
+                self.metricas.contar("http_requisicoes", (("caminho", caminho), ("status", status)))
+                self.metricas.registrar_tempo("http", time.perf_counter() - inicio, (("caminho", caminho),))
+
+                self._responder(escritor, status, resposta, manter)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    def _responder(escritor, status, resposta, manter):
+        if isinstance(resposta, str):
+            dados, tipo = resposta.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            dados = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+            tipo = "application/json; charset=utf-8"
+        cabecalho = [
+            f"HTTP/1.1 {status} {RAZOES.get(status, '')}",
+            f"Content-Type: {tipo}",
+            f"Content-Length: {len(dados)}",
+            "Connection: keep-alive" if manter else "Connection: close",
+        ]
+        if status == 503:
+            cabecalho.append("Retry-After: 1")
+        escritor.write(("\r\n".join(cabecalho) + "\r\n\r\n").encode("latin-1") + dados)
+
+    async def servir(self, host="127.0.0.1", porta=8080):
+        servidor = await asyncio.start_server(self._atender, host, porta, backlog=1024)
+        print(f"Servindo em http://{host}:{porta} com {self.processos} processos")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serviço HTTP/JSON de rotas")
+    ap.add_argument("--grafo", default="grafo_brasilia.graphml")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--porta", type=int, default=8080)
+    ap.add_argument("--processos", type=int, default=None)
+    ap.add_argument("--max-pendentes", type=int, default=None,
+                    help="buscas em andamento antes de responder 503 (padrão: 4 × processos)")
+    ap.add_argument("--janela-snapping", type=float, default=0.002,
+                    help="segundos para juntar pedidos de snapping num lote")
+    args = ap.parse_args(argv)
+
+    gm = GrafoManager(args.grafo)
+    gm.carregar_grafo()
+    servico = ServicoRotas(gm, args.processos, args.max_pendentes, args.janela_snapping)
+    servico.iniciar_pool()
+    try:
+        asyncio.run(servico.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.fechar()
+
+
+if __name__ == "__main__":
+    main()
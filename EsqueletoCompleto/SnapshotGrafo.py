@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from GrafoCompacto import GrafoCompacto
+
+# Incrementar sempre que o conjunto/formato dos arrays mudar.
+VERSAO_FORMATO = 3
+
+ARRAYS = ("ids", "x", "y", "offsets", "alvos", "length", "travel_time", "chaves", "classe", "maxspeed", "osmid")
+
+
+# ------------------------
+# Identificação da origem
+# ------------------------
+def caminho_snapshot(arquivo):
+    return os.path.splitext(arquivo)[0] + ".snapshot"
+
+
+def assinatura_origem(arquivo):
+    """Tamanho e mtime do GraphML: barato de conferir a cada carga."""
+    st = os.stat(arquivo)
+    return {"tamanho": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def hash_arquivo(arquivo, bloco=1 << 20):
+    h = hashlib.sha1()
+    with open(arquivo, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+# ------------------------
+# Salvar e carregar
+# ------------------------
+def salvar_snapshot(compacto, diretorio, arquivo_origem=None, versao_tempo=None):
+    temp = diretorio + ".tmp"
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+
+    arrays = {
+        "ids": compacto.ids,
+        "x": compacto.x,
+        "y": compacto.y,
+        "offsets": compacto.offsets,
+        "alvos": compacto.alvos,
+        "length": compacto.pesos["length"],
+        "travel_time": compacto.pesos["travel_time"],
+        "chaves": compacto.chaves,
+        "classe": compacto.classe,
+        "maxspeed": compacto.maxspeed,
+        "osmid": compacto.osmid,
+    }
+    for nome, arr in arrays.items():
+        np.save(os.path.join(temp, nome + ".npy"), np.ascontiguousarray(arr))
+
+    cabecalho = {
+        "versao_formato": VERSAO_FORMATO,
+        "n_nos": int(compacto.n_nos),
+        "n_arestas": int(compacto.n_arestas),
+        "bbox": [float(compacto.y.min()), float(compacto.x.min()),
+                 float(compacto.y.max()), float(compacto.x.max())] if compacto.n_nos else None,
+        "classes": compacto.classes,
+        "versao_tempo": versao_tempo,
+    }
+    if arquivo_origem and os.path.exists(arquivo_origem):
+        cabecalho["origem"] = assinatura_origem(arquivo_origem)
+        cabecalho["hash_origem"] = hash_arquivo(arquivo_origem)
+    with open(os.path.join(temp, "cabecalho.json"), "w", encoding="utf-8") as f:
+        json.dump(cabecalho, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(temp, diretorio)
+
+
+def ler_cabecalho(diretorio):
+    with open(os.path.join(diretorio, "cabecalho.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def snapshot_valido(diretorio, arquivo_origem=None):
+    """Confere a versão do formato e a assinatura do GraphML de origem.
+
+    A versão do perfil de velocidade não invalida o snapshot: como ele guarda
+    classe e maxspeed das arestas, o travel_time pode ser recalculado a partir dele.
+    """
+    try:
+        cab = ler_cabecalho(diretorio)
+    except (OSError, ValueError):
+        return False
+    if cab.get("versao_formato") != VERSAO_FORMATO:
+        return False
+    if arquivo_origem and os.path.exists(arquivo_origem):
+        if cab.get("origem") != assinatura_origem(arquivo_origem):
+            return False
+    return all(os.path.exists(os.path.join(diretorio, n + ".npy")) for n in ARRAYS)
+
+
+def carregar_snapshot(diretorio, mmap=True):
+    cab = ler_cabecalho(diretorio)
+    modo = "r" if mmap else None
+    a = {n: np.load(os.path.join(diretorio, n + ".npy"), mmap_mode=modo) for n in ARRAYS}
+    return GrafoCompacto(
+        a["ids"], a["x"], a["y"], a["offsets"], a["alvos"],
+        {"length": a["length"], "travel_time": a["travel_time"]},
+        chaves=a["chaves"],
+        classe=a["classe"],
+        classes=cab["classes"],
+        maxspeed=a["maxspeed"],
+        osmid=a["osmid"],
+    )
@@ -0,0 +1,247 @@
+"""Roteamento dependente do horário de partida.
+
+O dia é dividido em 96 faixas de 15 minutos. Cada perfil é uma linha de 96
+fatores que multiplicam a velocidade da aresta (o travel_time atual do grafo
+compacto é a velocidade de fluxo livre). As arestas guardam só o índice do
+seu perfil (uint16): por padrão há um perfil por classe de via, compartilhado
+por todas as arestas da classe, e perfis próprios podem ser atribuídos a
+arestas específicas. A memória fica em n_arestas * 2 bytes + n_perfis * 96
+fatores.
+
+Dentro de uma aresta a velocidade muda quando o relógio passa de uma faixa
+para a seguinte (o veículo percorre o que falta com a nova velocidade). Assim,
+sair mais tarde nunca faz chegar mais cedo (propriedade FIFO), e o Dijkstra/A*
+por horário de chegada continua exato.
+"""
+import datetime as dt
+import heapq
+import math
+import os
+
+import numpy as np
+
+from PerfisVelocidade import PERFIS
+
+DURACAO_FAIXA_S = 900
+FAIXAS_DIA = 96
+SEGUNDOS_DIA = DURACAO_FAIXA_S * FAIXAS_DIA
+FATOR_MINIMO = 0.05
+
+# Intensidade do congestionamento num dia útil, por hora cheia (0 = fluxo livre,
+# 1 = velocidades do perfil "pico"); as faixas de 15 min são interpoladas.
+CURVA_DIA_UTIL = (0.0, 0.0, 0.0, 0.0, 0.0, 0.1, 0.4, 0.9, 1.0, 0.6, 0.4, 0.4,
+                  0.5, 0.5, 0.4, 0.4, 0.5, 0.9, 1.0, 0.8, 0.4, 0.2, 0.1, 0.0)
+
+
+def caminho_horarios(arquivo):
+    return os.path.splitext(arquivo)[0] + ".horarios.npz"
+
+
+def interpretar_horario(valor):
+    """Segundos desde a meia-noite a partir de número, "HH:MM[:SS]", time ou datetime."""
+    if isinstance(valor, dt.datetime):
+        valor = valor.time()
+    if isinstance(valor, dt.time):
+        return valor.hour * 3600.0 + valor.minute * 60.0 + valor.second + valor.microsecond / 1e6
+    if isinstance(valor, str):
+        partes = valor.strip().split(":")
+        if not 2 <= len(partes) <= 3:
+            raise ValueError(f"Horário inválido: {valor}")
+        h, m = int(partes[0]), int(partes[1])
+        s = float(partes[2]) if len(partes) == 3 else 0.0
+        return h * 3600.0 + m * 60.0 + s
+    valor = float(valor)
+    if valor < 0 or not math.isfinite(valor):
+        raise ValueError(f"Horário inválido: {valor}")
+    return valor
+
+
+def formatar_horario(segundos):
+    s = int(round(segundos)) % SEGUNDOS_DIA
+    return f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}"
+
+
+def curva_em_faixas(curva_horaria):
+    """Interpola uma curva de 24 valores horários (circular) nas 96 faixas de 15 min."""
+    curva = np.asarray(curva_horaria, dtype=np.float64)
+    horas = np.arange(len(curva) + 1) * (24.0 / len(curva))
+    meio_faixas = (np.arange(FAIXAS_DIA) + 0.5) * (24.0 / FAIXAS_DIA)
+    return np.interp(meio_faixas, horas, np.append(curva, curva[0]))
+
+
+def _velocidade(perfil, classe):
+    padrao = perfil.get("velocidade_padrao", 30)
+    return perfil["velocidades"].get(classe, padrao) * perfil.get("fatores", {}).get(classe, 1.0)
+
+
+class PerfisHorarios:
+    """Perfis de velocidade por faixa de 15 min e buscas por horário de partida."""
+
+    def __init__(self, compacto, fatores, perfil_aresta, nomes=None):
+        self.compacto = compacto
+        self.fatores = np.maximum(np.asarray(fatores, dtype=np.float32), FATOR_MINIMO)
+        if self.fatores.ndim != 2 or self.fatores.shape[1] != FAIXAS_DIA:
+            raise ValueError(f"Fatores devem ter forma (n_perfis, {FAIXAS_DIA})")
+        self.perfil_aresta = np.asarray(perfil_aresta, dtype=np.uint16)
+        if len(self.perfil_aresta) != compacto.n_arestas:
+            raise ValueError("perfil_aresta deve ter um índice por aresta")
+        self.nomes = list(nomes) if nomes is not None else [str(i) for i in range(len(self.fatores))]
+        self._preparar()
+
+    def _preparar(self):
+        self._linhas = self.fatores.astype(np.float64).tolist()
+        # O laço da busca lê o perfil de cada aresta direto do array, sem lista por aresta.
+        self._perfil_aresta = memoryview(self.perfil_aresta).cast("B").cast("H")
+        self._fator_max = max(1.0, float(self.fatores.max()))
+
+    # ------------------------
+    # Construção
+    # ------------------------
+    @classmethod
+    def por_classe(cls, compacto, curva=CURVA_DIA_UTIL, livre="padrao", pico="pico"):
+        """Um perfil por classe de via, entre as velocidades dos perfis `livre` e `pico`.
+
+        fator(faixa) = 1 - curva(faixa) * (1 - v_pico / v_livre): na hora de maior
+        intensidade a classe anda como no perfil "pico", de madrugada como no livre.
+        """
+        queda = np.array([1.0 - min(_velocidade(PERFIS[pico], c) / _velocidade(PERFIS[livre], c), 1.0)
+                          for c in compacto.classes])
+        fatores = 1.0 - queda[:, None] * curva_em_faixas(curva)[None, :]
+        return cls(compacto, fatores, compacto.classe, nomes=list(compacto.classes))
+
+    def definir_perfil(self, arestas, fatores, nome=None):
+        """Atribui um perfil próprio (96 fatores) às arestas dadas (índices do CSR).
+
+        Perfis iguais a um existente são reaproveitados. Retorna o índice do perfil.
+        """
+        linha = np.maximum(np.asarray(fatores, dtype=np.float32), FATOR_MINIMO)
+        if linha.shape != (FAIXAS_DIA,):
+            raise ValueError(f"O perfil deve ter {FAIXAS_DIA} fatores")
+        iguais = np.flatnonzero((self.fatores == linha).all(axis=1))
+        if len(iguais):
+            indice = int(iguais[0])
+        else:
+            if len(self.fatores) >= np.iinfo(np.uint16).max:
+                raise ValueError("Limite de perfis atingido")
+            indice = len(self.fatores)
+            self.fatores = np.vstack([self.fatores, linha])
+            self.nomes.append(nome or str(indice))
+        self.perfil_aresta[np.asarray(arestas, dtype=np.int64)] = indice
+        self._preparar()
+        return indice
+
+    def salvar(self, arquivo):
+        np.savez(arquivo, fatores=self.fatores, perfil_aresta=self.perfil_aresta,
+                 nomes=np.array(self.nomes))
+
+    @classmethod
+    def carregar(cls, arquivo, compacto):
+        """Retorna None se o arquivo não existe ou foi gerado para outro grafo."""
+        if not os.path.exists(arquivo):
+            return None
+        dados = np.load(arquivo)
+        if len(dados["perfil_aresta"]) != compacto.n_arestas:
+            return None
+        return cls(compacto, dados["fatores"], dados["perfil_aresta"], nomes=dados["nomes"].tolist())
+
+    # ------------------------
+    # Custo das arestas
+    # ------------------------
+    def velocidade_relativa(self, aresta, horario):
+        """Fator de velocidade da aresta (índice do CSR) no horário dado."""
+        faixa = int(interpretar_horario(horario) // DURACAO_FAIXA_S) % FAIXAS_DIA
+        return float(self.fatores[self.perfil_aresta[aresta], faixa])
+
+    @staticmethod
+    def _atravessar(livre, linha, t):
+        # `livre` é o tempo da aresta em fluxo livre; em cada faixa o que falta é
+        # percorrido com o fator daquela faixa até a aresta acabar.
+        inicio_faixa = t // DURACAO_FAIXA_S
+        while True:
+            f = linha[int(inicio_faixa) % FAIXAS_DIA]
+            fim = (inicio_faixa + 1) * DURACAO_FAIXA_S
+            chegada = t + livre / f
+            if chegada <= fim:
+                return chegada
+            livre -= (fim - t) * f
+            t = fim
+            inicio_faixa += 1
+
+    def tempo_caminho(self, rota, partida):
+        """Duração (s) de uma rota (ids) saindo no horário dado."""
+        c = self.compacto
+        offsets, alvos, w = c._listas("travel_time")
+        perfil, linhas = self._perfil_aresta, self._linhas
+        inicio = t = interpretar_horario(partida)
+        for a, b in zip(rota[:-1], rota[1:]):
+            u, v = c.indice[a], c.indice[b]
+            t = min(self._atravessar(w[j], linhas[perfil[j]], t)
+                    for j in range(offsets[u], offsets[u + 1]) if alvos[j] == v)
+        return t - inicio
+
+    # ------------------------
+    # Buscas
+    # ------------------------
+    def _busca(self, c, s, t, partida, heuristica=None):
+        offsets, alvos, w = c._listas("travel_time")
+        perfil, linhas = self._perfil_aresta, self._linhas
+        atravessar = self._atravessar
+        inf = math.inf
+        chegada = {s: partida}
+        pred = {}
+        fechados = set()
+        heap = [(partida, s)] if heuristica is None else [(partida + heuristica(s), s)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            _, u = pop(heap)
+            if u in fechados:
+                continue
+            if u == t:
+                c.expandidos = len(fechados) + 1
+                return chegada[u], pred
+            fechados.add(u)
+            tu = chegada[u]
+            for j in range(offsets[u], offsets[u + 1]):
+                livre = w[j]
+                if livre == inf:
+                    continue
+                v = alvos[j]
+                nt = atravessar(livre, linhas[perfil[j]], tu)
+                if nt < chegada.get(v, inf):
+                    chegada[v] = nt
+                    pred[v] = u
+                    push(heap, (nt if heuristica is None else nt + heuristica(v), v))
+        c.expandidos = len(fechados)
+        return None, pred
+
+    def rota(self, origem, destino, partida, algoritmo="astar", filtro=None, vmax_kmh=120.0):
+        """Rota mais rápida (ids) saindo de `origem` no horário `partida`.
+
+        Retorna (rota, duração em s) ou (None, inf). O A* usa a linha reta na
+        maior velocidade possível (vmax_kmh vezes o maior fator dos perfis).
+        """
+        if algoritmo not in ("dijkstra", "astar"):
+            raise ValueError(f"Algoritmo '{algoritmo}' indisponível com horário de partida")
+        c = self.compacto.filtrado(filtro)
+        s, t = c.indice[origem], c.indice[destino]
+        inicio = interpretar_horario(partida)
+        heuristica = None
+        if algoritmo == "astar":
+            heuristica = c.heuristica_haversine(t, vmax_kmh * self._fator_max)
+        chegada, pred = self._busca(c, s, t, inicio, heuristica)
+        if chegada is None:
+            return None, math.inf
+        return c._reconstruir(pred, s, t), chegada - inicio
+
+    def perfil_viagem(self, origem, destino, inicio=0, fim=SEGUNDOS_DIA, passo=DURACAO_FAIXA_S,
+                      algoritmo="astar", filtro=None):
+        """Duração da viagem em função do horário de partida, amostrada a cada `passo` s.
+
+        Retorna (partidas, durações) como arrays; cada amostra é uma busca
+        dependente do horário completa (durações inf quando não há caminho).
+        """
+        inicio, fim = interpretar_horario(inicio), interpretar_horario(fim)
+        partidas = np.arange(inicio, fim, float(passo))
+        duracoes = np.array([self.rota(origem, destino, p, algoritmo, filtro)[1] for p in partidas])
+        return partidas, duracoes
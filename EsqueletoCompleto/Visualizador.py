@@ -1,8 +1,9 @@
-import osmnx as ox
-import matplotlib.pyplot as plt
-
+# osmnx e pyplot só são importados ao plotar: quem usa apenas salvar_rotas
+# (ou só importa o módulo) não paga a carga deles.
 class Visualizador:
     def exibir_grafo(self, grafo, salvar_em=None):
+        import osmnx as ox
+        import matplotlib.pyplot as plt
         fig, ax = ox.plot_graph(
             grafo,
             node_size=0,
@@ -17,6 +18,8 @@ class Visualizador:
 
     def exibir_rotas(self, grafo, rota_distancia, rota_tempo, m_d=None, m_a=None, salvar_em="rotas.png"):
         """Exibe apenas as rotas (Dijkstra e A*) sem mostrar os nós visitados."""
+        import osmnx as ox
+        import matplotlib.pyplot as plt
         fig, ax = ox.plot_graph_routes(
             grafo,
             routes=[rota_distancia, rota_tempo],
@@ -37,6 +40,23 @@ class Visualizador:
             print(f"Imagem salva em {salvar_em}")
         plt.show()
 
+        self._imprimir_metricas(m_d, m_a)
+
+    def salvar_rotas(self, renderizador, rota_distancia, rota_tempo, m_d=None, m_a=None,
+                     salvar_em="rotas.png", enquadrar=False):
+        """Versão sem janela de exibir_rotas: desenha sobre a malha em cache do Renderizador."""
+        renderizador.renderizar(
+            [rota_distancia, rota_tempo],
+            arquivo=salvar_em,
+            cores=["red", "blue"],
+            rotulos=["Menor distância (Dijkstra)", "Menor tempo (A*)"],
+            enquadrar=enquadrar
+        )
+        print(f"Imagem salva em {salvar_em}")
+        self._imprimir_metricas(m_d, m_a)
+
+    @staticmethod
+    def _imprimir_metricas(m_d, m_a):
         # imprime métricas no console
         if m_d and m_a:
             print("\n--- Métricas ---")
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto são importados pelo nome, a partir de EsqueletoCompleto/.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+AMOSTRA_OSM = os.path.join(RAIZ, "exemplos", "amostra_asa_sul.osm")
+
+
+@pytest.fixture(scope="module")
+def arquivo_grafo(tmp_path_factory):
+    """GraphML (com snapshot e restrições) importado do extrato de exemplo, um por módulo."""
+    from GrafoManager import GrafoManager
+    arquivo = str(tmp_path_factory.mktemp("amostra") / "amostra.graphml")
+    GrafoManager(arquivo).importar_osm(AMOSTRA_OSM)
+    return arquivo
+
+
+def carregar(arquivo, **kwargs):
+    from GrafoManager import GrafoManager
+    gm = GrafoManager(arquivo, **kwargs)
+    gm.carregar_grafo()
+    return gm
@@ -0,0 +1,61 @@
+"""Restrições de conversão do extrato de exemplo, da ingestão até calcular_rotas."""
+import pytest
+
+from conftest import carregar
+
+# Relações do amostra_asa_sul.osm, ambas pelo nó 1012:
+# no_left_turn de 1002 para 1011 e only_straight_on de 1013 (só para 1011).
+PROIBIDA = (1002, 1012, 1011)
+OBRIGATORIA = ((1013, 1012), 1011)
+
+
+def viola_restricao(rota):
+    for a, b, c in zip(rota, rota[1:], rota[2:]):
+        if (a, b, c) == PROIBIDA or ((a, b) == OBRIGATORIA[0] and c != OBRIGATORIA[1]):
+            return True
+    return False
+
+
+def test_restricoes_resolvidas_na_ingestao(arquivo_grafo):
+    gm = carregar(arquivo_grafo)
+    conv = gm.conversoes()
+    c = gm.compacto
+    assert conv.ignoradas == 0
+    entrada = c.arestas_entre(1002, 1012).tolist()
+    saida = c.arestas_entre(1012, 1011).tolist()
+    assert all(conv.custo_conversao(a, b) == float("inf") for a in entrada for b in saida)
+    assert all(set(conv.obrigatorias[a]) == set(saida) for a in c.arestas_entre(1013, 1012).tolist())
+
+
+@pytest.mark.parametrize("cache_arvores", [False, True])
+def test_conversao_restrita_e_evitada(arquivo_grafo, cache_arvores):
+    gm = carregar(arquivo_grafo, cache_arvores=cache_arvores)
+    # Pela busca por nós, 1013 -> 1012 -> 1022 vira onde só se pode seguir reto.
+    rota_nos, _, _, _ = gm.calcular_rotas(1013, 1022, "dijkstra", "astar")
+    assert viola_restricao(rota_nos)
+
+    rota_dist, rota_tempo, m_d, m_a = gm.calcular_rotas(1013, 1022, "conversoes", "conversoes")
+    assert rota_dist[0] == rota_tempo[0] == 1013 and rota_dist[-1] == rota_tempo[-1] == 1022
+    assert not viola_restricao(rota_dist) and not viola_restricao(rota_tempo)
+    # O tempo informado é o custo otimizado pela busca, com as conversões.
+    assert m_a["tempo"] == pytest.approx(gm.conversoes().peso_caminho(rota_tempo, "travel_time"))
+    assert m_a["tempo"] > gm.compacto.peso_caminho(rota_tempo, "travel_time")
+
+
+def test_nenhuma_rota_viola_restricoes(arquivo_grafo):
+    gm = carregar(arquivo_grafo, cache_arvores=True)
+    ids = gm.compacto.ids.tolist()
+    violacoes_nos = 0
+    for o in ids:
+        for d in ids:
+            if o == d:
+                continue
+            for peso in ("length", "travel_time"):
+                try:
+                    rota_nos, _ = gm._buscar(o, d, peso, "astar")
+                except ValueError:
+                    continue
+                violacoes_nos += viola_restricao(rota_nos)
+                rota, _ = gm._buscar(o, d, peso, "conversoes")
+                assert not viola_restricao(rota), (o, d, peso, rota)
+    assert violacoes_nos > 0
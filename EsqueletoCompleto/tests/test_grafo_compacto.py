@@ -0,0 +1,29 @@
+"""Motores do grafo compacto contra o networkx no extrato de exemplo."""
+import pytest
+
+from conftest import carregar
+
+nx = pytest.importorskip("networkx")
+
+PARES = [(1013, 1011), (1013, 1022), (1002, 1011), (1001, 1035), (2002, 1022), (1042, 1003)]
+ALGORITMOS = ("dijkstra", "astar", "bidijkstra", "biastar", "ch", "alt")
+
+
+@pytest.fixture(scope="module")
+def gm(arquivo_grafo):
+    gm = carregar(arquivo_grafo)
+    gm.preparar_ch()
+    gm.preparar_alt(pesos=("length", "travel_time"), quantidade=4)
+    return gm
+
+
+@pytest.mark.parametrize("algoritmo", ALGORITMOS)
+def test_mesmos_custos_do_networkx(gm, algoritmo):
+    G = gm.grafo
+    for o, d in PARES:
+        rota_dist, rota_tempo, m_d, m_a = gm.calcular_rotas(o, d, algoritmo, algoritmo)
+        assert rota_dist is not None, (o, d)
+        assert rota_dist[0] == rota_tempo[0] == o and rota_dist[-1] == rota_tempo[-1] == d
+        # Pesos float32 no grafo compacto, float64 no GraphML.
+        assert m_d["distância"] == pytest.approx(nx.dijkstra_path_length(G, o, d, weight="length"), rel=1e-5)
+        assert m_a["tempo"] == pytest.approx(nx.dijkstra_path_length(G, o, d, weight="travel_time"), rel=1e-5)
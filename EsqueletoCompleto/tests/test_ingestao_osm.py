@@ -0,0 +1,32 @@
+"""IngestaoOSM contra o próprio OSMnx no extrato de exemplo."""
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from conftest import AMOSTRA_OSM
+from IngestaoOSM import grafo_de_osm, via_dirigivel
+
+ox = pytest.importorskip("osmnx")
+
+
+def comprimento_total(G):
+    return sum(d["length"] for _, _, d in G.edges(data=True))
+
+
+def test_equivale_a_graph_from_xml(tmp_path):
+    # graph_from_xml não aplica o filtro "drive": a referência lê o extrato
+    # só com as vias que passam nele (o resto do processamento é o mesmo).
+    arvore = ET.parse(AMOSTRA_OSM)
+    raiz = arvore.getroot()
+    for via in raiz.findall("way"):
+        if not via_dirigivel({t.get("k"): t.get("v") for t in via.iter("tag")}):
+            raiz.remove(via)
+    filtrado = str(tmp_path / "drive.osm")
+    arvore.write(filtrado)
+
+    G = grafo_de_osm(AMOSTRA_OSM)
+    R = ox.graph_from_xml(filtrado, simplify=True, retain_all=False)
+    assert G.number_of_nodes() == R.number_of_nodes()
+    assert G.number_of_edges() == R.number_of_edges()
+    assert comprimento_total(G) == pytest.approx(comprimento_total(R))
+    assert sorted((u, v) for u, v, _ in G.edges) == sorted((u, v) for u, v, _ in R.edges)
@@ -0,0 +1,41 @@
+"""Troca de perfil de velocidade com CH e ALT já preparados."""
+import pytest
+
+from conftest import carregar
+
+
+def tempos(gm, algoritmo):
+    ids = gm.compacto.ids.tolist()
+    resultado = {}
+    for o in ids:
+        for d in ids:
+            if o != d:
+                _, _, _, m_a = gm.calcular_rotas(o, d, "dijkstra", algoritmo)
+                resultado[o, d] = None if m_a is None else m_a["tempo"]
+    return resultado
+
+
+@pytest.mark.parametrize("inicial, novo", [("padrao", "pico"), ("pico", "padrao")])
+def test_ch_e_alt_seguem_o_novo_perfil(arquivo_grafo, inicial, novo):
+    gm = carregar(arquivo_grafo, perfil="padrao")
+    gm.aplicar_perfil(inicial)
+    gm.preparar_ch(pesos=("travel_time",))
+    gm.preparar_alt(pesos=("travel_time",), quantidade=4)
+
+    gm.aplicar_perfil(novo)
+    # As estruturas do perfil anterior não são mais usadas; preparadas de novo,
+    # respondem como o Dijkstra ("pico" → "padrao" deixa tudo mais rápido, o
+    # caso em que landmarks velhos superestimariam).
+    with pytest.raises(RuntimeError):
+        gm.hierarquia("travel_time")
+    with pytest.raises(RuntimeError):
+        gm.landmarks("travel_time")
+    gm.preparar_ch(pesos=("travel_time",))
+    gm.preparar_alt(pesos=("travel_time",), quantidade=4)
+
+    referencia = tempos(gm, "dijkstra")
+    assert all(t is not None for t in referencia.values())
+    for algoritmo in ("ch", "alt"):
+        obtido = tempos(gm, algoritmo)
+        for par, t in referencia.items():
+            assert obtido[par] == pytest.approx(t, rel=1e-6), (algoritmo, par)
@@ -29,11 +29,9 @@ for u, v, k, data in G.edges(keys=True, data=True):
 
 # 3. DEFINIR ORIGEM E DESTINO
 
-# Origem: IESB Asa Sul
-orig_node = ox.distance.nearest_nodes(G, X=-47.9121, Y=-15.8309)
-
-# Destino: Estádio Mané Garrincha
-dest_node = ox.distance.nearest_nodes(G, X=-47.8925, Y=-15.7835)
+# Origem: IESB Asa Sul | Destino: Estádio Mané Garrincha
+# (uma única chamada vetorizada: a árvore espacial é montada só uma vez)
+orig_node, dest_node = ox.distance.nearest_nodes(G, X=[-47.9121, -47.8925], Y=[-15.8309, -15.7835])
 
 print(f"Nó de origem (IESB Asa Sul): {orig_node}")
 print(f"Nó de destino (Mané Garrincha): {dest_node}")
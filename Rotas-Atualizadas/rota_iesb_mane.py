@@ -7,22 +7,20 @@ from matplotlib.lines import Line2D
 # 1) FUNÇÕES AUXILIARES
 # ==============================
 def remover_avenidas(grafo):
-    """Remove avenidas rápidas para forçar Dijkstra a usar ruas locais."""
+    """Visão do grafo sem avenidas rápidas, para forçar Dijkstra a usar ruas locais.
+
+    Nada é copiado: a visão filtra as arestas sob demanda sobre o grafo original.
+    """
     banir = {"motorway", "motorway_link", "trunk", "trunk_link",
              "primary", "primary_link"}
-    G_local = grafo.copy()
-    to_remove = []
-    for u, v, k, data in G_local.edges(keys=True, data=True):
-        hw = data.get("highway")
+
+    def aresta_permitida(u, v, k):
+        hw = grafo[u][v][k].get("highway")
         if isinstance(hw, (list, set, tuple)):
-            if any(h in banir for h in hw):
-                to_remove.append((u, v, k))
-        elif hw in banir:
-            to_remove.append((u, v, k))
-    for u, v, k in to_remove:
-        if G_local.has_edge(u, v, k):
-            G_local.remove_edge(u, v, k)
-    return G_local
+            return not any(h in banir for h in hw)
+        return hw not in banir
+
+    return nx.subgraph_view(grafo, filter_edge=aresta_permitida)
 
 
 def resumo_rotas(dijkstra, astar):
@@ -47,8 +45,8 @@ G_full = ox.add_edge_travel_times(G_full)
 # ==============================
 # 3) DEFINIR ORIGEM E DESTINO
 # ==============================
-orig_node = ox.distance.nearest_nodes(G_full, X=-47.9121, Y=-15.8309)   # IESB Asa Sul
-dest_node = ox.distance.nearest_nodes(G_full, X=-47.8925, Y=-15.7835)   # Mané Garrincha
+# IESB Asa Sul e Mané Garrincha numa única chamada (árvore espacial montada uma vez)
+orig_node, dest_node = ox.distance.nearest_nodes(G_full, X=[-47.9121, -47.8925], Y=[-15.8309, -15.7835])
 
 # ==============================
 # 4) DIJKSTRA (grafo sem avenidas)
@@ -22,8 +22,8 @@ orig_lon, orig_lat = -47.9121, -15.8309
 # Setor Comercial Norte (próx. Torre de TV / SCN)
 dest_lon, dest_lat = -47.8830, -15.7820
 
-orig_full = ox.distance.nearest_nodes(G_full, X=orig_lon, Y=orig_lat)
-dest_full = ox.distance.nearest_nodes(G_full, X=dest_lon, Y=dest_lat)
+# Uma única chamada vetorizada para os dois pontos (árvore espacial montada uma vez)
+orig_full, dest_full = ox.distance.nearest_nodes(G_full, X=[orig_lon, dest_lon], Y=[orig_lat, dest_lat])
 
 print(f"Origem (IESB): {orig_full}")
 print(f"Destino (SCN): {dest_full}")
@@ -31,23 +31,19 @@ print(f"Destino (SCN): {dest_full}")
 # ==============================
 # 3) GRAFO LOCAL (SEM AVENIDAS RÁPIDAS) PARA DIJKSTRA
 # ==============================
-G_local = G_full.copy()
-
 banir = {"motorway", "motorway_link", "trunk", "trunk_link",
          "primary", "primary_link"}
 
-to_remove = []
-for u, v, k, data in G_local.edges(keys=True, data=True):
-    hw = data.get("highway")
+
+def aresta_permitida(u, v, k):
+    hw = G_full[u][v][k].get("highway")
     if isinstance(hw, (list, set, tuple)):
-        if any(h in banir for h in hw):
-            to_remove.append((u, v, k))
-    elif hw in banir:
-        to_remove.append((u, v, k))
-
-for u, v, k in to_remove:
-    if G_local.has_edge(u, v, k):
-        G_local.remove_edge(u, v, k)
+        return not any(h in banir for h in hw)
+    return hw not in banir
+
+
+# Visão filtrada: as arestas banidas são ignoradas sem copiar o grafo.
+G_local = nx.subgraph_view(G_full, filter_edge=aresta_permitida)
 
 orig_local, dest_local = orig_full, dest_full
 